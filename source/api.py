@@ -290,6 +290,8 @@ def processPendingEvents(processEventQueue=True):
 	import baseObject
 	baseObject.AutoPropertyObject.invalidateCaches()
 	if processEventQueue:
+		# This executes everything queued so far,
+		# though focus and caret events are executed before other functions; see L{queueHandler.LanedQueue}.
 		queueHandler.flushQueue(queueHandler.eventQueue)
 
 def copyToClip(text):
@@ -210,6 +210,9 @@ def reloadAppModules():
 		del sys.modules[mod]
 	import appModules
 	initialize()
+	# The old app module classes are no longer used, so forget what was cached about them.
+	import eventHandler
+	eventHandler.invalidateDispatchCache()
 	for entry in state:
 		pid = entry.pop("processID")
 		mod = getAppModuleFromProcessID(pid)
@@ -136,7 +136,7 @@ def initialize():
 		return
 	_setDuckingState(False)
 	setAudioDuckingMode(config.conf['audio']['audioDuckingMode'])
-	config.post_configProfileSwitch.register(handlePostConfigProfileSwitch)
+	config.post_configProfileSwitch.register(handlePostConfigProfileSwitch, sections=(("audio", "audioDuckingMode"),))
 
 _isAudioDuckingSupported=None
 def isAudioDuckingSupported():
@@ -41,8 +41,27 @@ class CachingGetter(Getter):
 			return self
 		return instance._getPropertyViaCache(self.fget)
 
+#: Incremented whenever an event handler (an attribute whose name starts with C{event_})
+#: is set on or deleted from a class derived from L{AutoPropertyObject} after the class was created;
+#: e.g. when an add-on patches an event handler into an existing class.
+#: This allows caches of which classes define event handlers to notice such changes.
+#: @type: int
+eventHandlersVersion=0
+
 class AutoPropertyType(ABCMeta):
 
+	def __setattr__(self,name,value):
+		super(AutoPropertyType,self).__setattr__(name,value)
+		if name.startswith("event_"):
+			global eventHandlersVersion
+			eventHandlersVersion+=1
+
+	def __delattr__(self,name):
+		super(AutoPropertyType,self).__delattr__(name)
+		if name.startswith("event_"):
+			global eventHandlersVersion
+			eventHandlersVersion+=1
+
 	def __init__(self,name,bases,dict):
 		super(AutoPropertyType,self).__init__(name,bases,dict)
 
@@ -7,7 +7,9 @@
 
 import itertools
 import os
-from typing import Iterable, Union, Tuple, List, Optional
+from array import array
+import bisect
+from typing import Iterable, Union, Tuple, List, Optional, NamedTuple
 
 import driverHandler
 import pkgutil
@@ -37,6 +39,7 @@ import extensionPoints
 import hwPortUtils
 import bdDetect
 import brailleViewer
+import brailleWriter
 import queueHandler
 
 roleLabels = {
@@ -427,10 +430,10 @@ class Region(object):
 		@postcondition: L{brailleCells}, L{brailleCursorPos}, L{brailleSelectionStart} and L{brailleSelectionEnd} are updated and ready for rendering.
 		"""
 		mode = louis.dotsIO
-		if config.conf["braille"]["expandAtCursor"] and self.cursorPos is not None:
+		if config.conf.snapshot["braille", "expandAtCursor"] and self.cursorPos is not None:
 			mode |= louis.compbrlAtCursor
 		self.brailleCells, self.brailleToRawPos, self.rawToBraillePos, self.brailleCursorPos = louisHelper.translate(
-			[os.path.join(brailleTables.TABLES_DIR, config.conf["braille"]["translationTable"]),
+			[os.path.join(brailleTables.TABLES_DIR, config.conf.snapshot["braille", "translationTable"]),
 				"braille-patterns.cti"],
 			self.rawText,
 			typeform=self.rawTextTypeforms,
@@ -776,10 +779,30 @@ def getFormatFieldBraille(field, fieldCache, isAtStart, formatConfig):
 	fieldCache.update(field)
 	return TEXT_SEPARATOR.join([x for x in textList if x])
 
+class _TextInfoRegionContent(NamedTuple):
+	"""The content of a L{TextInfoRegion} at its last full update.
+	If the reading unit hasn't changed when the region is next updated,
+	this is used to update the cursor and selection without fetching the reading unit again.
+	"""
+	unit: str
+	formatConfig: dict
+	bookmark: textInfos.Bookmark
+	#: The text of the reading unit, excluding any field text.
+	text: str
+	rawText: str
+	rawTextTypeforms: List[int]
+	rawToContentPos: List[int]
+	#: Maps positions in L{text} to positions in L{rawText}.
+	contentToRawPos: List[int]
+	hidePreviousRegions: bool
+
 class TextInfoRegion(Region):
 
 	pendingCaretUpdate=False #: True if the cursor should be updated for this region on the display
 	allowPageTurns=True #: True if a page turn should be tried when a TextInfo cannot move anymore and the object supports page turns.
+	#: The content at the last full update, or C{None} if the next update must be a full update.
+	#: @type: L{_TextInfoRegionContent}
+	_lastContent = None
 
 	def __init__(self, obj):
 		super(TextInfoRegion, self).__init__()
@@ -839,6 +862,17 @@ class TextInfoRegion(Region):
 		self.rawTextTypeforms.extend((louis.plain_text,) * textLen)
 		self._rawToContentPos.extend((contentPos,) * textLen)
 
+	def _addContentText(self, text, typeform):
+		rawTextLen = len(self.rawText)
+		textLen = len(text)
+		self.rawText += text
+		self.rawTextTypeforms.extend((typeform,) * textLen)
+		endPos = self._currentContentPos + textLen
+		self._rawToContentPos.extend(range(self._currentContentPos, endPos))
+		self._contentToRawPos.extend(range(rawTextLen, rawTextLen + textLen))
+		self._contentText.append(text)
+		self._currentContentPos = endPos
+
 	def _addTextWithFields(self, info, formatConfig, isSelection=False):
 		shouldMoveCursorToFirstContent = not isSelection and self.cursorPos is not None
 		ctrlFields = []
@@ -867,12 +901,7 @@ class TextInfoRegion(Region):
 					# Position the cursor here, as it may currently be positioned on control field text.
 					self.cursorPos = len(self.rawText)
 					shouldMoveCursorToFirstContent = False
-				self.rawText += command
-				commandLen = len(command)
-				self.rawTextTypeforms.extend((typeform,) * commandLen)
-				endPos = self._currentContentPos + commandLen
-				self._rawToContentPos.extend(range(self._currentContentPos, endPos))
-				self._currentContentPos = endPos
+				self._addContentText(command, typeform)
 				if isSelection:
 					# The last time this is set will be the end of the content.
 					self.selectionEnd = len(self.rawText)
@@ -912,6 +941,9 @@ class TextInfoRegion(Region):
 					if getattr(field, "_presCat") == field.PRESCAT_MARKER:
 						# In this case, the field text is what the user cares about,
 						# not the actual content.
+						# The cursor might be placed on the field text rather than the content,
+						# which an incremental update can't reproduce.
+						self._hasMarkerFields = True
 						fieldStart = len(self.rawText)
 						if fieldStart > 0:
 							# There'll be a space before the field text.
@@ -943,22 +975,11 @@ class TextInfoRegion(Region):
 		info.obj._brailleFormatFieldAttributesCache = formatFieldAttributesCache
 
 	def _getReadingUnit(self):
-		return textInfos.UNIT_PARAGRAPH if config.conf["braille"]["readByParagraph"] else textInfos.UNIT_LINE
+		return textInfos.UNIT_PARAGRAPH if config.conf.snapshot["braille", "readByParagraph"] else textInfos.UNIT_LINE
 
 	def update(self):
 		formatConfig = config.conf["documentFormatting"]
 		unit = self._getReadingUnit()
-		self.rawText = ""
-		self.rawTextTypeforms = []
-		self.cursorPos = None
-		# The output includes text representing fields which isn't part of the real content in the control.
-		# Therefore, maintain a map of positions in the output to positions in the content.
-		self._rawToContentPos = []
-		self._currentContentPos = 0
-		self.selectionStart = self.selectionEnd = None
-		self._isFormatFieldAtStart = True
-		self._skipFieldsNotAtStartOfNode = False
-		self._endsWithField = False
 
 		# Selection has priority over cursor.
 		# HACK: Some TextInfos only support UNIT_LINE properly if they are based on POSITION_CARET,
@@ -985,6 +1006,25 @@ class TextInfoRegion(Region):
 			# Get the reading unit at the cursor.
 			readingInfo.expand(unit)
 
+		if self._updateIncrementally(readingInfo, sel, unit, formatConfig):
+			return
+		self._lastContent = None
+		self.rawText = ""
+		self.rawTextTypeforms = []
+		self.cursorPos = None
+		# The output includes text representing fields which isn't part of the real content in the control.
+		# Therefore, maintain a map of positions in the output to positions in the content.
+		self._rawToContentPos = []
+		# Also maintain the reverse, which is used to place the cursor in an incremental update.
+		self._contentToRawPos = []
+		self._contentText = []
+		self._hasMarkerFields = False
+		self._currentContentPos = 0
+		self.selectionStart = self.selectionEnd = None
+		self._isFormatFieldAtStart = True
+		self._skipFieldsNotAtStartOfNode = False
+		self._endsWithField = False
+
 		# Not all text APIs support offsets, so we can't always get the offset of the selection relative to the start of the reading unit.
 		# Therefore, grab the reading unit in three parts.
 		# First, the chunk from the start of the reading unit to the start of the selection.
@@ -1055,6 +1095,67 @@ class TextInfoRegion(Region):
 			self.brailleCursorPos = self._brailleInputStart + brailleInput.handler.untranslatedCursorPos
 		else:
 			self._brailleInputIndStart = None
+			if not self._hasMarkerFields:
+				self._lastContent = _TextInfoRegionContent(
+					unit=unit,
+					formatConfig=formatConfig.copy(),
+					bookmark=readingInfo.bookmark,
+					text="".join(self._contentText),
+					rawText=self.rawText,
+					rawTextTypeforms=self.rawTextTypeforms,
+					rawToContentPos=self._rawToContentPos,
+					contentToRawPos=self._contentToRawPos,
+					hidePreviousRegions=self.hidePreviousRegions,
+				)
+
+	def _updateIncrementally(self, readingInfo, sel, unit, formatConfig):
+		"""Update the cursor and selection without fetching the reading unit again, if possible.
+		This is possible when the reading unit and its text are unchanged since the last full update;
+		e.g. when the caret moves within a line.
+		The cursor and selection are then placed using the position maps from the last full update,
+		and the unchanged text is usually translated from the cache in L{louisHelper}.
+		@param readingInfo: The reading unit.
+		@type readingInfo: L{textInfos.TextInfo}
+		@param sel: The selection or cursor, restricted to the reading unit.
+		@type sel: L{textInfos.TextInfo}
+		@return: C{True} if the region was updated, C{False} if a full update is required.
+		@rtype: bool
+		"""
+		last = self._lastContent
+		if not last or last.unit != unit:
+			return False
+		# Import late to avoid circular import.
+		import brailleInput
+		if brailleInput.handler.untranslatedBraille:
+			return False
+		if readingInfo.bookmark != last.bookmark or readingInfo.text != last.text:
+			return False
+		if formatConfig.copy() != last.formatConfig:
+			return False
+		chunk = readingInfo.copy()
+		chunk.collapse()
+		chunk.setEndPoint(sel, "endToStart")
+		start = len(chunk.text)
+		contentToRawPos = last.contentToRawPos
+		rawTextLen = len(last.rawText)
+		if sel.isCollapsed:
+			cursorPos = contentToRawPos[start] if start < len(contentToRawPos) else rawTextLen
+			self.cursorPos = min(cursorPos, rawTextLen - 1)
+			self.selectionStart = self.selectionEnd = None
+		else:
+			end = start + len(sel.text)
+			if not start < end <= len(contentToRawPos):
+				return False
+			self.cursorPos = None
+			self.selectionStart = contentToRawPos[start]
+			self.selectionEnd = contentToRawPos[end - 1] + 1
+		self.rawText = last.rawText
+		self.rawTextTypeforms = last.rawTextTypeforms
+		self._rawToContentPos = last.rawToContentPos
+		self.hidePreviousRegions = last.hidePreviousRegions
+		self._brailleInputIndStart = None
+		super(TextInfoRegion, self).update()
+		return True
 
 	def getTextInfoForBraillePos(self, braillePos):
 		pos = self._rawToContentPos[self.brailleToRawPos[braillePos]]
@@ -1177,6 +1278,9 @@ class BrailleBuffer(baseObject.AutoPropertyObject):
 		#: The position in L{brailleCells} where the display window starts (inclusive).
 		#: @type: int
 		self.windowStartPos = 0
+		#: The state of the visible regions when the position maps were last computed.
+		#: See L{_ensurePositions}.
+		self._positionsState = None
 
 	def clear(self):
 		"""Clear the entire buffer.
@@ -1198,45 +1302,91 @@ class BrailleBuffer(baseObject.AutoPropertyObject):
 		for region in self.regions:
 			yield region
 
-	def _get_regionsWithPositions(self):
+	@staticmethod
+	def _getRegionState(region):
+		return (region, region.brailleCells, len(region.brailleCells), region.rawText, region.rawToBraillePos, region.brailleToRawPos)
+
+	def _ensurePositions(self):
+		"""Make sure that the position maps for the visible regions are up to date.
+		The maps are normally computed by L{update}.
+		However, they are computed again here if any visible region has changed since,
+		so that they are always correct.
+		"""
+		regions = list(self.visibleRegions)
+		state = self._positionsState
+		if state is not None and len(state) == len(regions):
+			for oldState, region in zip(state, regions):
+				newState = self._getRegionState(region)
+				# Compare objects by identity, since regions replace these when they are updated.
+				if oldState[2] != newState[2] or any(old is not new for old, new in zip(oldState, newState)):
+					break
+			else:
+				return
+		self._updatePositions(regions)
+
+	def _updatePositions(self, regions):
+		"""Compute the position maps for the given visible regions.
+		The maps are kept in arrays, and the start and end of each region are kept in sorted arrays
+		so that the region at a position can be found with a binary search.
+		"""
+		regionStarts = array("i")
+		regionEnds = array("i")
+		rawToBraillePos = array("i")
+		brailleToRawPos = array("i")
 		start = 0
-		for region in self.visibleRegions:
+		rawStart = 0
+		for region in regions:
 			end = start + len(region.brailleCells)
-			yield RegionWithPositions(region, start, end)
+			regionStarts.append(start)
+			regionEnds.append(end)
+			rawToBraillePos.extend([p + start for p in region.rawToBraillePos])
+			brailleToRawPos.extend([p + rawStart for p in region.brailleToRawPos])
 			start = end
+			rawStart += len(region.rawText)
+		self._regions = regions
+		self._regionStarts = regionStarts
+		self._regionEnds = regionEnds
+		self._rawToBraillePos = rawToBraillePos
+		self._brailleToRawPos = brailleToRawPos
+		self._positionsState = [self._getRegionState(region) for region in regions]
+
+	def _get_regionsWithPositions(self):
+		self._ensurePositions()
+		for region, start, end in zip(self._regions, self._regionStarts, self._regionEnds):
+			yield RegionWithPositions(region, start, end)
 
 	def _get_rawToBraillePos(self):
-		"""@return: a list mapping positions in L{rawText} to positions in L{brailleCells} for the entire buffer.
-		@rtype: [int, ...]
+		"""@return: an array mapping positions in L{rawText} to positions in L{brailleCells} for the entire buffer.
+		This must not be modified.
+		@rtype: array of int
 		"""
-		rawToBraillePos = []
-		for region, regionStart, regionEnd in self.regionsWithPositions:
-			rawToBraillePos.extend(p+regionStart for p in region.rawToBraillePos)
-		return rawToBraillePos
+		self._ensurePositions()
+		return self._rawToBraillePos
 
 	brailleToRawPos: List[int]
 
 	def _get_brailleToRawPos(self):
-		"""@return: a list mapping positions in L{brailleCells} to positions in L{rawText} for the entire buffer.
-		@rtype: [int, ...]
+		"""@return: an array mapping positions in L{brailleCells} to positions in L{rawText} for the entire buffer.
+		This must not be modified.
+		@rtype: array of int
 		"""
-		brailleToRawPos = []
-		start = 0
-		for region in self.visibleRegions:
-			brailleToRawPos.extend(p+start for p in region.brailleToRawPos)
-			start+=len(region.rawText)
-		return brailleToRawPos
+		self._ensurePositions()
+		return self._brailleToRawPos
 
 	def bufferPosToRegionPos(self, bufferPos):
-		for region, start, end in self.regionsWithPositions:
-			if end > bufferPos:
-				return region, bufferPos - start
-		raise LookupError("No such position")
+		self._ensurePositions()
+		# Find the first region which ends after this position.
+		index = bisect.bisect_right(self._regionEnds, bufferPos)
+		if index == len(self._regions):
+			raise LookupError("No such position")
+		return self._regions[index], bufferPos - self._regionStarts[index]
 
 	def regionPosToBufferPos(self, region, pos, allowNearest=False):
-		for testRegion, start, end in self.regionsWithPositions:
+		self._ensurePositions()
+		for index, testRegion in enumerate(self._regions):
 			if region == testRegion:
-				if pos < end - start:
+				start = self._regionStarts[index]
+				if pos < self._regionEnds[index] - start:
 					# The requested position is still valid within the region.
 					return start + pos
 				elif allowNearest:
@@ -1244,9 +1394,9 @@ class BrailleBuffer(baseObject.AutoPropertyObject):
 					# but the region is valid, so return its start.
 					return start
 				break
-		if allowNearest:
+		if allowNearest and self._regions:
 			# Resort to the start of the last region.
-			return start
+			return self._regionStarts[-1]
 		raise LookupError("No such position")
 
 	def bufferPositionsToRawText(self, startPos, endPos):
@@ -1280,7 +1430,7 @@ class BrailleBuffer(baseObject.AutoPropertyObject):
 		cellsLen = len(self.brailleCells)
 		if endPos >= cellsLen:
 			return cellsLen
-		if not config.conf["braille"]["wordWrap"]:
+		if not config.conf.snapshot["braille", "wordWrap"]:
 			return endPos
 		try:
 			# Try not to split words across windows.
@@ -1301,13 +1451,14 @@ class BrailleBuffer(baseObject.AutoPropertyObject):
 		startPos = endPos - self.handler.displaySize
 		# Loop through the currently displayed regions in reverse order
 		# If focusToHardLeft is set for one of the regions, the display shouldn't scroll further back than the start of that region
-		for region, regionStart, regionEnd in reversed(list(self.regionsWithPositions)):
+		self._ensurePositions()
+		for region, regionStart in zip(reversed(self._regions), reversed(self._regionStarts)):
 			if regionStart<endPos:
 				if region.focusToHardLeft:
 					# Only scroll to the start of this region.
 					restrictPos = regionStart
 					break
-				elif config.conf["braille"]["focusContextPresentation"]!=CONTEXTPRES_CHANGEDCONTEXT:
+				elif config.conf.snapshot["braille", "focusContextPresentation"]!=CONTEXTPRES_CHANGEDCONTEXT:
 					# We aren't currently dealing with context change presentation
 					# thus, we only need to consider the last region
 					# since it doesn't have focusToHardLeftSet, the window start position isn't restricted
@@ -1318,7 +1469,7 @@ class BrailleBuffer(baseObject.AutoPropertyObject):
 		if startPos <= restrictPos:
 			self.windowStartPos = restrictPos
 			return
-		if not config.conf["braille"]["wordWrap"]:
+		if not config.conf.snapshot["braille", "wordWrap"]:
 			self.windowStartPos = startPos
 			return
 		try:
@@ -1385,7 +1536,7 @@ class BrailleBuffer(baseObject.AutoPropertyObject):
 		"""
 		pos = self.regionPosToBufferPos(region, 0)
 		self.windowStartPos = pos
-		if region.focusToHardLeft or config.conf["braille"]["focusContextPresentation"]==CONTEXTPRES_SCROLL:
+		if region.focusToHardLeft or config.conf.snapshot["braille", "focusContextPresentation"]==CONTEXTPRES_SCROLL:
 			return
 		end = self.windowEndPos
 		if end - pos < self.handler.displaySize:
@@ -1412,6 +1563,7 @@ class BrailleBuffer(baseObject.AutoPropertyObject):
 			start += len(cells)
 		if log.isEnabledFor(log.IO):
 			log.io("Braille regions text: %r" % logRegions)
+		self._updatePositions(list(self.visibleRegions))
 
 	def updateDisplay(self):
 		if self is self.handler.buffer:
@@ -1533,7 +1685,7 @@ def getFocusContextRegions(obj, oldFocusRegions=None):
 			continue
 		region = NVDAObjectRegion(parent, appendText=TEXT_SEPARATOR)
 		region._focusAncestorIndex = index
-		if config.conf["braille"]["focusContextPresentation"]==CONTEXTPRES_CHANGEDCONTEXT and not focusToHardLeftSet:
+		if config.conf.snapshot["braille", "focusContextPresentation"]==CONTEXTPRES_CHANGEDCONTEXT and not focusToHardLeftSet:
 			# We are presenting context changes to the user
 			# Thus, only scroll back as far as the start of the first new focus ancestor
 			# focusToHardLeftSet is used since the first new ancestor isn't always represented by a region
@@ -1590,6 +1742,25 @@ def formatCellsForLog(cells: List[int]) -> str:
 		if cell else "-"
 		for cell in cells])
 
+
+def getChangedCellRange(oldCells: List[int], newCells: List[int]) -> Optional[Tuple[int, int]]:
+	"""Get the smallest range of cells which differs between two rows of cells of the same length.
+	@param oldCells: The cells currently on the display.
+	@param newCells: The cells which should be on the display.
+	@return: The start and end (exclusive) of the range which differs,
+		or C{None} if the cells are identical.
+	"""
+	end = len(newCells)
+	start = 0
+	while start < end and oldCells[start] == newCells[start]:
+		start += 1
+	if start == end:
+		return None
+	while oldCells[end - 1] == newCells[end - 1]:
+		end -= 1
+	return start, end
+
+
 class BrailleHandler(baseObject.AutoPropertyObject):
 	TETHER_AUTO = "auto"
 	TETHER_FOCUS = "focus"
@@ -1606,6 +1777,7 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 
 	def __init__(self):
 		louisHelper.initialize()
+		self.warmUpTables()
 		self.display: Optional[BrailleDisplayDriver] = None
 		#: Number of cells the connected device (or if no device connected, what braille viewer has)
 		#: Zero cells disables braille. See L{_get_enabled}
@@ -1618,8 +1790,18 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 		self._cursorPos = None
 		self._cursorBlinkUp = True
 		self._cells = []
+		#: The cells last written to the display, used to write only changed cells if the display supports it.
+		#: C{None} if the content of the display is unknown.
+		self._lastWrittenCells: Optional[List[int]] = None
+		#: Performs writes to thread-safe displays in the background.
+		self._writer: brailleWriter.BrailleWriter = _ApcBrailleWriter(
+			getDisplay=lambda: self.display,
+			write=self._displayCells,
+			onWriteError=self.handleDisplayUnavailable,
+			onAckTimeout=self._forgetWrittenCells,
+		)
 		self._cursorBlinkTimer = None
-		config.post_configProfileSwitch.register(self.handlePostConfigProfileSwitch)
+		config.post_configProfileSwitch.register(self.handlePostConfigProfileSwitch, sections=("braille",))
 		self._tether = config.conf["braille"]["tetherTo"]
 		self._detectionEnabled = False
 		self._detector = None
@@ -1639,6 +1821,7 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 		if self.display:
 			self.display.terminate()
 			self.display = None
+		self._writer.stop(timeout=bgThreadStopTimeout)
 		_BgThread.stop(timeout=bgThreadStopTimeout)
 		louisHelper.terminate()
 
@@ -1656,7 +1839,7 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 		self.mainBuffer.clear()
 
 	def _get_shouldAutoTether(self):
-		return self.enabled and config.conf["braille"]["autoTether"]
+		return self.enabled and config.conf.snapshot["braille", "autoTether"]
 
 	displaySize: int
 
@@ -1701,6 +1884,7 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 			if port:
 				kwargs["port"] = port
 
+		self._forgetWrittenCells()
 		try:
 			newDisplay = _getDisplayDriver(name)
 			oldDisplay = self.display
@@ -1734,6 +1918,8 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 					except:
 						log.error("Error terminating previous display driver", exc_info=True)
 				self.display = newDisplay
+			if newDisplay.isThreadSafe:
+				self._writer.start()
 			newDisplay.initSettings()
 			self._displaySize = newDisplay.numCells
 			if isFallback:
@@ -1769,37 +1955,60 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 		if self._cursorBlinkTimer:
 			self._cursorBlinkTimer.Stop()
 			self._cursorBlinkTimer = None
-		self._cursorBlinkUp = showCursor = config.conf["braille"]["showCursor"]
+		self._cursorBlinkUp = showCursor = config.conf.snapshot["braille", "showCursor"]
 		self._displayWithCursor()
 		if self._cursorPos is None or not showCursor:
 			return
-		cursorShouldBlink = config.conf["braille"]["cursorBlink"]
-		blinkRate = config.conf["braille"]["cursorBlinkRate"]
+		cursorShouldBlink = config.conf.snapshot["braille", "cursorBlink"]
+		blinkRate = config.conf.snapshot["braille", "cursorBlinkRate"]
 		if cursorShouldBlink and blinkRate:
 			self._cursorBlinkTimer = gui.NonReEntrantTimer(self._blink)
 			# This is called from the background thread when a display is auto detected.
 			# Make sure we start the blink timer from the main thread to avoid wx assertions
 			wx.CallAfter(self._cursorBlinkTimer.Start,blinkRate)
 
+	def _forgetWrittenCells(self):
+		"""Note that the content of the display is unknown,
+		for example because it was just initialized or a write might not have reached it.
+		The next write will then write all cells.
+		"""
+		self._lastWrittenCells = None
+
+	def _displayCells(self, cells: List[int]) -> bool:
+		"""Write cells to the display.
+		If the display supports partial display, only the range of cells which changed since the last write is sent.
+		Otherwise, all cells are written.
+		@return: C{True} if anything was written,
+			C{False} if the display already contained these cells.
+		"""
+		display = self.display
+		lastCells = self._lastWrittenCells
+		if not display.supportsPartialDisplay:
+			display.display(cells)
+			return True
+		if lastCells is None or len(lastCells) != len(cells):
+			display.display(cells)
+		else:
+			changedRange = getChangedCellRange(lastCells, cells)
+			if not changedRange:
+				return False
+			start, end = changedRange
+			display.displayRange(cells[start:end], start)
+		self._lastWrittenCells = cells
+		return True
+
 	def _writeCells(self, cells):
 		brailleViewer.update(cells, self._rawText)
 		if not self.display.isThreadSafe:
 			try:
-				self.display.display(cells)
+				self._displayCells(cells)
 			except:
 				log.error("Error displaying cells. Disabling display", exc_info=True)
 				self.handleDisplayUnavailable()
 			return
-		with _BgThread.queuedWriteLock:
-			alreadyQueued = _BgThread.queuedWrite
-			_BgThread.queuedWrite = cells
-		# If a write was already queued, we don't need to queue another;
-		# we just replace the data.
-		# This means that if multiple writes occur while an earlier write is still in progress,
-		# we skip all but the last.
-		if not alreadyQueued and not self.display._awaitingAck:
-			# Queue a call to the background thread.
-			_BgThread.queueApc(_BgThread.executor)
+		# If multiple writes occur while an earlier write is still in progress,
+		# the writer skips all but the last.
+		self._writer.queueWrite(cells)
 
 	def _displayWithCursor(self):
 		if not self._cells:
@@ -1807,9 +2016,9 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 		cells = list(self._cells)
 		if self._cursorPos is not None and self._cursorBlinkUp:
 			if self.getTether() == self.TETHER_FOCUS:
-				cells[self._cursorPos] |= config.conf["braille"]["cursorShapeFocus"]
+				cells[self._cursorPos] |= config.conf.snapshot["braille", "cursorShapeFocus"]
 			else:
-				cells[self._cursorPos] |= config.conf["braille"]["cursorShapeReview"]
+				cells[self._cursorPos] |= config.conf.snapshot["braille", "cursorShapeReview"]
 		self._writeCells(cells)
 
 	def _blink(self):
@@ -1908,7 +2117,7 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 		self.mainBuffer.clear()
 		focusToHardLeftSet = False
 		for region in regions:
-			if self.getTether() == self.TETHER_FOCUS and config.conf["braille"]["focusContextPresentation"]==CONTEXTPRES_CHANGEDCONTEXT:
+			if self.getTether() == self.TETHER_FOCUS and config.conf.snapshot["braille", "focusContextPresentation"]==CONTEXTPRES_CHANGEDCONTEXT:
 				# Check focusToHardLeft for every region.
 				# If noone of the regions has focusToHardLeft set to True, set it for the first focus region.
 				if region.focusToHardLeft:
@@ -2010,6 +2219,9 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 				self._handleProgressBarUpdate(obj)
 			return
 		self.mainBuffer.saveWindow()
+		if isinstance(region, TextInfoRegion):
+			# The content changed, perhaps without changing the text; e.g. formatting.
+			region._lastContent = None
 		region.update()
 		self.mainBuffer.update()
 		self.mainBuffer.restoreWindow()
@@ -2058,6 +2270,19 @@ class BrailleHandler(baseObject.AutoPropertyObject):
 		):
 			self.setDisplayByName(display)
 		self._tether = config.conf["braille"]["tetherTo"]
+		# The new profile might use different tables.
+		self.warmUpTables()
+
+	def warmUpTables(self):
+		"""Compile the configured output and input tables in the background,
+		so that the first translations using them don't stall while the tables are compiled.
+		This should be called whenever the configured tables change.
+		"""
+		louisHelper.warmUpTables([
+			[os.path.join(brailleTables.TABLES_DIR, config.conf["braille"][tableKey]), "braille-patterns.cti"]
+			# The output table is needed first.
+			for tableKey in ("translationTable", "inputTable")
+		])
 
 	def handleDisplayUnavailable(self):
 		"""Called when the braille display becomes unavailable.
@@ -2099,13 +2324,11 @@ class _BgThread:
 
 	thread = None
 	exit = False
-	queuedWrite = None
 
 	@classmethod
 	def start(cls):
 		if cls.thread:
 			return
-		cls.queuedWriteLock = threading.Lock()
 		thread = cls.thread = threading.Thread(
 			name=f"{cls.__module__}.{cls.__qualname__}",
 			target=cls.func
@@ -2129,7 +2352,7 @@ class _BgThread:
 		winKernel.closeHandle(cls.ackTimerHandle)
 		cls.ackTimerHandle = None
 		# Wake up the thread. It will exit when it sees exit is True.
-		cls.queueApc(cls.executor)
+		cls.queueApc(cls.wake)
 		cls.thread.join(timeout)
 		cls.exit = False
 		winKernel.closeHandle(cls.handle)
@@ -2137,44 +2360,8 @@ class _BgThread:
 		cls.thread = None
 
 	@winKernel.PAPCFUNC
-	def executor(param):
-		if _BgThread.exit:
-			# func will see this and exit.
-			return
-		if not handler.display:
-			# Sometimes, the executor is triggered when a display is not fully initialized.
-			# For example, this happens when handling an ACK during initialisation.
-			# We can safely ignore this.
-			return
-		if handler.display._awaitingAck:
-			# Do not write cells when we are awaiting an ACK
-			return
-		with _BgThread.queuedWriteLock:
-			data = _BgThread.queuedWrite
-			_BgThread.queuedWrite = None
-		if not data:
-			return
-		try:
-			handler.display.display(data)
-		except:
-			log.error("Error displaying cells. Disabling display", exc_info=True)
-			handler.handleDisplayUnavailable()
-		else:
-			if handler.display.receivesAckPackets:
-				handler.display._awaitingAck = True
-				winKernel.setWaitableTimer(
-					_BgThread.ackTimerHandle,
-					int(handler.display.timeout*2000),
-					0,
-					_BgThread.ackTimeoutResetter
-				)
-
-	@winKernel.PAPCFUNC
-	def ackTimeoutResetter(param):
-		if handler.display.receivesAckPackets and handler.display._awaitingAck:
-			log.debugWarning("Waiting for %s ACK packet timed out"%handler.display.name)
-			handler.display._awaitingAck = False
-			_BgThread.queueApc(_BgThread.executor)
+	def wake(param):
+		"""Does nothing, but wakes the thread so it can check whether it should exit."""
 
 	@classmethod
 	def func(cls):
@@ -2183,6 +2370,43 @@ class _BgThread:
 			if cls.exit:
 				break
 
+
+class _ApcBrailleWriter(brailleWriter.BrailleWriter):
+	"""A L{brailleWriter.BrailleWriter} which writes on L{_BgThread} by queueing APCs.
+	The waitable timer of L{_BgThread} is used for acknowledgement timeouts.
+	"""
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		# The APC functions must stay alive while they are queued.
+		self._writeApc = winKernel.PAPCFUNC(self._apcWrite)
+		self._ackTimeoutApc = winKernel.PAPCFUNC(self._apcAckTimeout)
+
+	def _apcWrite(self, param):
+		if _BgThread.exit:
+			# func will see this and exit.
+			return
+		self._writeQueued()
+
+	def _apcAckTimeout(self, param):
+		self._handleAckTimeout()
+
+	def _wake(self):
+		_BgThread.queueApc(self._writeApc)
+
+	def _startAckTimer(self, timeout: float):
+		winKernel.setWaitableTimer(
+			_BgThread.ackTimerHandle,
+			int(timeout * 1000),
+			0,
+			self._ackTimeoutApc
+		)
+
+	def _cancelAckTimer(self):
+		if not ctypes.windll.kernel32.CancelWaitableTimer(_BgThread.ackTimerHandle):
+			raise ctypes.WinError()
+
+
 #: Maps old braille display driver names to new drivers that supersede old drivers.
 RENAMED_DRIVERS = {
 	"syncBraille":"hims",
@@ -2261,9 +2485,14 @@ class BrailleDisplayDriver(driverHandler.Driver):
 	_awaitingAck = False
 	#: Maximum timeout to use for communication with a device (in seconds).
 	#: This can be used for serial connections.
-	#: Furthermore, it is used by L{_BgThread} to stop waiting for missed acknowledgement packets.
+	#: Furthermore, it is used by L{brailleWriter.BrailleWriter} to stop waiting for missed acknowledgement packets.
 	#: @type: float
 	timeout = 0.2
+	#: Whether this driver can write a range of cells without writing the rest of the display.
+	#: If it can, L{displayRange} must be implemented
+	#: and NVDA will only send the cells which changed since the last write.
+	#: @type: bool
+	supportsPartialDisplay = False
 
 	@classmethod
 	def check(cls):
@@ -2313,6 +2542,14 @@ class BrailleDisplayDriver(driverHandler.Driver):
 		@type cells: [int, ...]
 		"""
 
+	def displayRange(self, cells: List[int], start: int):
+		"""Display braille cells starting at a given position, leaving the other cells unchanged.
+		This is only called if L{supportsPartialDisplay} is C{True}.
+		@param cells: The braille cells to display.
+		@param start: The zero based position on the display of the first cell.
+		"""
+		raise NotImplementedError
+
 	#: Automatic port constant to be used by braille displays that support the "automatic" port
 	#: Kept for backwards compatibility
 	AUTOMATIC_PORT = AUTOMATIC_PORT
@@ -2444,10 +2681,7 @@ class BrailleDisplayDriver(driverHandler.Driver):
 		"""Base implementation to handle acknowledgement packets."""
 		if not self.receivesAckPackets:
 			raise NotImplementedError("This display driver does not support ACK packet handling")
-		if not ctypes.windll.kernel32.CancelWaitableTimer(_BgThread.ackTimerHandle):
-			raise ctypes.WinError()
-		self._awaitingAck = False
-		_BgThread.queueApc(_BgThread.executor)
+		handler._writer.handleAck()
 
 	@classmethod
 	def DotFirmnessSetting(cls,defaultVal,minVal,maxVal,useConfig=False):
@@ -166,6 +166,8 @@ class BrailleDisplayDriver(braille.BrailleDisplayDriver, ScriptableObject):
 	description = _("Freedom Scientific Focus/PAC Mate series")
 	isThreadSafe = True
 	receivesAckPackets = True
+	# The write packet contains the offset of the first cell to write.
+	supportsPartialDisplay = True
 	timeout = 0.2
 
 	wizWheelActions = [
@@ -181,7 +183,11 @@ class BrailleDisplayDriver(braille.BrailleDisplayDriver, ScriptableObject):
 	def __init__(self, port="auto"):
 		self.numCells = 0
 		self._ackPending = False
+		#: Untranslated cells waiting for an ACK before they can be written.
 		self._pendingCells = []
+		#: The untranslated cells most recently given to L{display} or L{displayRange},
+		#: so that a range can be merged into a full frame while waiting for an ACK.
+		self._latestCells = []
 		self._keyBits = 0
 		self._extendedKeyBits = 0
 		self._ignoreKeyReleases = False
@@ -489,19 +495,43 @@ class BrailleDisplayDriver(braille.BrailleDisplayDriver, ScriptableObject):
 		return checksum
 
 	def display(self, cells: List[int]):
+		self._latestCells = list(cells)
+		if self._awaitingAck:
+			# Cells are kept untranslated, as they are translated when they are displayed after the ACK.
+			self._pendingCells = self._latestCells
+			return
 		if self.translationTable:
 			cells = _translate(cells, FOCUS_1_TRANSLATION_TABLE)
-		if not self._awaitingAck:
-			self._sendPacket(
-				FS_PKT_WRITE,
-				intToByte(self.numCells),
-				FS_BYTE_NULL,
-				FS_BYTE_NULL,
-				bytes(cells)
-			)
-			self._pendingCells = []
-		else:
-			self._pendingCells = cells
+		self._sendPacket(
+			FS_PKT_WRITE,
+			intToByte(self.numCells),
+			FS_BYTE_NULL,
+			FS_BYTE_NULL,
+			bytes(cells)
+		)
+		self._pendingCells = []
+
+	def displayRange(self, cells: List[int], start: int):
+		end = start + len(cells)
+		latestCells = self._latestCells
+		if len(latestCells) < end:
+			latestCells.extend([0] * (end - len(latestCells)))
+		latestCells[start:end] = cells
+		if self._awaitingAck:
+			# A partial write can't be sent until the ACK arrives,
+			# so write the whole display once it does,
+			# including any cells which were already pending.
+			self._pendingCells = latestCells
+			return
+		if self.translationTable:
+			cells = _translate(cells, FOCUS_1_TRANSLATION_TABLE)
+		self._sendPacket(
+			FS_PKT_WRITE,
+			intToByte(len(cells)),
+			intToByte(start),
+			FS_BYTE_NULL,
+			bytes(cells)
+		)
 
 	def _configureDisplay(self):
 		"""Enable extended keys on Focus firmware 3 and up"""
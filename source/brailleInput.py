@@ -10,6 +10,7 @@ import time
 from typing import Optional, List, Set
 
 import louis
+import louisHelper
 import brailleTables
 import braille
 import config
@@ -41,6 +42,8 @@ UNICODE_BRAILLE_START = 0x2800
 #: The Unicode braille character to use when masking cells in protected fields.
 #: @type: str
 UNICODE_BRAILLE_PROTECTED = u"⣿" # All dots down
+#: The maximum number of back-translations kept by L{BrailleInputHandler._backTranslate}.
+BACK_TRANSLATION_CACHE_SIZE = 256
 
 
 class BrailleInputHandler(AutoPropertyObject):
@@ -91,7 +94,15 @@ class BrailleInputHandler(AutoPropertyObject):
 		self._uncontSentTime = None
 		#: The modifiers currently being held virtually to be part of the next braille input gesture.
 		self.currentModifiers = set()
-		config.post_configProfileSwitch.register(self.handlePostConfigProfileSwitch)
+		#: Recent back-translations, mapping (table file name, mode, cells) to text.
+		#: See L{_backTranslate}.
+		self._backTranslationCache = {}
+		#: The number of back-translations found in and missing from L{_backTranslationCache}.
+		self._backTranslationCacheCounters = {"hits": 0, "misses": 0}
+		config.post_configProfileSwitch.register(
+			self.handlePostConfigProfileSwitch,
+			sections=(("braille", "inputTable"),)
+		)
 
 	# Provided by auto property: L{_get_table} and L{_set_table}
 	table: brailleTables.BrailleTable
@@ -104,6 +115,7 @@ class BrailleInputHandler(AutoPropertyObject):
 
 	def _set_table(self, table: brailleTables.BrailleTable):
 		self._table = table
+		self._backTranslationCache.clear()
 		config.conf["braille"]["inputTable"] = table.fileName
 
 	# Provided by auto property: L{_get_currentFocusIsTextObj}
@@ -131,14 +143,10 @@ class BrailleInputHandler(AutoPropertyObject):
 			self.bufferText = u""
 		oldTextLen = len(self.bufferText)
 		pos = self.untranslatedStart + self.untranslatedCursorPos
-		data = u"".join([chr(cell | LOUIS_DOTS_IO_START) for cell in self.bufferBraille[:pos]])
 		mode = louis.dotsIO | louis.noUndefinedDots
 		if (not self.currentFocusIsTextObj or self.currentModifiers) and self._table.contracted:
 			mode |=  louis.partialTrans
-		self.bufferText = louis.backTranslate(
-			[os.path.join(brailleTables.TABLES_DIR, self._table.fileName),
-			"braille-patterns.cti"],
-			data, mode=mode)[0]
+		self.bufferText = self._backTranslate(self.bufferBraille[:pos], mode)
 		newText = self.bufferText[oldTextLen:]
 		if newText:
 			# New text was generated by the cells just entered.
@@ -182,15 +190,40 @@ class BrailleInputHandler(AutoPropertyObject):
 		@return: The previous translated text.
 		@rtype: str
 		"""
-		cells = self.bufferBraille[:pos + 1]
-		data = u"".join([chr(cell | LOUIS_DOTS_IO_START) for cell in cells])
 		oldText = self.bufferText
-		text = louis.backTranslate(
+		self.bufferText = self._backTranslate(
+			self.bufferBraille[:pos + 1],
+			louis.dotsIO | louis.noUndefinedDots | louis.partialTrans
+		)
+		return oldText
+
+	def _backTranslate(self, cells: List[int], mode: int) -> str:
+		"""Back-translate cells using the input table.
+		Later cells can change the text produced by earlier cells,
+		so the text for some cells can't be derived from the text for fewer cells.
+		Instead, recent back-translations are cached,
+		since the same cells are often translated again;
+		e.g. when a cell is erased and typed again,
+		or when a cell is reported both while speaking typed characters and while translating.
+		@param cells: The cells to back-translate.
+		@param mode: The liblouis translation mode, which should include C{louis.dotsIO}.
+		@return: The text.
+		"""
+		key = (self._table.fileName, mode, tuple(cells))
+		text = self._backTranslationCache.get(key)
+		if text is not None:
+			self._backTranslationCacheCounters["hits"] += 1
+			return text
+		self._backTranslationCacheCounters["misses"] += 1
+		data = u"".join([chr(cell | LOUIS_DOTS_IO_START) for cell in cells])
+		text = louisHelper.backTranslate(
 			[os.path.join(brailleTables.TABLES_DIR, self._table.fileName),
 			"braille-patterns.cti"],
-			data, mode=louis.dotsIO | louis.noUndefinedDots | louis.partialTrans)[0]
-		self.bufferText = text
-		return oldText
+			data, mode=mode)[0]
+		if len(self._backTranslationCache) >= BACK_TRANSLATION_CACHE_SIZE:
+			self._backTranslationCache.clear()
+		self._backTranslationCache[key] = text
+		return text
 
 	def _reportContractedCell(self, pos):
 		"""Report a guess about the character(s) produced by a cell of contracted braille.
@@ -358,6 +391,7 @@ class BrailleInputHandler(AutoPropertyObject):
 			self.updateDisplay()
 
 	def flushBuffer(self):
+		self._backTranslationCache.clear()
 		self.bufferBraille = []
 		self.bufferText = u""
 		self.cellsWithText.clear()
@@ -438,6 +472,7 @@ class BrailleInputHandler(AutoPropertyObject):
 		table = config.conf["braille"]["inputTable"]
 		if table != self._table.fileName:
 			self._table = brailleTables.getTable(table)
+			self._backTranslationCache.clear()
 
 
 #: The singleton BrailleInputHandler instance.
@@ -0,0 +1,231 @@
+# A part of NonVisual Desktop Access (NVDA)
+# Copyright (C) 2020 NV Access Limited
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+
+"""Writing of braille cells to thread-safe braille displays in the background.
+Writes are coalesced: if several writes are queued while an earlier write is still in progress,
+only the last of them is performed.
+For displays which acknowledge packets, no further write is performed until the acknowledgement is received
+or until a timeout elapses.
+
+L{BrailleWriter} contains this logic, but leaves scheduling to subclasses.
+L{ThreadedBrailleWriter} is a portable implementation using a thread and a condition variable.
+C{braille._ApcBrailleWriter} performs the writes on the braille background thread using APCs.
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional
+
+from logHandler import log
+
+
+class BrailleWriter:
+	"""Coalesces writes of braille cells to a display and handles acknowledgements.
+	Subclasses must implement L{_wake}, L{_startAckTimer} and L{_cancelAckTimer}
+	so that L{_writeQueued} and L{_handleAckTimeout} are called on the thread used for writing.
+	"""
+
+	def __init__(
+			self,
+			getDisplay: Callable[[], object],
+			write: Callable[[List[int]], bool],
+			onWriteError: Callable[[], None],
+			onAckTimeout: Optional[Callable[[], None]] = None,
+	):
+		"""
+		@param getDisplay: Returns the current L{braille.BrailleDisplayDriver}, if any.
+		@param write: Writes cells to the display,
+			returning C{False} if nothing needed to be sent.
+		@param onWriteError: Called after a write raised an exception.
+		@param onAckTimeout: Called when waiting for an acknowledgement timed out.
+		"""
+		self._getDisplay = getDisplay
+		self._write = write
+		self._onWriteError = onWriteError
+		self._onAckTimeout = onAckTimeout
+		self._queuedWriteLock = threading.Lock()
+		#: Held while writing and while changing whether an acknowledgement is awaited,
+		#: so that an acknowledgement received on another thread can't be handled
+		#: before the write it acknowledges has finished.
+		self._writeLock = threading.RLock()
+		#: The cells to write next, if any.
+		self._queuedWrite: Optional[List[int]] = None
+		#: The number of writes sent to the display.
+		self.writeCount = 0
+		#: The number of queued writes which were replaced by a later write before being performed.
+		self.coalescedWriteCount = 0
+		#: The number of times waiting for an acknowledgement timed out.
+		self.ackTimeoutCount = 0
+
+	def start(self):
+		"""Prepare for writing. Does nothing by default."""
+
+	def stop(self, timeout: Optional[float] = None):
+		"""Stop writing. Does nothing by default.
+		@param timeout: The maximum time in seconds to wait for writing to stop.
+		"""
+
+	def queueWrite(self, cells: List[int]):
+		"""Queue cells to be written to the display, replacing any write which hasn't been performed yet.
+		"""
+		with self._queuedWriteLock:
+			alreadyQueued = self._queuedWrite is not None
+			self._queuedWrite = cells
+			if alreadyQueued:
+				self.coalescedWriteCount += 1
+		# If a write was already queued, we don't need to queue another;
+		# we just replaced the data.
+		if not alreadyQueued and not self._getDisplay()._awaitingAck:
+			self._wake()
+
+	def handleAck(self):
+		"""Handle an acknowledgement from the display, allowing the next write to be performed."""
+		with self._writeLock:
+			self._cancelAckTimer()
+			self._getDisplay()._awaitingAck = False
+		self._wake()
+
+	def _wake(self):
+		"""Arrange for L{_writeQueued} to be called on the thread used for writing."""
+		raise NotImplementedError
+
+	def _startAckTimer(self, timeout: float):
+		"""Arrange for L{_handleAckTimeout} to be called on the thread used for writing after a timeout.
+		@param timeout: The timeout in seconds.
+		"""
+		raise NotImplementedError
+
+	def _cancelAckTimer(self):
+		"""Cancel a timer started with L{_startAckTimer}."""
+		raise NotImplementedError
+
+	def _writeQueued(self):
+		"""Perform the queued write, if any."""
+		with self._writeLock:
+			self._writeQueuedLocked()
+
+	def _writeQueuedLocked(self):
+		display = self._getDisplay()
+		if not display:
+			# Sometimes, this is triggered when a display is not fully initialized.
+			# For example, this happens when handling an ACK during initialisation.
+			# We can safely ignore this.
+			return
+		if display._awaitingAck:
+			# Do not write cells when we are awaiting an ACK
+			return
+		with self._queuedWriteLock:
+			data = self._queuedWrite
+			self._queuedWrite = None
+		if not data:
+			return
+		try:
+			written = self._write(data)
+		except Exception:
+			log.error("Error displaying cells. Disabling display", exc_info=True)
+			self._onWriteError()
+			return
+		if not written:
+			return
+		self.writeCount += 1
+		if display.receivesAckPackets:
+			display._awaitingAck = True
+			self._startAckTimer(display.timeout * 2)
+
+	def _handleAckTimeout(self):
+		"""Stop waiting for an acknowledgement which didn't arrive in time and perform any queued write."""
+		with self._writeLock:
+			display = self._getDisplay()
+			if not display or not display.receivesAckPackets or not display._awaitingAck:
+				return
+			log.debugWarning("Waiting for %s ACK packet timed out" % display.name)
+			self.ackTimeoutCount += 1
+			if self._onAckTimeout:
+				self._onAckTimeout()
+			display._awaitingAck = False
+			self._writeQueuedLocked()
+
+
+class ThreadedBrailleWriter(BrailleWriter):
+	"""A L{BrailleWriter} which writes on its own thread.
+	The thread waits on a condition variable until a write is queued, an acknowledgement arrives
+	or the acknowledgement timeout elapses.
+	"""
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self._condition = threading.Condition()
+		self._thread: Optional[threading.Thread] = None
+		self._exit = False
+		#: Whether L{_writeQueued} should be called.
+		self._writePending = False
+		#: The time at which waiting for an acknowledgement times out, as returned by C{time.perf_counter}.
+		self._ackDeadline: Optional[float] = None
+
+	def start(self):
+		if self._thread:
+			return
+		self._exit = False
+		self._thread = threading.Thread(
+			name=f"{self.__class__.__module__}.{self.__class__.__qualname__}",
+			target=self._run
+		)
+		self._thread.daemon = True
+		self._thread.start()
+
+	def stop(self, timeout: Optional[float] = None):
+		if not self._thread:
+			return
+		with self._condition:
+			self._exit = True
+			self._condition.notify()
+		self._thread.join(timeout)
+		self._thread = None
+		self._writePending = False
+		self._ackDeadline = None
+
+	def _wake(self):
+		with self._condition:
+			self._writePending = True
+			self._condition.notify()
+
+	def _startAckTimer(self, timeout: float):
+		with self._condition:
+			self._ackDeadline = time.perf_counter() + timeout
+			self._condition.notify()
+
+	def _cancelAckTimer(self):
+		with self._condition:
+			self._ackDeadline = None
+			self._condition.notify()
+
+	def _waitForWork(self) -> Optional[Callable[[], None]]:
+		"""Wait until there is something to do.
+		@return: The method to call, or C{None} if the thread should exit.
+		"""
+		with self._condition:
+			while not self._exit:
+				if self._ackDeadline is not None:
+					# Writes must wait until the acknowledgement arrives.
+					remaining = self._ackDeadline - time.perf_counter()
+					if remaining <= 0:
+						self._ackDeadline = None
+						return self._handleAckTimeout
+					self._condition.wait(remaining)
+				elif self._writePending:
+					self._writePending = False
+					return self._writeQueued
+				else:
+					self._condition.wait()
+			return None
+
+	def _run(self):
+		while True:
+			func = self._waitForWork()
+			if not func:
+				break
+			# The condition isn't held while writing,
+			# so writes can be queued and acknowledgements handled in the meantime.
+			func()
@@ -9,9 +9,15 @@ import os
 import codecs
 import collections
 import re
+import sre_constants
+import sre_parse
+import json
 from logHandler import log
 import globalVars
 import config
+import buildVersion
+from fileUtils import FaultTolerantFile
+from typing import FrozenSet, NamedTuple, Optional, Pattern
 
 class LocaleDataMap(object):
 	"""Allows access to locale-specific data objects, dynamically loading them if needed on request"""
@@ -22,6 +28,10 @@ class LocaleDataMap(object):
 		""" 
 		self._localeDataFactory=localeDataFactory
 		self._dataMap={}
+		#: Incremented whenever data in this map is invalidated,
+		#: so that anything derived from the data can be discarded as well.
+		#: @type: int
+		self.version = 0
 
 	def fetchLocaleData(self,locale,fallback=True):
 		"""
@@ -55,6 +65,7 @@ class LocaleDataMap(object):
 		@param locale: The locale for which the data object should be invalidated.
 		@type locale: str
 		"""
+		self.version += 1
 		try:
 			del self._dataMap[locale]
 		except KeyError:
@@ -64,6 +75,7 @@ class LocaleDataMap(object):
 		"""Invalidate all data within this locale map.
 		This will cause a new data object to be created for every locale that is next requested.
 		"""
+		self.version += 1
 		self._dataMap.clear()
 
 class CharacterDescriptions(object):
@@ -387,6 +399,57 @@ def _getSpeechSymbolsForLocale(locale):
 		pass
 	return builtin, user
 
+#: The version of the format of symbol cache files.
+#: Increment this whenever the way symbols are computed or cached changes.
+SYMBOL_CACHE_FORMAT_VERSION = 2
+
+def _getSymbolCacheFileName(locale):
+	return os.path.join(globalVars.appArgs.configPath, "symbolCache", "%s.json" % locale)
+
+def _getSymbolSourceStats(locale):
+	"""Get the modification time and size of every file the symbols for a locale are computed from.
+	A file which doesn't exist is included with a time and size of C{None}.
+	@rtype: list of (str, int, int)
+	"""
+	fileNames = []
+	for sourceLocale in (locale, "en") if locale != "en" else (locale,):
+		if config.conf['speech']['includeCLDR']:
+			fileNames.append(os.path.join("locale", sourceLocale, "cldr.dic"))
+		fileNames.append(os.path.join("locale", sourceLocale, "symbols.dic"))
+	fileNames.append(os.path.join(globalVars.appArgs.configPath, "symbols-%s.dic" % locale))
+	stats = []
+	for fileName in fileNames:
+		fileName = os.path.abspath(fileName)
+		try:
+			st = os.stat(fileName)
+		except OSError:
+			stats.append((fileName, None, None))
+		else:
+			stats.append((fileName, st.st_mtime_ns, st.st_size))
+	return stats
+
+def _getSymbolCacheKey(sourceStats):
+	"""Get the data which must match for a symbol cache file to be used.
+	This is compared with data loaded from JSON, so tuples are converted to lists.
+	"""
+	return {
+		"formatVersion": SYMBOL_CACHE_FORMAT_VERSION,
+		"nvdaVersion": buildVersion.version,
+		"sources": [list(stat) for stat in sourceStats],
+	}
+
+class _LevelData(NamedTuple):
+	"""Data used by L{SpeechSymbolProcessor} to process text at a particular symbol level.
+	"""
+	#: The regexp matching symbols, leaving out those which have no effect at this level.
+	regexp: Pattern
+	#: Characters at least one of which must be present for L{regexp} to match,
+	#: apart from trailing spaces and repeated characters matched by L{noOpRepeated}.
+	#: C{None} if unknown.
+	triggerChars: Optional[FrozenSet[str]]
+	#: Matches repeated characters which are otherwise left out of L{triggerChars}.
+	noOpRepeated: Optional[Pattern]
+
 class SpeechSymbolProcessor(object):
 	"""
 	Handles processing of symbol pronunciation for a locale.
@@ -402,30 +465,90 @@ class SpeechSymbolProcessor(object):
 		@type locale: str
 		"""
 		self.locale = locale
-
+		self._sources = self._builtinSources = self._userSymbols = None
+		startTime = time.perf_counter()
+		sourceStats = _getSymbolSourceStats(locale)
+		fromCache = self._loadFromCache(sourceStats)
+		if not fromCache:
+			self._computeSymbols()
+		complexSymbols = set(self._computedComplexSymbolsList)
+		# Single character simple symbols.
+		characters = self._characters = []
+		# Multi-character simple symbols.
+		multiChars = self._multiChars = []
+		for symbol in self.computedSymbols.values():
+			if symbol in complexSymbols:
+				continue
+			if len(symbol.identifier) == 1:
+				characters.append(symbol.identifier)
+			else:
+				multiChars.append(symbol.identifier)
+		# The simple symbols must be ordered longest first so that the longer symbols will match.
+		multiChars.sort(key=lambda identifier: len(identifier), reverse=True)
+		self._complexFirstChars = self._getComplexFirstChars()
+		computeTime = time.perf_counter()
+		#: Maps symbol levels to the L{_LevelData} used at that level.
+		self._levelData = {}
+		try:
+			# Compile the regexp for the configured level now,
+			# both so the first utterance doesn't pay for it and so invalid complex symbols are caught.
+			self._getLevelData(config.conf["speech"]["symbolLevel"])
+		except re.error as e:
+			log.error("Invalid complex symbol regular expression in locale %s: %s" % (locale, e))
+			raise LookupError
+		compileTime = time.perf_counter()
+		if not fromCache:
+			self._saveToCache(sourceStats)
+		log.debug(
+			f"Symbol processor for locale {locale}: "
+			f"{'loaded from cache' if fromCache else 'computed'} in {(computeTime - startTime) * 1000:.1f} ms, "
+			f"regexp compiled in {(compileTime - computeTime) * 1000:.1f} ms"
+		)
+
+	def _loadSources(self):
 		# We need to merge symbol data from several sources.
-		sources = self.sources = []
-		builtin, user = self.localeSymbols.fetchLocaleData(locale,fallback=False)
-		self.builtinSources = [builtin]
-		self.userSymbols = user
+		sources = self._sources = []
+		builtin, user = self.localeSymbols.fetchLocaleData(self.locale, fallback=False)
+		self._builtinSources = [builtin]
+		self._userSymbols = user
 		sources.append(user)
 		sources.append(builtin)
 
 		# Always use English as a base.
-		if locale != "en":
+		if self.locale != "en":
 			# Only the builtin data.
 			enBaseSymbols = self.localeSymbols.fetchLocaleData("en")[0]
 			sources.append(enBaseSymbols)
-			self.builtinSources.append(enBaseSymbols)
-
+			self._builtinSources.append(enBaseSymbols)
+
+	# The symbol sources are only loaded when needed,
+	# as the computed symbols are usually loaded from the cache.
+	@property
+	def sources(self):
+		if self._sources is None:
+			self._loadSources()
+		return self._sources
+
+	@property
+	def builtinSources(self):
+		if self._builtinSources is None:
+			self._loadSources()
+		return self._builtinSources
+
+	@property
+	def userSymbols(self):
+		if self._userSymbols is None:
+			self._loadSources()
+		return self._userSymbols
+
+	def _computeSymbols(self):
+		"""Merge the symbol data from all sources.
+		"""
+		sources = self.sources
 		# The computed symbol information from all sources.
 		symbols = self.computedSymbols = collections.OrderedDict()
 		# An indexable list of complex symbols for use in building/executing the regexp.
 		complexSymbolsList = self._computedComplexSymbolsList = []
-		# A list of multi-character simple symbols for use in building the regexp.
-		multiChars = []
-		# A list of single character symbols for use in building the regexp.
-		characters = []
 
 		# Add all complex symbols first, as they take priority.
 		for source in sources:
@@ -447,10 +570,6 @@ class SpeechSymbolProcessor(object):
 					# This is a new simple symbol.
 					# (All complex symbols have already been added.)
 					symbol = symbols[identifier] = SpeechSymbol(identifier)
-					if len(identifier) == 1:
-						characters.append(identifier)
-					else:
-						multiChars.append(identifier)
 				# If fields weren't explicitly specified, inherit the value from later sources.
 				if symbol.replacement is None:
 					symbol.replacement = sourceSymbol.replacement
@@ -469,13 +588,6 @@ class SpeechSymbolProcessor(object):
 				log.warning(u"Replacement not defined in locale {locale} for symbol: {symbol}".format(
 					symbol=symbol.identifier, locale=self.locale))
 				del symbols[symbol.identifier]
-				try:
-					if len(symbol.identifier) == 1:
-						characters.remove(symbol.identifier)
-					else:
-						multiChars.remove(symbol.identifier)
-				except ValueError:
-					pass
 				try:
 					complexSymbolsList.remove(symbol)
 				except ValueError:
@@ -488,12 +600,29 @@ class SpeechSymbolProcessor(object):
 			if symbol.displayName is None:
 				symbol.displayName = symbol.identifier
 
+	@staticmethod
+	def _isNoOpAtLevel(symbol, level):
+		"""Whether a symbol is always replaced with itself at the given level.
+		This is the case when it is above the level and is either preserved or a space,
+		which would be replaced with a space.
+		"""
+		return level < symbol.level and (
+			symbol.preserve in (SYMPRES_ALWAYS, SYMPRES_NOREP)
+			or symbol.identifier == " "
+		)
+
+	def _buildPattern(self, levelCharacters):
+		"""Build the regexp pattern for matching symbols at a level.
+		Single character simple symbols which are replaced with themselves at the level are left out,
+		since matching them would just waste a call to L{_regexpRepl}.
+		As they only ever match a single character, leaving them out doesn't change what the other symbols match.
+		They are still matched when repeated.
+		@param levelCharacters: The single character simple symbols which have an effect at the level.
+		@type levelCharacters: str
+		@rtype: str
+		"""
 		# Make characters into a regexp character set.
-		characters = "[%s]" % re.escape("".join(characters))
-		# The simple symbols must be ordered longest first so that the longer symbols will match.
-		multiChars.sort(key=lambda identifier: len(identifier), reverse=True)
-
-		# Build the regexp.
+		characters = "[%s]" % re.escape("".join(self._characters))
 		patterns = [
 			# Strip repeated spaces from the end of the line to stop them from being picked up by repeated.
 			r"(?P<rstripSpace>  +$)",
@@ -504,20 +633,108 @@ class SpeechSymbolProcessor(object):
 		# Each complex symbol has its own named group so we know which symbol matched.
 		patterns.extend(
 			u"(?P<c{index}>{pattern})".format(index=index, pattern=symbol.pattern)
-			for index, symbol in enumerate(complexSymbolsList))
+			for index, symbol in enumerate(self._computedComplexSymbolsList))
 		# Simple symbols.
 		# These are all handled in one named group.
 		# Because the symbols are just text, we know which symbol matched just by looking at the matched text.
-		patterns.append(r"(?P<simple>{multiChars}|{singleChars})".format(
-			multiChars="|".join(re.escape(identifier) for identifier in multiChars),
-			singleChars=characters
-		))
-		pattern = "|".join(patterns)
+		simple = [re.escape(identifier) for identifier in self._multiChars]
+		if levelCharacters:
+			simple.append("[%s]" % re.escape(levelCharacters))
+		if simple:
+			patterns.append(r"(?P<simple>{})".format("|".join(simple)))
+		return "|".join(patterns)
+
+	def _getLevelData(self, level):
 		try:
-			self._regexp = re.compile(pattern, re.UNICODE)
-		except re.error as e:
-			log.error("Invalid complex symbol regular expression in locale %s: %s" % (locale, e))
-			raise LookupError
+			return self._levelData[level]
+		except KeyError:
+			pass
+		levelCharacters = []
+		noOpCharacters = []
+		for identifier in self._characters:
+			if self._isNoOpAtLevel(self.computedSymbols[identifier], level):
+				noOpCharacters.append(identifier)
+			else:
+				levelCharacters.append(identifier)
+		levelCharacters = "".join(levelCharacters)
+		regexp = re.compile(self._buildPattern(levelCharacters), re.UNICODE)
+		if self._complexFirstChars is not None:
+			triggerChars = frozenset(levelCharacters).union(
+				self._complexFirstChars,
+				(identifier[0] for identifier in self._multiChars)
+			)
+		else:
+			triggerChars = None
+		if noOpCharacters:
+			noOpRepeated = re.compile(r"([%s])\1{3}" % re.escape("".join(noOpCharacters)), re.UNICODE)
+		else:
+			noOpRepeated = None
+		data = self._levelData[level] = _LevelData(regexp, triggerChars, noOpRepeated)
+		return data
+
+	def _getComplexFirstChars(self):
+		"""Get the characters with which matches of the complex symbols can start.
+		@return: The characters, or C{None} if they can't be determined for some complex symbol.
+		@rtype: frozenset
+		"""
+		chars = set()
+		for symbol in self._computedComplexSymbolsList:
+			try:
+				firstChars = _getRegexpFirstChars(sre_parse.parse(symbol.pattern))
+			except (re.error, RecursionError):
+				firstChars = None
+			if firstChars is None:
+				log.debug(f"Can't determine first characters of complex symbol {symbol.identifier!r} in locale {self.locale}")
+				return None
+			chars.update(firstChars)
+		return frozenset(chars)
+
+	def _loadFromCache(self, sourceStats):
+		"""Load computed symbols from the cache if they are still valid for the given sources.
+		@return: Whether the symbols were loaded.
+		@rtype: bool
+		"""
+		try:
+			with open(_getSymbolCacheFileName(self.locale), "r", encoding="utf-8") as f:
+				data = json.load(f)
+		except FileNotFoundError:
+			return False
+		except (IOError, ValueError):
+			log.debugWarning("Error reading symbol cache for locale %s" % self.locale, exc_info=True)
+			return False
+		if data.get("key") != _getSymbolCacheKey(sourceStats):
+			return False
+		try:
+			symbols = collections.OrderedDict()
+			for identifier, pattern, replacement, level, preserve, displayName in data["symbols"]:
+				symbols[identifier] = SpeechSymbol(identifier, pattern, replacement, level, preserve, displayName)
+			complexSymbolsList = [symbols[identifier] for identifier in data["complexSymbols"]]
+		except (KeyError, TypeError, ValueError):
+			log.debugWarning("Invalid symbol cache for locale %s" % self.locale, exc_info=True)
+			return False
+		self.computedSymbols = symbols
+		self._computedComplexSymbolsList = complexSymbolsList
+		return True
+
+	def _saveToCache(self, sourceStats):
+		if globalVars.appArgs.secure or globalVars.appArgs.launcher:
+			# Don't write to the configuration directory, just as the configuration itself is not saved.
+			return
+		data = {
+			"key": _getSymbolCacheKey(sourceStats),
+			"symbols": [
+				(symbol.identifier, symbol.pattern, symbol.replacement, symbol.level, symbol.preserve, symbol.displayName)
+				for symbol in self.computedSymbols.values()
+			],
+			"complexSymbols": [symbol.identifier for symbol in self._computedComplexSymbolsList],
+		}
+		fileName = _getSymbolCacheFileName(self.locale)
+		try:
+			os.makedirs(os.path.dirname(fileName), exist_ok=True)
+			with FaultTolerantFile(fileName) as f:
+				f.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+		except (IOError, OSError):
+			log.debugWarning("Error writing symbol cache for locale %s" % self.locale, exc_info=True)
 
 	def _regexpRepl(self, m):
 		group = m.lastgroup
@@ -554,8 +771,17 @@ class SpeechSymbolProcessor(object):
 				return suffix
 
 	def processText(self, text, level):
+		levelData = self._getLevelData(level)
+		if (
+			levelData.triggerChars is not None
+			and levelData.triggerChars.isdisjoint(text)
+			and not text.endswith(("  ", "  \n"))
+			and not (levelData.noOpRepeated and levelData.noOpRepeated.search(text))
+		):
+			# Most text is just words, which contain no symbols which have an effect at this level.
+			return text
 		self._level = level
-		return self._regexp.sub(self._regexpRepl, text)
+		return levelData.regexp.sub(self._regexpRepl, text)
 
 	def updateSymbol(self, newSymbol):
 		"""Update information for a symbol if it has changed.
@@ -624,6 +850,54 @@ class SpeechSymbolProcessor(object):
 		"""
 		return any(symbolIdentifier in source.symbols for source in self.builtinSources)
 
+def _getRegexpFirstChars(items):
+	"""Get the characters with which a match of a parsed regular expression can start.
+	This is conservative: if it can't be determined from the constructs used, C{None} is returned.
+	@param items: The result of C{sre_parse.parse} or a sub-sequence of it.
+	@return: The characters, or C{None} if they are unknown or the expression can match the empty string.
+	@rtype: set
+	"""
+	if isinstance(items, sre_parse.SubPattern) and items.state.flags & re.IGNORECASE:
+		return None
+	for op, av in items:
+		if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+			# Zero width, so the match starts with whatever follows.
+			continue
+		if op is sre_constants.LITERAL:
+			return {chr(av)}
+		if op is sre_constants.IN:
+			chars = set()
+			for setOp, setAv in av:
+				if setOp is sre_constants.LITERAL:
+					chars.add(chr(setAv))
+				elif setOp is sre_constants.RANGE and setAv[1] - setAv[0] < 256:
+					chars.update(chr(c) for c in range(setAv[0], setAv[1] + 1))
+				else:
+					# Negated sets and categories such as \w can match too many characters.
+					return None
+			return chars
+		if op is sre_constants.SUBPATTERN:
+			group, addFlags, delFlags, subItems = av
+			if addFlags & re.IGNORECASE:
+				return None
+			return _getRegexpFirstChars(subItems)
+		if op is sre_constants.BRANCH:
+			chars = set()
+			for branch in av[1]:
+				branchChars = _getRegexpFirstChars(branch)
+				if branchChars is None:
+					return None
+				chars.update(branchChars)
+			return chars
+		if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+			minCount, maxCount, subItems = av
+			if minCount == 0:
+				return None
+			return _getRegexpFirstChars(subItems)
+		return None
+	# Nothing is consumed, so this can match the empty string.
+	return None
+
 _localeSpeechSymbolProcessors = LocaleDataMap(SpeechSymbolProcessor)
 
 def processSpeechSymbols(locale, text, level):
@@ -668,6 +942,16 @@ def clearSpeechSymbols():
 	SpeechSymbolProcessor.localeSymbols.invalidateAllData()
 	_localeSpeechSymbolProcessors.invalidateAllData()
 
+def getSpeechSymbolsVersion():
+	"""Get a value which changes whenever the result of L{processSpeechSymbols} might have changed for the same arguments;
+	i.e. when symbol data is invalidated.
+	The only configuration the symbol data depends on is whether CLDR data is included,
+	and changing that clears the symbol data with L{clearSpeechSymbols},
+	whether on a configuration profile switch, in the settings or by command.
+	@rtype: int
+	"""
+	return _localeSpeechSymbolProcessors.version
+
 def handlePostConfigProfileSwitch(prevConf=None):
 	if not prevConf:
 		return
@@ -675,4 +959,4 @@ def handlePostConfigProfileSwitch(prevConf=None):
 		# Either included or excluded CLDR data, so clear the cache.
 		clearSpeechSymbols()
 
-config.post_configProfileSwitch.register(handlePostConfigProfileSwitch)
+config.post_configProfileSwitch.register(handlePostConfigProfileSwitch, sections=(("speech", "includeCLDR"),))
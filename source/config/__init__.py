@@ -19,6 +19,7 @@ import os
 import sys
 import itertools
 import contextlib
+import io
 from copy import deepcopy
 from collections import OrderedDict
 from configobj import ConfigObj
@@ -33,6 +34,7 @@ from fileUtils import FaultTolerantFile
 import winKernel
 import extensionPoints
 from . import profileUpgrader
+from .profileWriter import ProfileWriter
 from .configSpec import confspec
 from typing import Optional, List
 
@@ -43,11 +45,96 @@ isAppX=False
 #: @type: ConfigManager
 conf = None
 
+
+def getChangedKeys(oldConf, newConf, path=()):
+	"""Get the paths of the values which differ between two configurations.
+	A value which is only present in one of the configurations has changed.
+	@param oldConf: The old configuration, as returned by L{AggregatedSection.dict}.
+	@type oldConf: dict
+	@param newConf: The new configuration, as returned by L{AggregatedSection.dict}.
+	@type newConf: dict
+	@param path: The path of the section being compared.
+	@return: The paths of the changed values; e.g. C{("speech", "espeak", "rate")}.
+	@rtype: set of tuple of str
+	"""
+	changed = set()
+	for key in oldConf.keys() | newConf.keys():
+		oldVal = oldConf.get(key)
+		newVal = newConf.get(key)
+		if isinstance(oldVal, dict) and isinstance(newVal, dict):
+			changed.update(getChangedKeys(oldVal, newVal, path + (key,)))
+		elif oldVal != newVal or (key in oldConf) != (key in newConf):
+			changed.add(path + (key,))
+	return changed
+
+
+class ProfileSwitchAction(extensionPoints.Action):
+	"""Notifies about configuration profile switches.
+	Handlers can be registered for particular sections,
+	in which case they are only called when a value in one of those sections has changed.
+	Handlers are called with the previous configuration as C{prevConf}
+	and the paths of the changed values as C{changedKeys} (see L{getChangedKeys}),
+	if they accept those arguments.
+	"""
+
+	def __init__(self):
+		super().__init__()
+		#: Maps handler keys to the sections the handler depends on, as tuples of keys.
+		self._handlerSections = {}
+
+	def register(self, handler, sections=None):
+		"""
+		@param sections: The sections or values the handler depends on,
+			either as names of top level sections or as tuples of keys; e.g. C{("speech", "includeCLDR")}.
+			If C{None}, the handler is called for every profile switch.
+		@type sections: iterable of str or tuple of str
+		"""
+		super().register(handler)
+		key = extensionPoints.util._getHandlerKey(handler)
+		if sections is None:
+			self._handlerSections.pop(key, None)
+		else:
+			self._handlerSections[key] = frozenset(
+				(section,) if isinstance(section, str) else tuple(section)
+				for section in sections
+			)
+
+	def unregister(self, handler):
+		if isinstance(handler, (extensionPoints.util.AnnotatableWeakref, extensionPoints.BoundMethodWeakref)):
+			key = handler.handlerKey
+		else:
+			key = extensionPoints.util._getHandlerKey(handler)
+		self._handlerSections.pop(key, None)
+		return super().unregister(handler)
+
+	def notify(self, changedKeys=None, **kwargs):
+		"""Notify the registered handlers which depend on the changed values.
+		@param changedKeys: The paths of the changed values, or C{None} to notify all handlers.
+		@type changedKeys: set of tuple of str
+		@param kwargs: Further arguments to pass to the handlers.
+		"""
+		for key, handler, callPlan in self._getHandlerEntries():
+			sections = self._handlerSections.get(key)
+			if changedKeys is not None and sections is not None and not any(
+				changed[:len(section)] == section
+				for changed in changedKeys
+				for section in sections
+			):
+				continue
+			try:
+				callPlan.call(handler, changedKeys=changedKeys, **kwargs)
+			except:
+				log.exception("Error running handler %r for %r" % (handler, self))
+
+
 #: Notifies when the configuration profile is switched.
 #: This allows components and add-ons to apply changes required by the new configuration.
 #: For example, braille switches braille displays if necessary.
-#: Handlers are called with no arguments.
-post_configProfileSwitch = extensionPoints.Action()
+#: Handlers are called with the previous configuration as C{prevConf}
+#: and the paths of the values which changed as C{changedKeys}, if they accept those arguments.
+#: Handlers which only depend on some sections should register for those sections,
+#: so they aren't called needlessly; see L{ProfileSwitchAction.register}.
+post_configProfileSwitch = ProfileSwitchAction()
 #: Notifies when NVDA is saving current configuration.
 #: Handlers can listen to "pre" and/or "post" action to perform tasks prior to and/or after NVDA's own configuration is saved.
 #: Handlers are called with no arguments.
@@ -65,6 +152,8 @@ def initialize():
 
 def saveOnExit():
 	"""Save the configuration if configured to save on exit.
+	Any saves still pending in the background are completed regardless,
+	and the thread which writes them is stopped.
 	This should only be called if NVDA is about to exit.
 	Errors are ignored.
 	"""
@@ -73,6 +162,10 @@ def saveOnExit():
 			conf.save()
 		except:
 			pass
+	try:
+		conf.terminate()
+	except:
+		pass
 
 def isInstalledCopy():
 	"""Checks to see if this running copy of NVDA is installed on the system"""
@@ -385,6 +478,11 @@ class ConfigManager(object):
 		self.profileTriggersEnabled: bool = True
 		self.validator: Validator = Validator()
 		self.rootSection: Optional[AggregatedSection] = None
+		#: Incremented whenever configuration values might have changed;
+		#: i.e. on every profile switch and every write.
+		self.generation: int = 0
+		#: Fast read-only access to configuration values. See L{ConfigSnapshot}.
+		self.snapshot = ConfigSnapshot(self)
 		self._shouldHandleProfileSwitch: bool = True
 		self._pendingHandleProfileSwitch: bool = False
 		self._suspendedTriggers: Optional[List[ProfileTrigger]] = None
@@ -399,6 +497,8 @@ class ConfigManager(object):
 		self._loadProfileTriggers()
 		#: The names of all profiles that have been modified since they were last saved.
 		self._dirtyProfiles: Set[str] = set()
+		#: Writes configuration files in the background.
+		self._profileWriter = ProfileWriter()
 
 	def _handleProfileSwitch(self, shouldNotify=True):
 		if not self._shouldHandleProfileSwitch:
@@ -408,11 +508,14 @@ class ConfigManager(object):
 		init = currentRootSection is None
 		# Reset the cache.
 		self.rootSection = AggregatedSection(self, (), self.spec, self.profiles)
+		self.generation += 1
 		if init:
 			# We're still initialising, so don't notify anyone about this change.
 			return
 		if shouldNotify:
-			post_configProfileSwitch.notify(prevConf=currentRootSection.dict())
+			prevConf = currentRootSection.dict()
+			changedKeys = getChangedKeys(prevConf, self.rootSection.dict())
+			post_configProfileSwitch.notify(prevConf=prevConf, changedKeys=changedKeys)
 
 	def _initBaseConf(self, factoryDefaults=False):
 		fn = os.path.join(globalVars.appArgs.configPath, "nvda.ini")
@@ -549,33 +652,102 @@ class ConfigManager(object):
 		with FaultTolerantFile(filename) as f:
 			profile.write(f)
 
-	def save(self):
-		"""Save all modified profiles and the base configuration to disk.
+	@staticmethod
+	def _serializeProfile(profile):
+		"""Get the content of the file for a profile.
+		@type profile: ConfigObj
+		@rtype: bytes
+		"""
+		buf = io.BytesIO()
+		profile.write(buf)
+		return buf.getvalue()
+
+	def _queueSave(self):
+		"""Queue the base configuration and all modified profiles to be written in the background.
+		The profiles are serialized immediately, so later changes don't affect what is written.
+		@return: The names of the modified profiles which were queued,
+			or C{None} if profiles shouldn't be written at all.
+		@rtype: set of str
 		"""
 		# #7598: give others a chance to either save settings early or terminate tasks.
 		pre_configSave.notify()
 		if not self._shouldWriteProfile:
 			log.info("Not writing profile, either --secure or --launcher args present")
+			return None
+		# Profiles are no longer dirty once they are queued,
+		# so try files which couldn't be written again.
+		failedFilenames = self._profileWriter.takeFailedFilenames()
+		if failedFilenames:
+			self._dirtyProfiles.update(
+				name for name, profile in self._profileCache.items()
+				if name is not None and profile.filename in failedFilenames
+			)
+			triggersProfile = self.triggersToProfiles.parent
+			if triggersProfile.filename in failedFilenames:
+				self._profileWriter.queue(triggersProfile.filename, self._serializeProfile(triggersProfile))
+		self._profileWriter.queue(self.profiles[0].filename, self._serializeProfile(self.profiles[0]))
+		for name in self._dirtyProfiles:
+			profile = self._profileCache[name]
+			self._profileWriter.queue(profile.filename, self._serializeProfile(profile))
+		queued = set(self._dirtyProfiles)
+		self._dirtyProfiles.clear()
+		return queued
+
+	def save(self):
+		"""Save all modified profiles and the base configuration to disk.
+		This waits until the files have been written.
+		Use L{saveLater} if the caller doesn't need to wait.
+		"""
+		queued = self._queueSave()
+		if queued is None:
 			return
 		try:
-			self._writeProfileToFile(self.profiles[0].filename, self.profiles[0])
-			log.info("Base configuration saved")
-			for name in self._dirtyProfiles:
-				self._writeProfileToFile(self._profileCache[name].filename, self._profileCache[name])
-				log.info("Saved configuration profile %s" % name)
-			self._dirtyProfiles.clear()
+			self._profileWriter.flush()
 		except Exception as e:
+			# Profiles which couldn't be written are tried again next time; see L{_queueSave}.
 			log.warning("Error saving configuration; probably read only file system")
 			log.debugWarning("", exc_info=True)
 			raise e
+		log.info("Configuration saved")
+		post_configSave.notify()
+
+	def saveLater(self):
+		"""Save all modified profiles and the base configuration to disk in the background.
+		Saves requested in quick succession are coalesced.
+		Errors are logged rather than raised,
+		and profiles which couldn't be written are written again by the next save.
+		L{post_configSave} is notified once the configuration has been queued for writing.
+		"""
+		if self._queueSave() is None:
+			return
 		post_configSave.notify()
 
+	def flushPendingSaves(self):
+		"""Write any configuration files queued to be written in the background immediately.
+		This should be called before NVDA exits and before reading configuration files from disk.
+		@raise Exception: If a file couldn't be written.
+		"""
+		self._profileWriter.flush()
+
+	def terminate(self):
+		"""Write any configuration files queued to be written in the background
+		and stop the thread which writes them.
+		This should only be called if NVDA is about to exit.
+		@raise Exception: If a file couldn't be written.
+		"""
+		self._profileWriter.terminate()
+
 	def reset(self, factoryDefaults=False):
 		"""Reset the configuration to saved settings or factory defaults.
 		@param factoryDefaults: C{True} to reset to factory defaults, C{False} to reset to saved configuration.
 		@type factoryDefaults: bool
 		"""
 		pre_configReset.notify(factoryDefaults=factoryDefaults)
+		try:
+			# The saved configuration is about to be read, so it must be up to date.
+			self.flushPendingSaves()
+		except Exception:
+			log.debugWarning("Error writing pending configuration", exc_info=True)
 		self.profiles = []
 		self._profileCache.clear()
 		# Signal that we're initialising.
@@ -612,6 +784,8 @@ class ConfigManager(object):
 		fn = self._getProfileFn(name)
 		if not os.path.isfile(fn):
 			raise LookupError("No such profile: %s" % name)
+		# A pending write would recreate the file, so discard it and wait for any write in progress.
+		self._profileWriter.discard(fn)
 		os.remove(fn)
 		# Remove the script for the deleted profile from the script collector.
 		# Import late to avoid circular import.
@@ -670,6 +844,8 @@ class ConfigManager(object):
 		if oldName.lower() != newName.lower() and os.path.isfile(newFn):
 			raise ValueError("A profile with the same name already exists: %s" % newName)
 
+		# A pending write would recreate the file with the old name.
+		self.flushPendingSaves()
 		os.rename(oldFn, newFn)
 		# Update any associated triggers.
 		allTriggers = self.triggersToProfiles
@@ -837,8 +1013,9 @@ class ConfigManager(object):
 		if globalVars.appArgs.secure:
 			# Never save if running securely.
 			return
-		self.triggersToProfiles.parent.write()
-		log.info("Profile triggers saved")
+		cobj = self.triggersToProfiles.parent
+		self._profileWriter.queue(cobj.filename, self._serializeProfile(cobj))
+		log.info("Profile triggers queued to be saved")
 
 	def _getSpecFromKeyPath(self, keyPath):
 		if not keyPath or len(keyPath) < 1:
@@ -889,6 +1066,57 @@ class ConfigValidationData(object):
 	# the default value, used when config is missing.
 	default = None  # converted to the appropriate type
 
+class ConfigSnapshot(object):
+	"""Fast read-only access to configuration values by their full path.
+	For example, C{config.conf.snapshot["braille", "wordWrap"]} is equivalent to
+	C{config.conf["braille"]["wordWrap"]}, but is much cheaper,
+	so it should be used in code which reads configuration very often.
+	Values are kept in a flat dict keyed by path.
+	The dict is discarded whenever L{ConfigManager.generation} changes
+	and is lazily filled again as values are read.
+	Sections aren't kept, nor are values in L{ConfigManager.BASE_ONLY_SECTIONS},
+	which can be changed without going through the manager.
+	"""
+
+	def __init__(self, manager):
+		self._manager = manager
+		#: The generation of the manager for which L{_values} is valid.
+		self._generation = None
+		#: Maps paths to values.
+		self._values = {}
+
+	def __getitem__(self, path):
+		"""Get a configuration value.
+		@param path: The keys to the value; e.g. C{("braille", "wordWrap")}.
+		@type path: tuple of str
+		@raise KeyError: If there is no such value.
+		"""
+		manager = self._manager
+		generation = manager.generation
+		values = self._values
+		if self._generation != generation:
+			# The configuration might have changed.
+			# Use a new dict, so another thread still reading the old one can't affect this one.
+			values = self._values = {}
+			self._generation = generation
+		try:
+			return values[path]
+		except KeyError:
+			pass
+		val = manager
+		for key in path:
+			val = val[key]
+		if not isinstance(val, AggregatedSection) and path[0] not in manager.BASE_ONLY_SECTIONS:
+			values[path] = val
+		return val
+
+	def get(self, path, default=None):
+		try:
+			return self[path]
+		except KeyError:
+			return default
+
+
 class AggregatedSection(object):
 	"""A view of a section of configuration which aggregates settings from all active profiles.
 	"""
@@ -1050,6 +1278,7 @@ class AggregatedSection(object):
 			updateSect = self._getUpdateSection()
 			updateSect[key] = val
 			self.manager._markWriteProfileDirty()
+			self.manager.generation += 1
 			# ConfigObj will have mutated this into a configobj.Section.
 			val = updateSect[key]
 			cache = self._cache.get(key)
@@ -1084,6 +1313,7 @@ class AggregatedSection(object):
 		self._getUpdateSection()[key] = val
 		self.manager._markWriteProfileDirty()
 		self._cache[key] = val
+		self.manager.generation += 1
 
 	def _getUpdateSection(self):
 		profile = self.profiles[-1]
@@ -1115,6 +1345,8 @@ class AggregatedSection(object):
 		# Clear it and replace the content so it remains linked to the main spec.
 		self._spec.clear()
 		self._spec.update(val)
+		# Defaults might have changed.
+		self.manager.generation += 1
 
 class ProfileTrigger(object):
 	"""A trigger for automatic activation/deactivation of a configuration profile.
@@ -25,6 +25,9 @@ schemaVersion = integer(min=0, default={latestSchemaVersion})
 	#possible log levels are DEBUG, IO, DEBUGWARNING, INFO
 	loggingLevel = string(default="INFO")
 	showWelcomeDialogAtStartup = boolean(default=true)
+	# The maximum time in milliseconds to spend executing queued events in one core pump; 0 for no limit.
+	# Remaining events are executed in the next pump.
+	eventQueueTimeBudgetMs = integer(min=0, max=1000, default=50)
 
 # Speech settings
 [speech]
@@ -0,0 +1,200 @@
+# A part of NonVisual Desktop Access (NVDA)
+# Copyright (C) 2020 NV Access Limited
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+
+"""Writes configuration files to disk on a background thread.
+Writing to a slow disk (e.g. a roaming profile on a network share) can take a long time,
+so this shouldn't be done on the main thread.
+Writes queued in quick succession are coalesced, so each file is only written once for a burst of saves.
+Each file is written to a temporary file which then replaces the original,
+so an interrupted write never leaves a partially written file behind.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+from fileUtils import FaultTolerantFile
+from logHandler import log
+
+#: The time in seconds to wait after the last queued write before writing.
+DEFAULT_DEBOUNCE = 1.0
+#: The maximum time in seconds a queued write can be delayed by later writes.
+DEFAULT_MAX_DELAY = 10.0
+
+
+def writeFileAtomically(filename: str, data: bytes):
+	"""Write data to a file, replacing the file only once all of the data has been written.
+	If writing fails, the original file is left unchanged.
+	"""
+	with FaultTolerantFile(filename) as f:
+		f.write(data)
+
+
+class ProfileWriter:
+	"""Writes configuration files to disk on a background thread.
+	Use L{queue} to write a file in the background and L{flush} to write queued files immediately.
+	"""
+
+	def __init__(
+			self,
+			debounce: float = DEFAULT_DEBOUNCE,
+			maxDelay: float = DEFAULT_MAX_DELAY,
+			writeFile: Callable[[str, bytes], None] = writeFileAtomically,
+	):
+		"""
+		@param debounce: The time in seconds to wait after the last queued write before writing.
+		@param maxDelay: The maximum time in seconds a queued write can be delayed by later writes.
+		@param writeFile: Writes data to a file.
+		"""
+		self.debounce = debounce
+		self.maxDelay = maxDelay
+		self._writeFile = writeFile
+		self._condition = threading.Condition()
+		#: Held while writing, so that files are written in the order their data was queued.
+		self._writeLock = threading.Lock()
+		#: Maps file names to the data to write to them.
+		self._pending: Dict[str, bytes] = {}
+		#: The names of files whose last write failed.
+		#: See L{takeFailedFilenames}.
+		self._failedFilenames: Set[str] = set()
+		#: When the pending data should be written, as returned by C{time.perf_counter}.
+		self._deadline: Optional[float] = None
+		#: The latest time the pending data can be written, as returned by C{time.perf_counter}.
+		self._maxDeadline: Optional[float] = None
+		self._thread: Optional[threading.Thread] = None
+		self._exit = False
+		#: The number of files written.
+		self.writeCount = 0
+		#: The number of queued writes which were replaced by a later write to the same file.
+		self.coalescedWriteCount = 0
+		#: The number of writes which failed.
+		self.errorCount = 0
+		#: The time in seconds the last write took, C{None} if nothing has been written.
+		self.lastWriteDuration: Optional[float] = None
+		#: The time in seconds the slowest write took.
+		self.maxWriteDuration = 0.0
+
+	@property
+	def hasPending(self) -> bool:
+		"""Whether there are queued writes which haven't been performed yet."""
+		return bool(self._pending)
+
+	def queue(self, filename: str, data: bytes):
+		"""Queue data to be written to a file in the background,
+		replacing any data queued for the file which hasn't been written yet.
+		"""
+		with self._condition:
+			if filename in self._pending:
+				self.coalescedWriteCount += 1
+			self._pending[filename] = data
+			self._failedFilenames.discard(filename)
+			now = time.perf_counter()
+			if self._maxDeadline is None:
+				self._maxDeadline = now + self.maxDelay
+			self._deadline = min(now + self.debounce, self._maxDeadline)
+			if not self._thread:
+				self._exit = False
+				self._thread = threading.Thread(
+					name=f"{self.__class__.__module__}.{self.__class__.__qualname__}",
+					target=self._run
+				)
+				self._thread.daemon = True
+				self._thread.start()
+			self._condition.notify()
+
+	def discard(self, filename: str):
+		"""Discard data queued for a file which hasn't been written yet;
+		e.g. because the file is about to be deleted.
+		If files are being written in the background, this waits until they have been written,
+		so that the file won't be written once this returns.
+		"""
+		with self._writeLock, self._condition:
+			self._pending.pop(filename, None)
+			self._failedFilenames.discard(filename)
+
+	def takeFailedFilenames(self) -> Set[str]:
+		"""Get the names of files whose last write failed and which haven't been queued again since.
+		The caller is responsible for queuing them again if they should be retried.
+		"""
+		with self._condition:
+			failed = self._failedFilenames
+			self._failedFilenames = set()
+		return failed
+
+	def flush(self):
+		"""Write all queued data immediately on the calling thread.
+		If a background write is in progress, wait for it to finish first.
+		@raise Exception: The first error which occurred while writing,
+			after all files have been attempted.
+		"""
+		with self._writeLock:
+			self._writeAll(self._takePending(), raiseErrors=True)
+
+	def terminate(self, timeout: Optional[float] = None):
+		"""Stop the background thread and write any queued data.
+		@param timeout: The maximum time in seconds to wait for the thread to stop.
+		"""
+		thread = self._thread
+		if thread:
+			with self._condition:
+				self._exit = True
+				self._condition.notify()
+			thread.join(timeout)
+			self._thread = None
+		self.flush()
+
+	def _takePending(self) -> Dict[str, bytes]:
+		with self._condition:
+			pending = self._pending
+			self._pending = {}
+			self._deadline = self._maxDeadline = None
+		return pending
+
+	def _writeAll(self, pending: Dict[str, bytes], raiseErrors: bool = False):
+		error = None
+		for filename, data in pending.items():
+			start = time.perf_counter()
+			try:
+				self._writeFile(filename, data)
+			except Exception as e:
+				with self._condition:
+					if filename not in self._pending:
+						# Not queued again while this write was in progress.
+						self._failedFilenames.add(filename)
+				self.errorCount += 1
+				log.warning("Error saving %s; probably read only file system" % filename)
+				log.debugWarning("", exc_info=True)
+				if error is None:
+					error = e
+				continue
+			duration = time.perf_counter() - start
+			with self._condition:
+				self._failedFilenames.discard(filename)
+			self.writeCount += 1
+			self.lastWriteDuration = duration
+			self.maxWriteDuration = max(self.maxWriteDuration, duration)
+			log.debug("Saved %s in %.1f ms" % (filename, duration * 1000))
+		if error is not None and raiseErrors:
+			raise error
+
+	def _waitForDeadline(self) -> bool:
+		"""Wait until queued data should be written.
+		@return: C{False} if the thread should exit.
+		"""
+		with self._condition:
+			while not self._exit:
+				if self._deadline is None:
+					self._condition.wait()
+					continue
+				remaining = self._deadline - time.perf_counter()
+				if remaining <= 0:
+					return True
+				self._condition.wait(remaining)
+			return False
+
+	def _run(self):
+		while self._waitForDeadline():
+			with self._writeLock:
+				self._writeAll(self._takePending())
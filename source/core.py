@@ -97,10 +97,7 @@ def doStartupDialogs():
 			def onResult(ID):
 				import wx
 				if ID in (wx.ID_YES,wx.ID_NO):
-					try:
-						config.conf.save()
-					except:
-						pass
+					config.conf.saveLater()
 			# Ask the user if usage stats can be collected.
 			gui.runScriptModalDialog(gui.AskAllowUsageStatsDialog(None),onResult)
 
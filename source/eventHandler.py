@@ -5,6 +5,8 @@
 #Copyright (C) 2007-2017 NV Access Limited, Babbage B.V.
 
 import threading
+import itertools
+import weakref
 import queueHandler
 import api
 import speech
@@ -17,6 +19,7 @@ import globalPluginHandler
 import config
 import winUser
 import extensionPoints
+import baseObject
 
 #Some dicts to store event counts by name and or obj
 _pendingEventCountsByName={}
@@ -28,6 +31,29 @@ _pendingEventCountsLock=threading.RLock()
 #: the last object queued for a gainFocus event. Useful for code running outside NVDA's core queue 
 lastQueuedFocusObject=None
 
+#: Events for which only the most recently queued event for an object is executed.
+#: When another event of one of these types is queued for the same object,
+#: any earlier one which is still queued is dropped, since it would only report information which is already out of date.
+#: Events with extra parameters are never dropped.
+#: Focus, caret and other events where every occurrence or the order matters must not be included.
+#: @type: set of str
+coalescedEventNames={"nameChange","valueChange","stateChange","descriptionChange"}
+#: Maps event names to the number of queued events which were dropped because they were superseded.
+#: @see: L{coalescedEventNames}
+coalescedEventCounts={}
+#: Maps event names to the lane of L{queueHandler.eventQueue} in which they are queued.
+#: Events not listed here are queued in L{queueHandler.LANE_GENERAL}.
+#: @type: dict of str to int
+eventLanes={
+	"gainFocus":queueHandler.LANE_FOCUS,
+	"foreground":queueHandler.LANE_FOCUS,
+	"caret":queueHandler.LANE_CARET,
+	"typedCharacter":queueHandler.LANE_CARET,
+}
+#: Maps (eventName, obj) to the ID of the most recently queued coalesced event for that pair.
+_latestCoalescedEventIds={}
+_coalescedEventIdCounter=itertools.count()
+
 def queueEvent(eventName,obj,**kwargs):
 	"""Queues an NVDA event to be executed.
 	@param eventName: the name of the event type (e.g. 'gainFocus', 'nameChange')
@@ -36,13 +62,23 @@ def queueEvent(eventName,obj,**kwargs):
 	global lastQueuedFocusObject
 	if eventName=="gainFocus":
 		lastQueuedFocusObject=obj
+	eventId=None
 	with _pendingEventCountsLock:
 		_pendingEventCountsByName[eventName]=_pendingEventCountsByName.get(eventName,0)+1
 		_pendingEventCountsByObj[obj]=_pendingEventCountsByObj.get(obj,0)+1
 		_pendingEventCountsByNameAndObj[(eventName,obj)]=_pendingEventCountsByNameAndObj.get((eventName,obj),0)+1
-	queueHandler.queueFunction(queueHandler.eventQueue,_queueEventCallback,eventName,obj,kwargs)
+		if eventName in coalescedEventNames and not kwargs:
+			# Any earlier event for this object which is still queued is now superseded by this one.
+			eventId=_latestCoalescedEventIds[(eventName,obj)]=next(_coalescedEventIdCounter)
+	queueHandler.queueFunctionInLane(
+		queueHandler.eventQueue,eventLanes.get(eventName,queueHandler.LANE_GENERAL),
+		_queueEventCallback,eventName,obj,kwargs,eventId
+	)
 
-def _queueEventCallback(eventName,obj,kwargs):
+def _queueEventCallback(eventName,obj,kwargs,eventId=None):
+	"""Executes an event queued with L{queueEvent}.
+	@param eventId: The ID of a coalesced event, C{None} if the event isn't coalesced.
+	"""
 	with _pendingEventCountsLock:
 		curCount=_pendingEventCountsByName.get(eventName,0)
 		if curCount>1:
@@ -59,6 +95,12 @@ def _queueEventCallback(eventName,obj,kwargs):
 			_pendingEventCountsByNameAndObj[(eventName,obj)]=(curCount-1)
 		elif curCount==1:
 			del _pendingEventCountsByNameAndObj[(eventName,obj)]
+		if eventId is not None:
+			if _latestCoalescedEventIds.get((eventName,obj))!=eventId:
+				# A later event for this object has been queued, so this one is out of date.
+				coalescedEventCounts[eventName]=coalescedEventCounts.get(eventName,0)+1
+				return
+			del _latestCoalescedEventIds[(eventName,obj)]
 	executeEvent(eventName,obj,**kwargs)
 
 def isPendingEvents(eventName=None,obj=None):
@@ -79,6 +121,63 @@ def isPendingEvents(eventName=None,obj=None):
 	elif eventName and obj:
 		return (eventName,obj) in _pendingEventCountsByNameAndObj
 
+#: Caches which event handlers are defined, as most objects don't handle most events.
+#: Maps funcName to a weak dict mapping classes to whether they define that event handler.
+#: @see: L{_hasHandler}
+_classHandlerCache={}
+#: The value of L{baseObject.eventHandlersVersion} for which the cache is valid.
+_dispatchCacheVersion=None
+
+def invalidateDispatchCache():
+	"""Forget which event handlers are defined.
+	Changes to event handlers of classes derived from L{baseObject.AutoPropertyObject}
+	(e.g. NVDAObjects, app modules, tree interceptors and global plugins) are noticed automatically.
+	This must be called when event handlers are added to or removed from other classes
+	after events have been executed.
+	Event handlers set on individual instances are found without this.
+	"""
+	global _dispatchCacheVersion
+	_classHandlerCache.clear()
+	_dispatchCacheVersion=None
+
+def _validateDispatchCache():
+	"""Forget which event handlers are defined if event handlers of classes have changed."""
+	global _dispatchCacheVersion
+	version=baseObject.eventHandlersVersion
+	if version!=_dispatchCacheVersion:
+		invalidateDispatchCache()
+		_dispatchCacheVersion=version
+
+def _hasHandler(inst,funcName):
+	"""Whether an object might have an event handler.
+	Looking up attributes which don't exist is relatively slow, so whether the class defines the handler is cached.
+	Classes are weakly referenced, so that caching doesn't keep dynamically created classes alive.
+	L{_validateDispatchCache} should be called first.
+	@return: C{True} if the handler should be looked up with C{getattr}.
+	"""
+	cls=type(inst)
+	try:
+		classes=_classHandlerCache[funcName]
+	except KeyError:
+		classes=_classHandlerCache[funcName]=weakref.WeakKeyDictionary()
+	try:
+		defined=classes[cls]
+	except KeyError:
+		defined=classes[cls]=bool(getattr(cls,funcName,None))
+	# Handlers can also be set on individual instances.
+	return defined or funcName in getattr(inst,"__dict__",())
+
+def _getPluginsWithHandler(funcName):
+	"""Get the running global plugins which might have an event handler, in the order they should be called.
+	As for other objects, handlers set on plugin instances are honoured,
+	so this is checked for each event rather than cached.
+	L{_validateDispatchCache} should be called first.
+	"""
+	return [
+		plugin for plugin in globalPluginHandler.runningPlugins
+		if _hasHandler(plugin,funcName)
+	]
+
 class _EventExecuter(object):
 	"""Facilitates execution of a chain of event functions.
 	L{gen} generates the event functions and positional arguments.
@@ -108,31 +207,33 @@ class _EventExecuter(object):
 
 	def gen(self, eventName, obj):
 		funcName = "event_%s" % eventName
+		_validateDispatchCache()
 
 		# Global plugin level.
-		for plugin in globalPluginHandler.runningPlugins:
+		for plugin in _getPluginsWithHandler(funcName):
 			func = getattr(plugin, funcName, None)
 			if func:
 				yield func, (obj, self.next)
 
 		# App module level.
 		app = obj.appModule
-		if app:
+		if app and _hasHandler(app, funcName):
 			func = getattr(app, funcName, None)
 			if func:
 				yield func, (obj, self.next)
 
 		# Tree interceptor level.
 		treeInterceptor = obj.treeInterceptor
-		if treeInterceptor:
+		if treeInterceptor and _hasHandler(treeInterceptor, funcName):
 			func = getattr(treeInterceptor, funcName, None)
 			if func and (getattr(func,'ignoreIsReady',False) or treeInterceptor.isReady):
 				yield func, (obj, self.next)
 
 		# NVDAObject level.
-		func = getattr(obj, funcName, None)
-		if func:
-			yield func, ()
+		if _hasHandler(obj, funcName):
+			func = getattr(obj, funcName, None)
+			if func:
+				yield func, ()
 
 def executeEvent(eventName,obj,**kwargs):
 	"""Executes an NVDA event.
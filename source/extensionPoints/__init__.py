@@ -12,7 +12,7 @@ or allow modification of spoken messages before they are passed to the synthesiz
 See the L{Action}, L{Filter}, L{Decider} classes.
 """
 from logHandler import log
-from .util import HandlerRegistrar, callWithSupportedKwargs, BoundMethodWeakref
+from .util import HandlerRegistrar, callWithSupportedKwargs, BoundMethodWeakref, CallPlan
 
 
 class Action(HandlerRegistrar):
@@ -42,9 +42,9 @@ class Action(HandlerRegistrar):
 		"""Notify all registered handlers that the action has occurred.
 		@param kwargs: Arguments to pass to the handlers.
 		"""
-		for handler in self.handlers:
+		for handler, callPlan in self._getHandlersWithCallPlans():
 			try:
-				callWithSupportedKwargs(handler, **kwargs)
+				callPlan.call(handler, **kwargs)
 			except:
 				log.exception("Error running handler %r for %r" % (handler, self))
 
@@ -82,9 +82,9 @@ class Filter(HandlerRegistrar):
 		@param kwargs: Arguments to pass to the handlers.
 		@return: The filtered value.
 		"""
-		for handler in self.handlers:
+		for handler, callPlan in self._getHandlersWithCallPlans():
 			try:
-				value = callWithSupportedKwargs(handler, value, **kwargs)
+				value = callPlan.call(handler, value, **kwargs)
 			except:
 				log.exception("Error running handler %r for %r" % (handler, self))
 		return value
@@ -129,9 +129,9 @@ class Decider(HandlerRegistrar):
 		@return: The decision.
 		@rtype: bool
 		"""
-		for handler in self.handlers:
+		for handler, callPlan in self._getHandlersWithCallPlans():
 			try:
-				decision = callWithSupportedKwargs(handler, **kwargs)
+				decision = callPlan.call(handler, **kwargs)
 			except:
 				log.exception("Error running handler %r for %r" % (handler, self))
 				continue
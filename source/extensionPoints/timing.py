@@ -0,0 +1,168 @@
+# A part of NonVisual Desktop Access (NVDA)
+# Copyright (C) 2020 NV Access Limited
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+
+"""Optional timing of extension point handlers, to find handlers which make NVDA sluggish.
+When enabled, every call of a handler registered with an L{extensionPoints.Action}, L{extensionPoints.Filter}
+or L{extensionPoints.Decider} is timed, and a warning is logged for calls which exceed L{slowCallBudget}.
+Timing is disabled by default, in which case it costs a single check per handler call.
+For example, from the NVDA Python console::
+	import extensionPoints.timing
+	extensionPoints.timing.enable(budget=0.01)
+	# Use NVDA for a while.
+	print(extensionPoints.timing.getReport())
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+from logHandler import log
+
+#: The default for L{slowCallBudget}.
+DEFAULT_BUDGET = 0.05
+#: Whether handler calls are timed.
+#: Use L{enable} and L{disable} to change this.
+isEnabled = False
+#: Calls of a handler which take longer than this many seconds are logged as a warning.
+slowCallBudget = DEFAULT_BUDGET
+#: Maps (extension point id, handler key) to the statistics for a handler.
+_stats: Dict[Tuple[int, object], "HandlerStats"] = {}
+
+
+class HandlerStats(object):
+	"""Timing statistics for a handler registered with an extension point."""
+	__slots__ = (
+		"extensionPoint", "handlerName", "module", "addonName",
+		"callCount", "totalTime", "maxTime", "slowCallCount",
+	)
+
+	def __init__(self, extensionPoint, handler):
+		#: A description of the extension point.
+		self.extensionPoint: str = repr(extensionPoint)
+		#: A description of the handler.
+		#: The handler itself isn't kept, so that it can still die.
+		self.handlerName: str = _getHandlerName(handler)
+		#: The module which defines the handler, if known,
+		#: and the name of the add-on which provides the handler, C{None} if it isn't provided by an add-on.
+		self.module, self.addonName = _getOwner(handler)
+		self.callCount = 0
+		#: The total time spent in calls of the handler in seconds.
+		self.totalTime = 0.0
+		#: The time taken by the slowest call of the handler in seconds.
+		self.maxTime = 0.0
+		#: The number of calls which exceeded L{slowCallBudget}.
+		self.slowCallCount = 0
+
+	def addCall(self, duration: float):
+		self.callCount += 1
+		self.totalTime += duration
+		if duration > self.maxTime:
+			self.maxTime = duration
+		if duration > slowCallBudget:
+			self.slowCallCount += 1
+			log.warning(
+				f"Handler {self.handlerName} for {self.extensionPoint} took {duration * 1000:.1f} ms, "
+				f"exceeding the budget of {slowCallBudget * 1000:.1f} ms "
+				f"(module {self.module}, add-on {self.addonName})"
+			)
+
+
+def _getFunction(handler):
+	"""Get the function underlying a handler; e.g. the function wrapped by a partial."""
+	while hasattr(handler, "func"):
+		handler = handler.func
+	return getattr(handler, "__func__", handler)
+
+
+def _getHandlerName(handler) -> str:
+	func = _getFunction(handler)
+	return getattr(func, "__qualname__", None) or repr(handler)
+
+
+def _getOwner(handler) -> Tuple[Optional[str], Optional[str]]:
+	"""Get the module and add-on which provide a handler.
+	@return: The module name and the add-on name, either of which may be C{None} if unknown.
+	"""
+	func = _getFunction(handler)
+	module = getattr(func, "__module__", None)
+	try:
+		# Import late, as addonHandler depends on modules which depend on extensionPoints.
+		import addonHandler
+		addon = addonHandler.getCodeAddon(func)
+	except Exception:
+		# This isn't provided by an add-on, or the add-on can't be determined.
+		addonName = None
+	else:
+		addonName = addon.name if addon else None
+	return module, addonName
+
+
+class TimedCallPlan(object):
+	"""Wraps a L{util.CallPlan} to time the calls of a handler."""
+	__slots__ = ("_callPlan", "_stats")
+
+	def __init__(self, callPlan, stats: HandlerStats):
+		self._callPlan = callPlan
+		self._stats = stats
+
+	def call(self, func, *args, **kwargs):
+		start = time.perf_counter()
+		try:
+			return self._callPlan.call(func, *args, **kwargs)
+		finally:
+			self._stats.addCall(time.perf_counter() - start)
+
+
+def getTimedCallPlan(extensionPoint, handlerKey, handler, callPlan) -> TimedCallPlan:
+	"""Get a plan which times calls of a handler registered with an extension point.
+	Used by L{util.HandlerRegistrar} while timing is enabled.
+	"""
+	key = (id(extensionPoint), handlerKey)
+	stats = _stats.get(key)
+	if not stats:
+		stats = _stats[key] = HandlerStats(extensionPoint, handler)
+	return TimedCallPlan(callPlan, stats)
+
+
+def enable(budget: Optional[float] = None):
+	"""Start timing extension point handlers.
+	@param budget: If specified, the time in seconds after which a handler call is logged as a warning.
+	"""
+	global isEnabled, slowCallBudget
+	if budget is not None:
+		slowCallBudget = budget
+	isEnabled = True
+
+
+def disable():
+	"""Stop timing extension point handlers.
+	The statistics gathered so far are kept until L{reset} is called.
+	"""
+	global isEnabled
+	isEnabled = False
+
+
+def reset():
+	"""Discard the statistics gathered so far."""
+	_stats.clear()
+
+
+def getStats() -> List[HandlerStats]:
+	"""Get the statistics for all handlers called while timing was enabled,
+	with the handlers which took the most time in total first.
+	"""
+	return sorted(_stats.values(), key=lambda stats: stats.totalTime, reverse=True)
+
+
+def getReport() -> str:
+	"""Get a report of the time taken by extension point handlers, suitable for printing."""
+	lines = [
+		f"{'total ms':>10} {'max ms':>8} {'calls':>7} {'slow':>5}  handler (module, add-on) for extension point"
+	]
+	for stats in getStats():
+		lines.append(
+			f"{stats.totalTime * 1000:>10.1f} {stats.maxTime * 1000:>8.1f} {stats.callCount:>7} {stats.slowCallCount:>5}"
+			f"  {stats.handlerName} ({stats.module}, {stats.addonName}) for {stats.extensionPoint}"
+		)
+	return "\n".join(lines)
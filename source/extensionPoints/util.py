@@ -10,6 +10,7 @@ used, however for more advanced requirements these utilities can be used directl
 import weakref
 import collections
 import inspect
+from . import timing
 
 
 class AnnotatableWeakref(weakref.ref):
@@ -93,6 +94,14 @@ class HandlerRegistrar(object):
 		key = _getHandlerKey(handler)
 		# Store the key on the weakref so we can remove the handler when it dies.
 		weak.handlerKey = key
+		# Inspecting the handler is expensive, so only do it once.
+		try:
+			weak.callPlan = CallPlan(handler)
+		except (TypeError, ValueError):
+			# The handler can't be planned for now.
+			# Registering it must still succeed as it always has,
+			# so try again each time the handler is called, where any error is reported as before.
+			weak.callPlan = _UncachedCallPlan
 		self._handlers[key] = weak
 
 	def unregister(self, handler):
@@ -117,6 +126,92 @@ class HandlerRegistrar(object):
 				continue # Died.
 			yield handler
 
+	def _getHandlersWithCallPlans(self):
+		"""Generator of registered handler functions and their L{CallPlan}s.
+		Extension points should call handlers using the plan; i.e. C{plan.call(handler, **kwargs)}.
+		If L{timing} is enabled, the plans also time the calls.
+		"""
+		for key, handler, callPlan in self._getHandlerEntries():
+			yield handler, callPlan
+
+	def _getHandlerEntries(self):
+		"""Generator of the keys (as returned by _getHandlerKey), functions and L{CallPlan}s of registered handlers.
+		This is useful for subclasses which keep further information about handlers by key.
+		@see: L{_getHandlersWithCallPlans}
+		"""
+		for key, weak in self._handlers.items():
+			handler = weak()
+			if not handler:
+				continue # Died.
+			if timing.isEnabled:
+				yield key, handler, timing.getTimedCallPlan(self, key, handler, weak.callPlan)
+			else:
+				yield key, handler, weak.callPlan
+
+
+class CallPlan(object):
+	"""How to call a callable with only the keyword arguments it supports, as done by L{callWithSupportedKwargs}.
+	Inspecting the signature of a callable is expensive,
+	so L{HandlerRegistrar} creates a plan when a handler is registered and uses it for every call.
+	"""
+	__slots__ = ("signature", "takesVarKwargs", "parameterNames", "requiredParameterNames", "_callDirectly")
+
+	def __init__(self, func):
+		"""
+		@param func: The callable to plan calls for; see L{callWithSupportedKwargs}.
+		@raise TypeError: If C{func} is an unbound instance method.
+		@raise ValueError: If the signature of C{func} can't be determined.
+		"""
+		sig = inspect.signature(func)
+		if inspect.isfunction(func) and sig.parameters and list(sig.parameters)[0] == "self":
+			raise TypeError("Unbound instance methods are not handled.")
+		self.signature = sig
+		#: Whether the callable has a catch-all for keyword arguments (C{**kwargs}),
+		#: in which case keyword arguments needn't be filtered.
+		self.takesVarKwargs = any(
+			param.kind == param.VAR_KEYWORD
+			for param in sig.parameters.values()
+		)
+		#: The names of the parameters of the callable.
+		self.parameterNames = frozenset(sig.parameters)
+		#: The names of the parameters which must be supplied.
+		self.requiredParameterNames = tuple(
+			name for name, param in sig.parameters.items()
+			if param.default is param.empty and param.kind not in (param.VAR_POSITIONAL, param.VAR_KEYWORD)
+		)
+		# For plain functions and methods, Python binds the arguments to the parameters exactly as
+		# Signature.bind would, so the arguments can be passed as they are.
+		# Other callables (e.g. decorated functions or partials) might not accept the arguments in the same form
+		# as their reported signature, so the arguments must be bound to the signature first.
+		self._callDirectly = (
+			(inspect.isfunction(func) or inspect.ismethod(func))
+			and not hasattr(getattr(func, "__func__", func), "__wrapped__")
+			and not any(param.kind == param.POSITIONAL_ONLY for param in sig.parameters.values())
+		)
+
+	def call(self, func, *args, **kwargs):
+		"""Call a callable with only the keyword arguments it supports.
+		@param func: The callable this plan was created for.
+			For a bound instance method, this can be the method bound again to the same instance.
+		@raise TypeError: If the arguments can't be received by C{func}.
+		"""
+		if not self.takesVarKwargs:
+			parameterNames = self.parameterNames
+			kwargs = {name: val for name, val in kwargs.items() if name in parameterNames}
+		if self._callDirectly:
+			return func(*args, **kwargs)
+		boundArguments = self.signature.bind(*args, **kwargs)
+		return func(*boundArguments.args, **boundArguments.kwargs)
+
+
+class _UncachedCallPlan(object):
+	"""Used instead of a L{CallPlan} for callables whose signature couldn't be determined when registered.
+	"""
+
+	@staticmethod
+	def call(func, *args, **kwargs):
+		return callWithSupportedKwargs(func, *args, **kwargs)
+
 
 def callWithSupportedKwargs(func, *args, **kwargs):
 	"""Call a function with only the keyword arguments it supports.
@@ -148,23 +243,8 @@ def callWithSupportedKwargs(func, *args, **kwargs):
 		An exception is raised if:
 			- the number of positional arguments given can not be received by C{func}.
 			- parameters required (parameters declared with no default value) by C{func} are not supplied.
+
+	This inspects C{func} on every call.
+	When calling the same callable repeatedly, create a L{CallPlan} once and use L{CallPlan.call} instead.
 	"""
-	sig = inspect.signature(func)
-
-	if inspect.isfunction(func) and sig.parameters and list(sig.parameters)[0] == "self":
-		raise TypeError("Unbound instance methods are not handled.")
-
-	# Check whether func has a catch-all for kwargs (**kwargs)
-	# In this case, we do not need to filter to just the supported args.
-	if not any(
-		param for param in sig.parameters.values()
-		if param.kind == param.VAR_KEYWORD
-	):
-		# Delete all the kwargs that are not supported by this callable.
-		# Wrap the items call in a list, as the dictionary changes during iteration.
-		for kwarg in list(kwargs.keys()):
-			if kwarg not in sig.parameters:
-				del kwargs[kwarg]
-
-	boundArguments = sig.bind(*args, **kwargs)
-	return func(*boundArguments.args, **boundArguments.kwargs)
+	return CallPlan(func).call(func, *args, **kwargs)
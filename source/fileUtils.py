@@ -28,17 +28,26 @@ def FaultTolerantFile(name):
 
 	This creates a temporary file, and the writes actually happen on this temp file. At the end of the 
 	`with` block, when `f` goes out of context the temporary file is closed and, this temporary file replaces "myFile.txt"
+	If an exception is raised in the `with` block, the original file is left unchanged and the temporary file is removed.
 	'''
 	if not isinstance(name, text_type):
 		raise TypeError("name must be an unicode string")
 	dirpath, filename = os.path.split(name)
 	with NamedTemporaryFile(dir=dirpath, prefix=filename, suffix='.tmp', delete=False) as f:
 		log.debug(f.name)
-		yield f
-		f.flush()
-		os.fsync(f)
-		f.close()
-		winKernel.moveFileEx(f.name, name, winKernel.MOVEFILE_REPLACE_EXISTING)
+		try:
+			yield f
+			f.flush()
+			os.fsync(f)
+			f.close()
+			winKernel.moveFileEx(f.name, name, winKernel.MOVEFILE_REPLACE_EXISTING)
+		except BaseException:
+			f.close()
+			try:
+				os.remove(f.name)
+			except OSError:
+				log.debugWarning("Couldn't remove %s" % f.name, exc_info=True)
+			raise
 
 def getFileVersionInfo(name, *attributes):
 	"""Gets the specified file version info attributes from the provided file."""
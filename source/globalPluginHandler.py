@@ -53,6 +53,9 @@ def reloadGlobalPlugins():
 		del sys.modules[mod]
 	import globalPlugins
 	initialize()
+	# Import late to avoid circular import.
+	import eventHandler
+	eventHandler.invalidateDispatchCache()
 
 class GlobalPlugin(baseObject.ScriptableObject):
 	"""Base global plugin.
@@ -726,10 +726,7 @@ class WelcomeDialog(wx.Dialog):
 		if self.startAfterLogonCheckBox.Enabled:
 			config.setStartAfterLogon(self.startAfterLogonCheckBox.Value)
 		config.conf["general"]["showWelcomeDialogAtStartup"] = self.showWelcomeDialogAtStartupCheckBox.IsChecked()
-		try:
-			config.conf.save()
-		except:
-			log.debugWarning("Could not save",exc_info=True)
+		config.conf.saveLater()
 		self.EndModal(wx.ID_OK)
 
 	@classmethod
@@ -33,6 +33,9 @@ class IoBase(object):
 	"""Base class for raw I/O.
 	This watches for data of a specified size and calls a callback when it is received.
 	"""
+	#: The number of bytes written to the device so far.
+	#: @type: int
+	bytesWritten = 0
 
 	def __init__(
 			self,
@@ -104,6 +107,7 @@ class IoBase(object):
 			log.debug("Write: %r" % data)
 
 		size, data = self._prepareWriteBuffer(data)
+		self.bytesWritten += size
 		if not ctypes.windll.kernel32.WriteFile(self._writeFile, data, size, None, byref(self._writeOl)):
 			if ctypes.GetLastError() != ERROR_IO_PENDING:
 				if _isDebug():
@@ -201,6 +205,7 @@ class Serial(IoBase):
 	def write(self, data: bytes):
 		if _isDebug():
 			log.debug("Write: %r" % data)
+		self.bytesWritten += len(data)
 		self._ser.write(data)
 
 	def close(self):
@@ -32,6 +32,7 @@ import languageHandler
 import controlTypes
 import keyLabels
 import winKernel
+import latencyTracing
 
 #: Script category for emulated keyboard keys.
 # Translators: The name of a category of NVDA commands.
@@ -437,11 +438,13 @@ class InputManager(baseObject.AutoPropertyObject):
 		if wasInSayAll:
 			gesture.wasInSayAll=True
 
+		# Input is queued in the focus lane,
+		# so that focus and caret events caused by this gesture can't be executed before it.
 		speechEffect = gesture.speechEffectWhenExecuted
 		if speechEffect == gesture.SPEECHEFFECT_CANCEL:
-			queueHandler.queueFunction(queueHandler.eventQueue, speech.cancelSpeech)
+			queueHandler.queueFunctionInLane(queueHandler.eventQueue, queueHandler.LANE_FOCUS, speech.cancelSpeech)
 		elif speechEffect in (gesture.SPEECHEFFECT_PAUSE, gesture.SPEECHEFFECT_RESUME):
-			queueHandler.queueFunction(queueHandler.eventQueue, speech.pauseSpeech, speechEffect == gesture.SPEECHEFFECT_PAUSE)
+			queueHandler.queueFunctionInLane(queueHandler.eventQueue, queueHandler.LANE_FOCUS, speech.pauseSpeech, speechEffect == gesture.SPEECHEFFECT_PAUSE)
 
 		if gesture.shouldPreventSystemIdle:
 			winKernel.SetThreadExecutionState(winKernel.ES_SYSTEM_REQUIRED | winKernel.ES_DISPLAY_REQUIRED)
@@ -449,6 +452,8 @@ class InputManager(baseObject.AutoPropertyObject):
 		if log.isEnabledFor(log.IO) and not gesture.isModifier:
 			self._lastInputTime = time.time()
 			log.io("Input: %s" % gesture.identifiers[0])
+		if not gesture.isModifier:
+			latencyTracing.startTrace(gesture)
 
 		if self._captureFunc:
 			try:
@@ -461,8 +466,8 @@ class InputManager(baseObject.AutoPropertyObject):
 		if gesture.isModifier:
 			raise NoInputGestureAction
 
-		if config.conf["keyboard"]["speakCommandKeys"] and gesture.shouldReportAsCommand:
-			queueHandler.queueFunction(queueHandler.eventQueue, speech.speakMessage, gesture.displayName)
+		if config.conf.snapshot["keyboard", "speakCommandKeys"] and gesture.shouldReportAsCommand:
+			queueHandler.queueFunctionInLane(queueHandler.eventQueue, queueHandler.LANE_FOCUS, speech.speakMessage, gesture.displayName)
 
 		gesture.reportExtra()
 
@@ -492,7 +497,7 @@ class InputManager(baseObject.AutoPropertyObject):
 
 	def _inputHelpCaptor(self, gesture):
 		bypass = gesture.bypassInputHelp or getattr(gesture.script, "bypassInputHelp", False)
-		queueHandler.queueFunction(queueHandler.eventQueue, self._handleInputHelp, gesture, onlyLog=bypass or not gesture.reportInInputHelp)
+		queueHandler.queueFunctionInLane(queueHandler.eventQueue, queueHandler.LANE_FOCUS, self._handleInputHelp, gesture, onlyLog=bypass or not gesture.reportInInputHelp)
 		return bypass
 
 	def _handleInputHelp(self, gesture, onlyLog=False):
@@ -812,7 +817,7 @@ def  logTimeSinceInput():
 	This does nothing if time since input logging is disabled.
 	"""
 	if (not log.isEnabledFor(log.IO)
-		or not config.conf["debugLog"]["timeSinceInput"]
+		or not config.conf.snapshot["debugLog", "timeSinceInput"]
 		or not manager or not manager._lastInputTime
 	):
 		return
@@ -0,0 +1,205 @@
+# A part of NonVisual Desktop Access (NVDA)
+# Copyright (C) 2020 NV Access Limited
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+
+"""Tracing of the latency between input and speech.
+When a gesture is executed, a trace is started.
+As the resulting speech passes through the various stages of NVDA,
+the time at which it first reaches each stage is recorded in the trace.
+A trace is complete when the synthesizer reaches the first index of that speech,
+or when the next gesture is executed.
+Completed traces are kept in a ring buffer, from which percentiles can be computed for each stage.
+
+Tracing is enabled along with the "time since input" debug log category.
+From the Python console, use C{latencyTracing.tracer.getReport()} to see the statistics,
+or C{latencyTracing.tracer.dump(fileName)} to write all buffered traces to a file.
+"""
+
+import collections
+import json
+import threading
+import time
+from typing import Deque, Dict, List, Optional
+
+import config
+
+#: A gesture was passed to L{inputCore.InputManager.executeGesture}.
+STAGE_INPUT = "input"
+#: The script for the gesture was queued by L{scriptHandler.queueScript}.
+STAGE_QUEUE_SCRIPT = "queueScript"
+#: Speech was passed to L{speech.speak}.
+STAGE_SPEAK = "speak"
+#: Speech was queued with the L{speech.manager.SpeechManager}.
+STAGE_SPEECH_MANAGER = "speechManager"
+#: An utterance was passed to L{synthDriverHandler.SynthDriver.speak}.
+STAGE_SYNTH_SPEAK = "synthSpeak"
+#: The synthesizer reached the first index of the utterance.
+STAGE_SYNTH_INDEX_REACHED = "synthIndexReached"
+#: All stages in the order they normally occur.
+STAGES = (
+	STAGE_INPUT,
+	STAGE_QUEUE_SCRIPT,
+	STAGE_SPEAK,
+	STAGE_SPEECH_MANAGER,
+	STAGE_SYNTH_SPEAK,
+	STAGE_SYNTH_INDEX_REACHED,
+)
+#: The percentiles reported for each stage.
+PERCENTILES = (50, 95, 99)
+
+
+class Trace:
+	"""The times at which the speech for a single gesture reached each stage.
+	"""
+
+	def __init__(self, gestureName: str, startTime: float):
+		#: The identifier of the gesture which started the trace.
+		self.gestureName = gestureName
+		#: Maps stages to the time they were first reached, as returned by C{time.perf_counter}.
+		self.stageTimes: Dict[str, float] = {STAGE_INPUT: startTime}
+
+	def getTimesSinceInput(self) -> Dict[str, float]:
+		"""Get the time in seconds from input to each stage which was reached.
+		"""
+		startTime = self.stageTimes[STAGE_INPUT]
+		return {stage: stageTime - startTime for stage, stageTime in self.stageTimes.items()}
+
+
+def _percentile(sortedValues: List[float], percent: int) -> float:
+	"""Get a percentile of some sorted values using the nearest rank method."""
+	rank = max(1, -(-percent * len(sortedValues) // 100))
+	return sortedValues[rank - 1]
+
+
+class LatencyTracer:
+	"""Records L{Trace}s in a ring buffer and computes statistics from them.
+	Stages may be marked from any thread.
+	"""
+
+	#: The number of completed traces kept.
+	MAX_TRACES = 500
+
+	def __init__(self, maxTraces: int = MAX_TRACES):
+		self._lock = threading.Lock()
+		#: The trace in progress, if any.
+		self._currentTrace: Optional[Trace] = None
+		#: Completed traces, oldest first.
+		self.traces: Deque[Trace] = collections.deque(maxlen=maxTraces)
+
+	def start(self, gestureName: str):
+		"""Start a trace for a gesture, completing any trace in progress."""
+		trace = Trace(gestureName, time.perf_counter())
+		with self._lock:
+			if self._currentTrace:
+				self.traces.append(self._currentTrace)
+			self._currentTrace = trace
+
+	def mark(self, stage: str):
+		"""Record that the current trace reached a stage.
+		Only the first time a stage is reached is recorded.
+		This does nothing if there is no trace in progress, so it is cheap to call when tracing is disabled.
+		"""
+		trace = self._currentTrace
+		if not trace or stage in trace.stageTimes:
+			return
+		if stage == STAGE_SYNTH_INDEX_REACHED and STAGE_SYNTH_SPEAK not in trace.stageTimes:
+			# This index belongs to speech from before the gesture.
+			return
+		trace.stageTimes[stage] = time.perf_counter()
+		if stage == STAGE_SYNTH_INDEX_REACHED:
+			with self._lock:
+				if self._currentTrace is trace:
+					self.traces.append(trace)
+					self._currentTrace = None
+
+	def clear(self):
+		with self._lock:
+			self._currentTrace = None
+			self.traces.clear()
+
+	def getStats(self) -> Dict[str, Dict[str, object]]:
+		"""Get statistics for each stage over the buffered traces.
+		@return: Maps each stage reached by any trace to a dict containing:
+			C{count}: the number of traces which reached the stage;
+			C{sinceInput}: maps each of L{PERCENTILES} to the time in seconds from input to the stage;
+			C{sincePrevious}: maps each of L{PERCENTILES} to the time in seconds
+			from the previous stage reached by the same trace to this stage.
+		"""
+		sinceInput = collections.defaultdict(list)
+		sincePrevious = collections.defaultdict(list)
+		for trace in list(self.traces):
+			times = trace.getTimesSinceInput()
+			previousTime = 0.0
+			for stage in STAGES:
+				stageTime = times.get(stage)
+				if stageTime is None:
+					continue
+				sinceInput[stage].append(stageTime)
+				sincePrevious[stage].append(stageTime - previousTime)
+				previousTime = stageTime
+		stats = {}
+		for stage in STAGES:
+			if stage not in sinceInput:
+				continue
+			inputTimes = sorted(sinceInput[stage])
+			previousTimes = sorted(sincePrevious[stage])
+			stats[stage] = {
+				"count": len(inputTimes),
+				"sinceInput": {p: _percentile(inputTimes, p) for p in PERCENTILES},
+				"sincePrevious": {p: _percentile(previousTimes, p) for p in PERCENTILES},
+			}
+		return stats
+
+	def getReport(self) -> str:
+		"""Get the statistics from L{getStats} as a table, with times in milliseconds."""
+		header = "stage".ljust(20) + "count".rjust(7) + "".join(
+			f"{'in p%d' % p:>10}" for p in PERCENTILES
+		) + "".join(
+			f"{'step p%d' % p:>10}" for p in PERCENTILES
+		)
+		lines = [header]
+		for stage, stageStats in self.getStats().items():
+			lines.append(stage.ljust(20) + f"{stageStats['count']:>7}" + "".join(
+				f"{stageStats['sinceInput'][p] * 1000:>10.1f}" for p in PERCENTILES
+			) + "".join(
+				f"{stageStats['sincePrevious'][p] * 1000:>10.1f}" for p in PERCENTILES
+			))
+		return "\n".join(lines)
+
+	def dump(self, fileName: str):
+		"""Write the buffered traces to a file, one JSON object per line,
+		containing the gesture and the time in milliseconds from input to each stage reached.
+		"""
+		with open(fileName, "w", encoding="utf-8") as f:
+			for trace in list(self.traces):
+				f.write(json.dumps({
+					"gesture": trace.gestureName,
+					"stages": {
+						stage: round(stageTime * 1000, 3)
+						for stage, stageTime in trace.getTimesSinceInput().items()
+					},
+				}))
+				f.write("\n")
+
+
+#: The tracer used by NVDA.
+tracer = LatencyTracer()
+
+
+def isEnabled() -> bool:
+	return config.conf.snapshot["debugLog", "timeSinceInput"]
+
+
+def startTrace(gesture):
+	"""Start a trace for a gesture if tracing is enabled.
+	@param gesture: The gesture being executed.
+	@type gesture: L{inputCore.InputGesture}
+	"""
+	if isEnabled():
+		tracer.start(gesture.identifiers[0])
+
+
+def mark(stage: str):
+	"""Record that the current trace reached a stage. See L{LatencyTracer.mark}."""
+	tracer.mark(stage)
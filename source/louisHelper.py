@@ -6,10 +6,18 @@
 
 """Helper module to ease communication to and from liblouis."""
 
+import collections
+import threading
+import time
 import louis
 from logHandler import log
 import config
 
+#: The maximum number of translations kept by L{translate}.
+TRANSLATION_CACHE_SIZE = 512
+#: When louis debug logging is enabled, translation cache statistics are logged after this many translations.
+TRANSLATION_CACHE_LOG_INTERVAL = 1000
+
 LOUIS_TO_NVDA_LOG_LEVELS = {
 	louis.LOG_ALL: log.DEBUG,
 	louis.LOG_DEBUG: log.DEBUG,
@@ -33,7 +41,52 @@ def louis_log(level, message):
 def _isDebug():
 	return config.conf["debugLog"]["louis"]
 
+#: Cached translations, least recently used first.
+#: Maps keys as returned by L{_getTranslationCacheKey} to tuples of
+#: (braille cells, braille to raw positions, raw to braille positions, braille cursor position).
+_translationCache = collections.OrderedDict()
+#: The table list used for the most recent translation.
+_lastTableList = None
+#: Cumulative translation cache statistics.
+_translationCacheCounters = {"hits": 0, "misses": 0, "clears": 0}
+#: Serialises use of liblouis, which must not be used by several threads at once.
+_louisLock = threading.RLock()
+#: Maps table lists (as tuples) to the time in seconds it took to compile them.
+_tableCompileTimes = {}
+#: Protects L{_warmUpPending} and L{_warmUpThread}.
+_warmUpLock = threading.Lock()
+#: Table lists waiting to be compiled by the warm up thread, most urgent first.
+_warmUpPending = []
+#: The thread compiling the table lists in L{_warmUpPending}, if any.
+_warmUpThread = None
+
+def clearTranslationCache():
+	"""Discard all cached translations.
+	This must be called whenever liblouis or the tables it uses might produce different results.
+	"""
+	global _lastTableList
+	_translationCache.clear()
+	_lastTableList = None
+	_translationCacheCounters["clears"] += 1
+
+def getTranslationCacheInfo():
+	"""Get statistics about the cache used by L{translate}.
+	@return: A dict containing C{hits}, C{misses}, C{hitRate}, C{size}, C{maxSize} and C{clears}.
+	@rtype: dict
+	"""
+	hits = _translationCacheCounters["hits"]
+	misses = _translationCacheCounters["misses"]
+	return {
+		"hits": hits,
+		"misses": misses,
+		"hitRate": hits / (hits + misses) if hits or misses else 0.0,
+		"size": len(_translationCache),
+		"maxSize": TRANSLATION_CACHE_SIZE,
+		"clears": _translationCacheCounters["clears"],
+	}
+
 def initialize():
+	clearTranslationCache()
 	# Register the liblouis logging callback.
 	louis.registerLogCallback(louis_log)
 	# Set the log level to debug.
@@ -42,31 +95,162 @@ def initialize():
 	louis.setLogLevel(louis.LOG_DEBUG)
 
 def terminate():
-	# Set the log level to off.
-	louis.setLogLevel(louis.LOG_OFF)
-	# Unregister the liblouis logging callback.
-	louis.registerLogCallback(None)
-	# Free liblouis resources
-	louis.liblouis.lou_free()
+	_stopWarmUp()
+	with _louisLock:
+		# Set the log level to off.
+		louis.setLogLevel(louis.LOG_OFF)
+		# Unregister the liblouis logging callback.
+		louis.registerLogCallback(None)
+		# Free liblouis resources
+		louis.liblouis.lou_free()
+	clearTranslationCache()
+	_tableCompileTimes.clear()
 
-def translate(tableList, inbuf, typeform=None, cursorPos=None, mode=0):
+def compileTables(tableList):
+	"""Compile tables, so that translations using them don't have to.
+	liblouis keeps compiled tables until L{terminate},
+	so compiling tables which have already been compiled is cheap.
+	@param tableList: The tables, as they will be passed to L{translate} or L{backTranslate}.
+	@type tableList: list of str
+	@return: The time taken in seconds.
+	@rtype: float
+	@raise RuntimeError: If the tables can't be compiled.
 	"""
-	Convenience wrapper for louis.translate that:
-	* returns a list of integers instead of a string with cells, and
-	* distinguishes between cursor position 0 (cursor at first character) and None (no cursor at all)
+	with _louisLock:
+		startTime = time.perf_counter()
+		louis.checkTable(tableList)
+		compileTime = time.perf_counter() - startTime
+	# Only the first compilation is of interest.
+	_tableCompileTimes.setdefault(tuple(tableList), compileTime)
+	return compileTime
+
+def getTableCompileTimes():
+	"""Get the time it took to compile each table list compiled by L{compileTables}.
+	@return: Maps table lists (as tuples) to times in seconds.
+	@rtype: dict
 	"""
-	text = inbuf.replace('\0','')
-	braille, brailleToRawPos, rawToBraillePos, brailleCursorPos = louis.translate(
-		tableList,
-		text,
-		# liblouis mutates typeform if it is a list.
-		typeform=tuple(typeform) if isinstance(typeform, list) else typeform,
-		cursorPos=cursorPos or 0,
-		mode=mode
-	)
+	return dict(_tableCompileTimes)
+
+def warmUpTables(tableLists):
+	"""Compile tables on a background thread, so they are ready before they are first used.
+	Table lists queued by an earlier call which haven't been compiled yet are discarded.
+	Invalid tables are logged.
+	L{initialize} must have been called first.
+	@param tableLists: The table lists to compile, most urgent first.
+	@type tableLists: list of list of str
+	"""
+	global _warmUpThread
+	with _warmUpLock:
+		_warmUpPending[:] = [list(tableList) for tableList in tableLists]
+		if _warmUpThread:
+			# The running thread will compile the new table lists.
+			return
+		_warmUpThread = threading.Thread(name="louisHelper.warmUpTables", target=_warmUp)
+		_warmUpThread.daemon = True
+		_warmUpThread.start()
+
+def _warmUp():
+	global _warmUpThread
+	while True:
+		with _warmUpLock:
+			if not _warmUpPending:
+				_warmUpThread = None
+				return
+			tableList = _warmUpPending.pop(0)
+		try:
+			compileTime = compileTables(tableList)
+		except RuntimeError:
+			log.error("Error compiling braille tables %s" % ", ".join(tableList))
+		else:
+			log.debug("Compiled braille tables %s in %.3f seconds" % (", ".join(tableList), compileTime))
+
+def _stopWarmUp():
+	"""Discard pending table lists and wait for a compilation in progress to finish."""
+	with _warmUpLock:
+		del _warmUpPending[:]
+		thread = _warmUpThread
+	if thread:
+		thread.join()
+
+def _translate(tableList, text, typeform, cursorPos, mode):
+	with _louisLock:
+		braille, brailleToRawPos, rawToBraillePos, brailleCursorPos = louis.translate(
+			tableList,
+			text,
+			# liblouis mutates typeform if it is a list.
+			typeform=tuple(typeform) if isinstance(typeform, list) else typeform,
+			cursorPos=cursorPos or 0,
+			mode=mode
+		)
 	# liblouis gives us back a character string of cells, so convert it to a list of ints.
 	# For some reason, the highest bit is set, so only grab the lower 8 bits.
 	braille = [ord(cell) & 255 for cell in braille]
+	return braille, brailleToRawPos, rawToBraillePos, brailleCursorPos
+
+def _getTranslationCacheKey(tableList, text, typeform, cursorPos, mode):
+	"""Get the key for a translation in the translation cache.
+	The cursor position only affects the translation itself if the mode includes C{louis.compbrlAtCursor}.
+	Otherwise, the braille cursor position can be found from the raw to braille position mapping,
+	so the cursor position is left out of the key unless it is outside the text.
+	"""
+	if cursorPos is not None and not mode & louis.compbrlAtCursor and 0 <= cursorPos < len(text):
+		cursorPos = None
+	return (
+		tuple(tableList),
+		text,
+		tuple(typeform) if typeform is not None else None,
+		mode,
+		cursorPos,
+	)
+
+def _logTranslationCacheInfo():
+	info = getTranslationCacheInfo()
+	log.debug(
+		"Translation cache: {hitRate:.1%} hit rate, {hits} hits, {misses} misses, "
+		"{size} of {maxSize} entries, {clears} clears".format(**info)
+	)
+
+def translate(tableList, inbuf, typeform=None, cursorPos=None, mode=0):
+	"""
+	Convenience wrapper for louis.translate that:
+	* returns a list of integers instead of a string with cells,
+	* distinguishes between cursor position 0 (cursor at first character) and None (no cursor at all), and
+	* caches recent translations, since the same text is often translated again; e.g. the names of ancestors of the focus.
+	The returned lists are always new copies, so callers are free to modify them.
+	"""
+	global _lastTableList
+	text = inbuf.replace('\0','')
+	if tableList != _lastTableList:
+		# The translation table has changed.
+		# Translations using the old tables are unlikely to be needed again.
+		if _lastTableList is not None:
+			clearTranslationCache()
+		_lastTableList = list(tableList)
+	key = _getTranslationCacheKey(tableList, text, typeform, cursorPos, mode)
+	cached = _translationCache.get(key)
+	if cached is not None:
+		_translationCacheCounters["hits"] += 1
+		_translationCache.move_to_end(key)
+		braille, brailleToRawPos, rawToBraillePos, brailleCursorPos = cached
+	else:
+		_translationCacheCounters["misses"] += 1
+		braille, brailleToRawPos, rawToBraillePos, brailleCursorPos = cached = _translate(
+			tableList, text, typeform, cursorPos, mode
+		)
+		_translationCache[key] = cached
+		if len(_translationCache) > TRANSLATION_CACHE_SIZE:
+			_translationCache.popitem(last=False)
+	if (_translationCacheCounters["hits"] + _translationCacheCounters["misses"]) % TRANSLATION_CACHE_LOG_INTERVAL == 0 and _isDebug():
+		_logTranslationCacheInfo()
 	if cursorPos is None:
 		brailleCursorPos = None
-	return braille, brailleToRawPos, rawToBraillePos, brailleCursorPos
+	elif key[-1] is None:
+		# The cursor position was left out of the key, so work out where it is in this translation.
+		brailleCursorPos = rawToBraillePos[cursorPos]
+	return list(braille), list(brailleToRawPos), list(rawToBraillePos), brailleCursorPos
+
+def backTranslate(tableList, inbuf, typeform=None, cursorPos=0, mode=0):
+	"""Wrapper for louis.backTranslate which can be used while tables are being compiled on another thread.
+	"""
+	with _louisLock:
+		return louis.backTranslate(tableList, inbuf, typeform=typeform, cursorPos=cursorPos, mode=mode)
@@ -5,14 +5,116 @@
 #See the file COPYING for more details.
 
 import types
-from queue import Queue
+import time
+import collections
+from queue import Queue, Empty
 import globalVars
 from logHandler import log
 import watchdog
 import core
+import config
+
+#: Lanes of L{eventQueue}, in order of priority.
+#: Functions in a lane are only executed once all higher priority lanes are empty.
+#: Focus and foreground changes, as well as input gestures, their scripts and speech effects.
+#: Input is queued here so that focus and caret events caused by the input can't be executed before it.
+LANE_FOCUS=0
+#: Caret movement and typed input.
+LANE_CARET=1
+#: Everything else.
+LANE_GENERAL=2
+LANE_NAMES=("focus","caret","general")
+#: The time in seconds after which a function waiting in a lane is executed
+#: before functions in higher priority lanes which were queued after it,
+#: so that lower priority lanes can't be starved by a steady stream of higher priority functions.
+MAX_LANE_WAIT=0.5
+
+class LatencyStats(object):
+	"""How long functions waited in a lane of a L{LanedQueue} before being executed."""
+
+	def __init__(self):
+		#: The number of functions taken from the lane.
+		self.count=0
+		#: The total time in seconds functions waited.
+		self.totalLatency=0.0
+		#: The longest time in seconds a function waited.
+		self.maxLatency=0.0
+
+	def add(self,latency):
+		self.count+=1
+		self.totalLatency+=latency
+		if latency>self.maxLatency:
+			self.maxLatency=latency
+
+	@property
+	def meanLatency(self):
+		return self.totalLatency/self.count if self.count else 0.0
+
+class LanedQueue(object):
+	"""A queue of functions with several lanes of differing priority.
+	Items are taken from the highest priority lane which isn't empty,
+	unless an item in a lower priority lane has waited longer than L{maxWait},
+	in which case the items are taken in the order they were queued.
+	Within a lane, items are always taken in the order they were queued.
+	This supports the subset of the L{queue.Queue} interface used by this module,
+	so it can be used wherever a Queue is used for functions.
+	Putting items is thread safe; items should only be taken on the main thread.
+	"""
+
+	def __init__(self,name,laneCount=len(LANE_NAMES),maxWait=MAX_LANE_WAIT):
+		self.__name__=name
+		#: The time in seconds after which an item is taken before later items in higher priority lanes.
+		self.maxWait=maxWait
+		# deque.append and deque.popleft are thread safe.
+		#: Each lane holds (time queued, item) tuples.
+		self._lanes=[collections.deque() for lane in range(laneCount)]
+		#: Latency statistics for each lane.
+		self.latencyStats=[LatencyStats() for lane in range(laneCount)]
+
+	def put_nowait(self,item,lane=LANE_GENERAL):
+		self._lanes[lane].append((time.perf_counter(),item))
+
+	def get_nowait(self):
+		now=time.perf_counter()
+		lane=None
+		oldest=None
+		for index,items in enumerate(self._lanes):
+			try:
+				queued=items[0][0]
+			except IndexError:
+				continue
+			if lane is None or (queued<oldest and now-queued>=self.maxWait):
+				lane=index
+				oldest=queued
+		if lane is None:
+			raise Empty
+		queued,item=self._lanes[lane].popleft()
+		self.latencyStats[lane].add(now-queued)
+		return item
+
+	def empty(self):
+		return not any(self._lanes)
+
+	def qsize(self):
+		return sum(len(items) for items in self._lanes)
+
+	def resetLatencyStats(self):
+		self.latencyStats=[LatencyStats() for lane in self._lanes]
+
+eventQueue=LanedQueue("eventQueue")
+#: The maximum time in seconds to spend executing functions in L{eventQueue} in one core pump; 0 for no limit.
+#: C{None} until it is first read from the configuration.
+#: The setting is in a base only section, which the configuration snapshot doesn't cache,
+#: so it is kept here and updated when the configuration changes.
+_eventQueueTimeBudget=None
+
+def _updateEventQueueTimeBudget():
+	global _eventQueueTimeBudget
+	_eventQueueTimeBudget=config.conf["general"]["eventQueueTimeBudgetMs"]/1000
+
+config.post_configProfileSwitch.register(_updateEventQueueTimeBudget,sections=(("general","eventQueueTimeBudgetMs"),))
+config.post_configSave.register(_updateEventQueueTimeBudget)
 
-eventQueue=Queue()
-eventQueue.__name__="eventQueue"
 generators={}
 lastGeneratorObjID=0
 
@@ -34,16 +136,43 @@ def cancelGeneratorObject(generatorObjID):
 		pass
 
 def queueFunction(queue,func,*args,**kwargs):
+	"""Queue a function to be executed on the main thread.
+	For L{eventQueue}, the function is queued in L{LANE_GENERAL}.
+	Functions in a lane are executed in the order they were queued,
+	but focus and caret events queued later can be executed first,
+	for up to L{MAX_LANE_WAIT} seconds.
+	Functions which must be executed in order with focus or caret events queued after them,
+	such as those handling input, should be queued in L{LANE_FOCUS} with L{queueFunctionInLane} instead.
+	"""
 	queue.put_nowait((func,args,kwargs))
 	core.requestPump()
 
+def queueFunctionInLane(queue,lane,func,*args,**kwargs):
+	"""Queue a function in a particular lane of a L{LanedQueue}.
+	@param lane: One of the C{LANE_*} constants.
+	"""
+	queue.put_nowait((func,args,kwargs),lane)
+	core.requestPump()
+
 def isRunningGenerators():
 	res=len(generators)>0
 	log.debug("generators running: %s"%res)
 
-def flushQueue(queue):
+def flushQueue(queue,timeBudget=None):
+	"""Execute the functions in a queue.
+	@param timeBudget: The time in seconds after which to stop executing functions, C{None} for no limit.
+		At least one function is always executed.
+		If functions remain when the budget is exhausted, another core pump is requested to execute them.
+	@type timeBudget: float
+	"""
+	if timeBudget:
+		deadline=time.perf_counter()+timeBudget
 	for count in range(queue.qsize()+1):
 		if not queue.empty():
+			if timeBudget and count and time.perf_counter()>=deadline:
+				log.debug("Deferring %d functions in %s to the next core pump"%(queue.qsize(),queue.__name__))
+				core.requestPump()
+				return
 			(func,args,kwargs)=queue.get_nowait()
 			watchdog.alive()
 			try:
@@ -80,4 +209,6 @@ def pumpAll():
 		del gen
 	if generators:
 		core.requestPump()
-	flushQueue(eventQueue)
+	if _eventQueueTimeBudget is None:
+		_updateEventQueueTimeBudget()
+	flushQueue(eventQueue,timeBudget=_eventQueueTimeBudget)
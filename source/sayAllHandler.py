@@ -3,7 +3,10 @@
 # This file may be used under the terms of the GNU General Public License, version 2 or later.
 # For more details see: https://www.gnu.org/licenses/gpl-2.0.html
 
+import math
+import time
 import weakref
+from typing import Optional
 import speech
 import synthDriverHandler
 from logHandler import log
@@ -78,6 +81,15 @@ def readText(cursor):
 	_activeSayAll = weakref.ref(reader)
 	reader.nextLine()
 
+def _movingAverage(average: Optional[float], value: float, weight: float) -> float:
+	"""Add a value to an exponential moving average.
+	@param average: The current average, or C{None} if there is no average yet.
+	@param weight: The weight given to the new value.
+	"""
+	if average is None:
+		return value
+	return average + weight * (value - average)
+
 class _TextReader(object):
 	"""Manages continuous reading of text.
 	This is intended for internal use only.
@@ -87,23 +99,53 @@ class _TextReader(object):
 	2. L{nextLine} is called to read the first line.
 	3. When it speaks a line, L{nextLine} request that L{lineReached} be called
 		when we start speaking this line, providing the position and state at this point.
-	4. When we start speaking a line, L{lineReached} is called
+	4. L{nextLine} then starts a generator (see L{_readAhead}) which reads further lines,
+		one per core pump, until enough lines are buffered ahead of the synthesizer.
+		How many lines are enough depends on how long lines take to fetch and to speak (see L{getReadAheadLines}).
+	5. When we start speaking a line, L{lineReached} is called
 		and moves the cursor to that line.
-	5. L{lineReached} calls L{nextLine}.
-	6. If there are more lines, L{nextLine} works as per steps 3 and 4.
-	7. Otherwise, if the object doesn't support page turns, we're finished.
+	6. L{lineReached} restarts reading ahead if more lines are now needed.
+	7. Once there are no more lines, if the object doesn't support page turns, we're finished.
 	8. If the object does support page turns,
 		we request that L{turnPage} be called when speech is finished.
 	9. L{turnPage} tries to turn the page.
 	10. If there are no more pages, we're finished.
 	11. If there is another page, L{turnPage} calls L{nextLine}.
 	"""
+	#: The most lines which are buffered without reaching a natural pause before speech is forced.
 	MAX_BUFFERED_LINES = 10
+	#: The fewest lines which are sent ahead of the synthesizer.
+	MIN_READ_AHEAD_LINES = 2
+	#: The most lines which are sent ahead of the synthesizer.
+	MAX_READ_AHEAD_LINES = 50
+	#: The number of lines sent ahead before the time to speak a line is known.
+	INITIAL_READ_AHEAD_LINES = 3
+	#: The least amount of speech, in seconds, which is read ahead of the synthesizer.
+	MIN_READ_AHEAD_TIME = 2.0
+	#: How much speech is read ahead compared to the average time taken to fetch a line,
+	#: so that the synthesizer isn't starved when a few lines take longer than usual.
+	FETCH_TIME_FACTOR = 4
+	#: The weight given to each new measurement in the averages of line fetch and speaking times.
+	TIMING_WEIGHT = 0.25
 
 	def __init__(self, cursor):
 		self.cursor = cursor
 		self.trigger = SayAllProfileTrigger()
 		self.trigger.enter()
+		#: The number of lines which have been read but not yet reached by the synthesizer.
+		self.numBufferedLines = 0
+		#: The number of buffered lines which are still waiting for a natural pause before they are spoken.
+		self.numUnsentLines = 0
+		#: The average time in seconds taken to fetch a line and produce its speech.
+		self.lineFetchTime: Optional[float] = None
+		#: The average time in seconds the synthesizer takes to speak a line.
+		self.lineSpeakTime: Optional[float] = None
+		#: When the last line was reached, or C{None} if the synthesizer might have paused since.
+		self._lastLineReachedTime: Optional[float] = None
+		#: Whether there are no more lines to read; i.e. we are finishing or about to turn the page.
+		self._reachedEnd = False
+		#: The ID of the read ahead generator registered with L{queueHandler}, if it is running.
+		self._readAheadGenID: Optional[int] = None
 		# Start at the cursor.
 		if cursor == CURSOR_CARET:
 			try:
@@ -113,16 +155,60 @@ class _TextReader(object):
 		else:
 			self.reader = api.getReviewPosition()
 		self.speakTextInfoState = speech.SpeakTextInfoState(self.reader.obj)
-		self.numBufferedLines = 0
+		#: Segments the lines into phrases, so the synthesizer doesn't pause at the end of every line.
+		self.speechWithoutPauses = speech.SpeechWithoutPauses()
+
+	def getReadAheadLines(self) -> int:
+		"""Get the number of lines which should be sent to the synthesizer ahead of the line being spoken.
+		Enough lines are read to cover the time taken to fetch several more,
+		so speech doesn't stall between lines even when fetching is slow.
+		"""
+		if self.lineFetchTime is None or self.lineSpeakTime is None:
+			return self.INITIAL_READ_AHEAD_LINES
+		readAheadTime = max(self.MIN_READ_AHEAD_TIME, self.lineFetchTime * self.FETCH_TIME_FACTOR)
+		# Blank lines can take almost no time to speak.
+		lines = math.ceil(readAheadTime / max(self.lineSpeakTime, 0.01))
+		return max(self.MIN_READ_AHEAD_LINES, min(self.MAX_READ_AHEAD_LINES, lines))
+
+	def _needsMoreLines(self) -> bool:
+		# Lines waiting for a natural pause don't count,
+		# since the synthesizer can't speak them until a later line is read.
+		return self.numBufferedLines - self.numUnsentLines < self.getReadAheadLines()
 
 	def nextLine(self):
-		if not self.reader:
-			# We were stopped.
+		"""Read the next line, then continue reading ahead in the background."""
+		self._readLine()
+		self._startReadAhead()
+
+	def _startReadAhead(self):
+		if self._readAheadGenID is not None or not self.reader or self._reachedEnd:
+			return
+		if not self._needsMoreLines():
+			return
+		self._readAheadGenID = queueHandler.registerGeneratorObject(self._readAhead())
+
+	def _readAhead(self):
+		"""Read lines until enough are buffered, yielding after each line.
+		Because this is run by L{queueHandler}, the core can process other events between lines;
+		e.g. the user can stop say all.
+		Reading resumes from L{lineReached} once buffered lines are spoken.
+		"""
+		try:
+			while self.reader and not self._reachedEnd and self._needsMoreLines():
+				self._readLine()
+				yield
+		finally:
+			self._readAheadGenID = None
+
+	def _readLine(self):
+		if not self.reader or self._reachedEnd:
+			# We were stopped or there are no more lines.
 			return
 		if not self.reader.obj:
 			# The object died, so we should too.
 			self.finish()
 			return
+		startTime = time.perf_counter()
 		bookmark = self.reader.bookmark
 		# Expand to the current line.
 		# We use move end rather than expand
@@ -135,17 +221,20 @@ class _TextReader(object):
 			# No more text.
 			if isinstance(self.reader.obj, textInfos.DocumentWithPageTurns):
 				# Once the last line finishes reading, try turning the page.
+				self._reachedEnd = True
 				cb = speech.CallbackCommand(self.turnPage)
-				speech.speakWithoutPauses([cb, speech.EndUtteranceCommand()])
+				self.speechWithoutPauses.speak([cb, speech.EndUtteranceCommand()])
+				self.numUnsentLines = 0
 			else:
 				self.finish()
 			return
 		# Call lineReached when we start speaking this line.
-		# lineReached will move the cursor and trigger reading of the next line.
+		# lineReached will move the cursor and trigger reading of further lines.
 		cb = speech.CallbackCommand(lambda obj=self.reader.obj, state=self.speakTextInfoState.copy(): self.lineReached(obj,bookmark, state))
 		spoke = speech.speakTextInfo(self.reader, unit=textInfos.UNIT_READINGCHUNK,
 			reason=controlTypes.REASON_SAYALL, _prefixSpeechCommand=cb,
-			useCache=self.speakTextInfoState)
+			useCache=self.speakTextInfoState, speechWithoutPauses=self.speechWithoutPauses)
+		self.numBufferedLines += 1
 		# Collapse to the end of this line, ready to read the next.
 		try:
 			self.reader.collapse(end=True)
@@ -154,19 +243,18 @@ class _TextReader(object):
 			# without this exception to indicate that further collapsing is not possible, say all could enter an infinite loop.
 			self.finish()
 			return
-		if not spoke:
-			# This line didn't include a natural pause, so nothing was spoken.
-			self.numBufferedLines += 1
-			if self.numBufferedLines < self.MAX_BUFFERED_LINES:
-				# Move on to the next line.
-				# We queue this to allow the user a chance to stop say all.
-				queueHandler.queueFunction(queueHandler.eventQueue, self.nextLine)
-			else:
-				# We don't want to buffer too much.
-				# Force speech. lineReached will resume things when speech catches up.
-				speech.speakWithoutPauses(None)
-				# The first buffered line has now started speaking.
-				self.numBufferedLines -= 1
+		self.lineFetchTime = _movingAverage(self.lineFetchTime, time.perf_counter() - startTime, self.TIMING_WEIGHT)
+		if spoke:
+			# Everything up to and including the start of this line has been sent to the synthesizer.
+			self.numUnsentLines = 0
+			return
+		# This line didn't include a natural pause, so nothing was spoken.
+		self.numUnsentLines += 1
+		if self.numUnsentLines >= self.MAX_BUFFERED_LINES:
+			# We don't want to buffer too much.
+			# Force speech. lineReached will resume things when speech catches up.
+			self.speechWithoutPauses.flush()
+			self.numUnsentLines = 0
 
 	def lineReached(self, obj, bookmark, state):
 		# We've just started speaking this line, so move the cursor there.
@@ -176,11 +264,14 @@ class _TextReader(object):
 			updater.updateCaret()
 		if self.cursor != CURSOR_CARET or config.conf["reviewCursor"]["followCaret"]:
 			api.setReviewPosition(updater, isCaret=self.cursor==CURSOR_CARET)
-		if self.numBufferedLines == 0:
-			# This was the last line spoken, so move on.
-			self.nextLine()
-		else:
-			self.numBufferedLines -= 1
+		self.numBufferedLines -= 1
+		now = time.perf_counter()
+		if self._lastLineReachedTime is not None:
+			self.lineSpeakTime = _movingAverage(self.lineSpeakTime, now - self._lastLineReachedTime, self.TIMING_WEIGHT)
+		# If no further line has been sent, the synthesizer may run out of speech before the next line is reached.
+		# That pause shouldn't be counted as time spent speaking this line.
+		self._lastLineReachedTime = now if self.numBufferedLines > self.numUnsentLines else None
+		self._startReadAhead()
 
 	def turnPage(self):
 		try:
@@ -190,6 +281,7 @@ class _TextReader(object):
 			self.stop()
 			return
 		self.reader = self.reader.obj.makeTextInfo(textInfos.POSITION_FIRST)
+		self._reachedEnd = False
 		self.nextLine()
 
 	def finish(self):
@@ -198,14 +290,20 @@ class _TextReader(object):
 		# Otherwise, if a different synth is being used for say all,
 		# we might switch synths too early and truncate the final speech.
 		# We do this by putting a CallbackCommand at the start of a new utterance.
+		self._reachedEnd = True
 		cb = speech.CallbackCommand(self.stop)
-		speech.speakWithoutPauses([speech.EndUtteranceCommand(), cb,
+		self.speechWithoutPauses.speak([speech.EndUtteranceCommand(), cb,
 			speech.EndUtteranceCommand()])
+		self.numUnsentLines = 0
 
 	def stop(self):
 		if not self.reader:
 			return
 		self.reader = None
+		if self._readAheadGenID is not None:
+			queueHandler.cancelGeneratorObject(self._readAheadGenID)
+			self._readAheadGenID = None
+		self.speechWithoutPauses.reset()
 		self.trigger.exit()
 		self.trigger = None
 
@@ -21,6 +21,7 @@ import braille
 import vision
 import keyLabels
 import baseObject
+import latencyTracing
 
 _numScriptsQueued=0 #Number of scripts that are queued to be executed
 #: Number of scripts that send their gestures on that are queued to be executed or are currently being executed.
@@ -166,10 +167,13 @@ def _queueScriptCallback(script,gesture):
 
 def queueScript(script,gesture):
 	global _numScriptsQueued, _numIncompleteInterceptedCommandScripts
+	latencyTracing.mark(latencyTracing.STAGE_QUEUE_SCRIPT)
 	_numScriptsQueued+=1
 	if _isInterceptedCommandScript(script):
 		_numIncompleteInterceptedCommandScripts+=1
-	queueHandler.queueFunction(queueHandler.eventQueue,_queueScriptCallback,script,gesture)
+	# Queue in the focus lane along with the gesture's speech effect,
+	# so that focus and caret events queued after the script can't be executed before it.
+	queueHandler.queueFunctionInLane(queueHandler.eventQueue,queueHandler.LANE_FOCUS,_queueScriptCallback,script,gesture)
 
 def willSayAllResume(gesture):
 	return config.conf['keyboard']['allowSkimReadingInSayAll']and gesture.wasInSayAll and getattr(gesture.script,'resumeSayAllMode',None)==sayAllHandler.lastSayAllMode
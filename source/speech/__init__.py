@@ -8,6 +8,7 @@
 """ 
 
 import itertools
+import functools
 import weakref
 import unicodedata
 import time
@@ -21,7 +22,9 @@ import re
 import textInfos
 import speechDictHandler
 import characterProcessing
+import globalVars
 import languageHandler
+import latencyTracing
 from .commands import (
 	# Commands that are used in this file.
 	SpeechCommand,
@@ -57,6 +60,7 @@ from logHandler import log
 import config
 import aria
 from .priorities import Spri
+from .speechWithoutPauses import SpeechWithoutPauses, re_last_pause  # noqa: F401
 
 speechMode_off=0
 speechMode_beeps=1
@@ -105,20 +109,66 @@ def isBlank(text):
 
 RE_CONVERT_WHITESPACE = re.compile("[\0\r\n]")
 
-def processText(locale,text,symbolLevel):
+#: The maximum number of results cached by L{processText}.
+PROCESS_TEXT_CACHE_SIZE = 1024
+
+@functools.lru_cache(maxsize=PROCESS_TEXT_CACHE_SIZE)
+def _processTextCached(locale, text, symbolLevel):
 	text = speechDictHandler.processText(text)
 	text = characterProcessing.processSpeechSymbols(locale, text, symbolLevel)
 	text = RE_CONVERT_WHITESPACE.sub(u" ", text)
 	return text.strip()
 
+#: The state of everything other than the arguments which affects the result of L{processText}
+#: at the time results were last cached.
+_processTextCacheState = None
+#: Hits and misses of the L{processText} cache before it was last cleared,
+#: as well as the number of times it has been cleared because its results became stale.
+_processTextCacheCounters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def processText(locale,text,symbolLevel):
+	"""Apply speech dictionaries and symbol processing to text.
+	The same strings (role and state labels, "blank", etc.) are spoken over and over,
+	so results are cached until the speech dictionaries or symbol data change.
+	"""
+	global _processTextCacheState
+	state = (
+		globalVars.speechDictionaryProcessing,
+		speechDictHandler.dictionariesVersion,
+		characterProcessing.getSpeechSymbolsVersion(),
+	)
+	if state != _processTextCacheState:
+		if _processTextCacheState is not None:
+			info = _processTextCached.cache_info()
+			_processTextCacheCounters["hits"] += info.hits
+			_processTextCacheCounters["misses"] += info.misses
+			_processTextCacheCounters["invalidations"] += 1
+		_processTextCached.cache_clear()
+		_processTextCacheState = state
+	return _processTextCached(locale, text, symbolLevel)
+
+def getProcessTextCacheInfo():
+	"""Get statistics for the L{processText} cache; e.g. for inspection from the Python console.
+	@return: The hits, misses, maximum size and current size of the cache,
+		as well as how many times it was cleared because its results became stale.
+	@rtype: dict
+	"""
+	info = _processTextCached.cache_info()
+	return {
+		"hits": _processTextCacheCounters["hits"] + info.hits,
+		"misses": _processTextCacheCounters["misses"] + info.misses,
+		"maxsize": info.maxsize,
+		"currsize": info.currsize,
+		"invalidations": _processTextCacheCounters["invalidations"],
+	}
+
 def cancelSpeech():
 	"""Interupts the synthesizer from currently speaking"""
 	global beenCanceled, isPaused
 	# Import only for this function to avoid circular import.
 	import sayAllHandler
 	sayAllHandler.stop()
-	speakWithoutPauses._pendingSpeechSequence=[]
-	speakWithoutPauses._lastSentIndex=None
+	_speechWithoutPauses.reset()
 	if beenCanceled:
 		return
 	elif speechMode==speechMode_off:
@@ -152,7 +202,7 @@ def getCurrentLanguage():
 	language=None
 	if  synth:
 		try:
-			language=synth.language if config.conf['speech']['trustVoiceLanguage'] else None
+			language=synth.language if config.conf.snapshot["speech", "trustVoiceLanguage"] else None
 		except NotImplementedError:
 			pass
 	if language:
@@ -168,7 +218,7 @@ def spellTextInfo(
 		priority: Optional[Spri] = None
 ) -> None:
 	"""Spells the text from the given TextInfo, honouring any LangChangeCommand objects it finds if autoLanguageSwitching is enabled."""
-	if not config.conf['speech']['autoLanguageSwitching']:
+	if not config.conf.snapshot["speech", "autoLanguageSwitching"]:
 		speakSpelling(info.text,useCharacterDescriptions=useCharacterDescriptions)
 		return
 	curLanguage=None
@@ -198,7 +248,7 @@ def getSpeechForSpelling(  # noqa: C901
 		useCharacterDescriptions: bool = False
 ):
 	defaultLanguage=getCurrentLanguage()
-	if not locale or (not config.conf['speech']['autoDialectSwitching'] and locale.split('_')[0]==defaultLanguage.split('_')[0]):
+	if not locale or (not config.conf.snapshot["speech", "autoDialectSwitching"] and locale.split('_')[0]==defaultLanguage.split('_')[0]):
 		locale=defaultLanguage
 
 	if not text:
@@ -236,7 +286,7 @@ def getSpeechForSpelling(  # noqa: C901
 			speakCharAs=_("cap %s")%speakCharAs
 		if uppercase and synth.isSupported("pitch") and synthConfig["capPitchChange"]:
 			yield PitchCommand(offset=synthConfig["capPitchChange"])
-		if config.conf['speech']['autoLanguageSwitching']:
+		if config.conf.snapshot["speech", "autoLanguageSwitching"]:
 			yield LangChangeCommand(locale)
 		if len(speakCharAs) == 1 and synthConfig["useSpellingFunctionality"]:
 			if not charMode:
@@ -629,8 +679,8 @@ def speak(  # noqa: C901
 	beenCanceled=False
 	#Filter out redundant LangChangeCommand objects 
 	#And also fill in default values
-	autoLanguageSwitching=config.conf['speech']['autoLanguageSwitching']
-	autoDialectSwitching=config.conf['speech']['autoDialectSwitching']
+	autoLanguageSwitching=config.conf.snapshot["speech", "autoLanguageSwitching"]
+	autoDialectSwitching=config.conf.snapshot["speech", "autoDialectSwitching"]
 	curLanguage=defaultLanguage=getCurrentLanguage()
 	prevLanguage=None
 	defaultLanguageRoot=defaultLanguage.split('_')[0]
@@ -656,9 +706,10 @@ def speak(  # noqa: C901
 		return
 	import inputCore
 	inputCore.logTimeSinceInput()
+	latencyTracing.mark(latencyTracing.STAGE_SPEAK)
 	log.io("Speaking %r" % speechSequence)
 	if symbolLevel is None:
-		symbolLevel=config.conf["speech"]["symbolLevel"]
+		symbolLevel=config.conf.snapshot["speech", "symbolLevel"]
 	curLanguage=defaultLanguage
 	inCharacterMode=False
 	for index in range(len(speechSequence)):
@@ -851,7 +902,7 @@ def speakTypedCharacters(ch: str):
 		curWordChars=[]
 		if log.isEnabledFor(log.IO):
 			log.io("typed word: %s"%typedWord)
-		if config.conf["keyboard"]["speakTypedWords"] and not typingIsProtected:
+		if config.conf.snapshot["keyboard", "speakTypedWords"] and not typingIsProtected:
 			speakText(typedWord)
 	global _suppressSpeakTypedCharactersNumber, _suppressSpeakTypedCharactersTime
 	if _suppressSpeakTypedCharactersNumber > 0:
@@ -865,7 +916,7 @@ def speakTypedCharacters(ch: str):
 			_suppressSpeakTypedCharactersTime = None
 	else:
 		suppress = False
-	if not suppress and config.conf["keyboard"]["speakTypedCharacters"] and ch >= FIRST_NONCONTROL_CHAR:
+	if not suppress and config.conf.snapshot["keyboard", "speakTypedCharacters"] and ch >= FIRST_NONCONTROL_CHAR:
 		speakSpelling(realChar)
 
 
@@ -924,8 +975,13 @@ def speakTextInfo(  # noqa: C901
 		_prefixSpeechCommand: Optional[SpeechCommand] = None,
 		onlyInitialFields: bool = False,
 		suppressBlanks: bool = False,
-		priority: Optional[Spri] = None
+		priority: Optional[Spri] = None,
+		speechWithoutPauses: Optional[SpeechWithoutPauses] = None
 ) -> bool:
+	"""
+	@param speechWithoutPauses: When C{reason} is L{controlTypes.REASON_SAYALL},
+		the speech is segmented into phrases by this rather than by L{speakWithoutPauses}.
+	"""
 	onlyCache=reason==controlTypes.REASON_ONLYCACHE
 	if isinstance(useCache,SpeakTextInfoState):
 		speakTextInfoState=useCache
@@ -933,7 +989,7 @@ def speakTextInfo(  # noqa: C901
 		speakTextInfoState=SpeakTextInfoState(info.obj)
 	else:
 		speakTextInfoState=None
-	autoLanguageSwitching=config.conf['speech']['autoLanguageSwitching']
+	autoLanguageSwitching=config.conf.snapshot["speech", "autoLanguageSwitching"]
 	extraDetail=unit in (textInfos.UNIT_CHARACTER,textInfos.UNIT_WORD)
 	if not formatConfig:
 		formatConfig=config.conf["documentFormatting"]
@@ -1262,6 +1318,8 @@ def speakTextInfo(  # noqa: C901
 
 	if not onlyCache and speechSequence:
 		if reason==controlTypes.REASON_SAYALL:
+			if speechWithoutPauses:
+				return speechWithoutPauses.speak(speechSequence)
 			return speakWithoutPauses(speechSequence)
 		else:
 			speak(speechSequence,priority=priority)
@@ -2196,79 +2254,23 @@ def getTableInfoSpeech(
 	return textList
 
 
-re_last_pause=re.compile(r"^(.*(?<=[^\s.!?])[.!?][\"'”’)]?(?:\s+|$))(.*$)",re.DOTALL|re.UNICODE)
+#: Segments the speech for say all when the caller doesn't supply its own L{SpeechWithoutPauses}.
+_speechWithoutPauses = SpeechWithoutPauses()
 
 
-def speakWithoutPauses(  # noqa: C901
-		speechSequence: SpeechSequence,
+def speakWithoutPauses(
+		speechSequence: Optional[SpeechSequence],
 		detectBreaks: bool = True
 ) -> bool:
 	"""
 	Speaks the speech sequences given over multiple calls, only sending to the synth at acceptable phrase or sentence boundaries, or when given None for the speech sequence.
+	This uses a single L{SpeechWithoutPauses} shared by all callers;
+	independent readers should create their own instead.
 	@return: C{True} if something was actually spoken,
 		C{False} if only buffering occurred.
 	"""
-	lastStartIndex=0
-	#Break on all explicit break commands
-	if detectBreaks and speechSequence:
-		sequenceLen=len(speechSequence)
-		spoke = False
-		for index in range(sequenceLen):
-			if isinstance(speechSequence[index],EndUtteranceCommand):
-				if index>0 and lastStartIndex<index:
-					speakWithoutPauses(speechSequence[lastStartIndex:index],detectBreaks=False)
-				speakWithoutPauses(None)
-				spoke = True
-				lastStartIndex=index+1
-		if lastStartIndex<sequenceLen:
-			spoke = speakWithoutPauses(speechSequence[lastStartIndex:],detectBreaks=False)
-		return spoke
-	finalSpeechSequence=[] #To be spoken now
-	pendingSpeechSequence=[] #To be saved off for speaking  later
-	if speechSequence is None: #Requesting flush
-		if speakWithoutPauses._pendingSpeechSequence: 
-			#Place the last incomplete phrase in to finalSpeechSequence to be spoken now
-			finalSpeechSequence=speakWithoutPauses._pendingSpeechSequence
-			speakWithoutPauses._pendingSpeechSequence=[]
-	else: #Handling normal speech
-		#Scan the given speech and place all completed phrases in finalSpeechSequence to be spoken,
-		#And place the final incomplete phrase in pendingSpeechSequence
-		for index in range(len(speechSequence)-1,-1,-1): 
-			item=speechSequence[index]
-			if isinstance(item,str):
-				m=re_last_pause.match(item)
-				if m:
-					before,after=m.groups()
-					if after:
-						pendingSpeechSequence.append(after)
-					if before:
-						finalSpeechSequence.extend(speakWithoutPauses._pendingSpeechSequence)
-						speakWithoutPauses._pendingSpeechSequence=[]
-						finalSpeechSequence.extend(speechSequence[0:index])
-						finalSpeechSequence.append(before)
-						# Apply the last language change to the pending sequence.
-						# This will need to be done for any other speech change commands introduced in future.
-						for changeIndex in range(index-1,-1,-1):
-							change=speechSequence[changeIndex]
-							if not isinstance(change,LangChangeCommand):
-								continue
-							pendingSpeechSequence.append(change)
-							break
-						break
-				else:
-					pendingSpeechSequence.append(item)
-			else:
-				pendingSpeechSequence.append(item)
-		if pendingSpeechSequence:
-			pendingSpeechSequence.reverse()
-			speakWithoutPauses._pendingSpeechSequence.extend(pendingSpeechSequence)
-	if finalSpeechSequence:
-		speak(finalSpeechSequence)
-		return True
-	return False
-
+	return _speechWithoutPauses.speak(speechSequence, detectBreaks=detectBreaks)
 
-speakWithoutPauses._pendingSpeechSequence=[]
 
 from .manager import SpeechManager
 #: The singleton _SpeechManager instance used for speech functions.
@@ -4,11 +4,16 @@
 #See the file COPYING for more details.
 #Copyright (C) 2006-2019 NV Access Limited
 
+import collections
+import itertools
+import time
 from logHandler import log
 import queueHandler
 import synthDriverHandler
+import latencyTracing
 from .commands import *
 from .priorities import Spri, SPEECH_PRIORITIES
+from .types import _isDebugForSpeech
 
 class ParamChangeTracker(object):
 	"""Keeps track of commands which change parameters from their defaults.
@@ -41,6 +46,96 @@ class ParamChangeTracker(object):
 		"""
 		return list(self._commands.values())
 
+def _getParamValue(command):
+	"""Get a value which identifies the effect of a parameter change command.
+	Two commands of the same type with equal values have the same effect.
+	@return: The value, C{None} if the command restores the default,
+		or L{NotImplemented} if the effect of this type of command is unknown.
+	"""
+	if command.isDefault:
+		return None
+	if isinstance(command, LangChangeCommand):
+		return command.lang
+	if isinstance(command, CharacterModeCommand):
+		return command.state
+	if isinstance(command, BaseProsodyCommand):
+		return (command._offset, command._multiplier)
+	return NotImplemented
+
+def _compactSequence(seq, params):
+	"""Compact a single sequence. See L{compactSpeechSequences}.
+	@param params: Maps parameter change command types to the values in effect at the start of the sequence.
+		This is updated with the values in effect at the end.
+	@type params: dict
+	"""
+	outSeq = []
+	# Parameter changes since the last item which produces speech, by type.
+	# A later change of the same type replaces an earlier one, since the earlier one never affected anything.
+	pendingParams = {}
+
+	def flushParams():
+		for paramType, command in pendingParams.items():
+			value = _getParamValue(command)
+			if params.get(paramType) == value:
+				# This doesn't change anything.
+				continue
+			if value is None:
+				del params[paramType]
+			else:
+				params[paramType] = value
+			outSeq.append(command)
+		pendingParams.clear()
+
+	for item in seq:
+		if isinstance(item, str):
+			if not item:
+				continue
+			flushParams()
+			if outSeq and isinstance(outSeq[-1], str):
+				# Synths speak adjacent strings as if they were one string.
+				outSeq[-1] += item
+			else:
+				outSeq.append(item)
+		elif isinstance(item, SynthParamCommand) and _getParamValue(item) is not NotImplemented:
+			paramType = type(item)
+			pendingParams.pop(paramType, None)
+			pendingParams[paramType] = item
+		else:
+			# Indexes, breaks, phonemes, etc. must stay exactly where they are relative to the speech around them.
+			flushParams()
+			outSeq.append(item)
+	flushParams()
+	return outSeq
+
+def compactSpeechSequences(seqs):
+	"""Remove items from processed speech sequences which don't affect the resulting speech.
+	Adjacent strings are merged, empty strings are removed
+	and parameter changes which are overridden before any speech or which change nothing are removed.
+	This means synths receive fewer, larger items.
+	Indexes and the order of all other commands are preserved,
+	as is the splitting of the sequences at indexes.
+	Each utterance starts with default parameters,
+	so parameter changes are only considered redundant within an utterance.
+	Parameters which apply when a sequence is resumed after being preempted are restored by L{ParamChangeTracker},
+	so they need not be kept in the sequence.
+	@param seqs: Sequences as returned by L{SpeechManager._processSpeechSequence}.
+	@type seqs: list of L{SpeechSequence}
+	@return: The compacted sequences.
+	@rtype: list of L{SpeechSequence}
+	"""
+	outSeqs = []
+	params = {}
+	for seq in seqs:
+		if isinstance(seq[0], (EndUtteranceCommand, ConfigProfileTriggerCommand)):
+			# A new utterance follows.
+			params = {}
+			outSeqs.append(seq)
+			continue
+		outSeq = _compactSequence(seq, params)
+		if outSeq:
+			outSeqs.append(outSeq)
+	return outSeqs
+
 class _ManagerPriorityQueue(object):
 	"""A speech queue for a specific priority.
 	This is intended for internal use by L{_SpeechManager} only.
@@ -55,12 +150,69 @@ class _ManagerPriorityQueue(object):
 		#: The pending speech sequences to be spoken.
 		#: These are split at indexes,
 		#: so a single utterance might be split over multiple sequences.
-		self.pendingSequences = []
+		#: Sequences should be added with L{extend} and removed with L{popleft}
+		#: so that the queue can keep track of where each index is.
+		self.pendingSequences = collections.deque()
+		#: The time each of L{pendingSequences} was queued, as returned by C{time.perf_counter}.
+		self._queuedTimes = collections.deque()
+		#: The number of sequences removed from the front of L{pendingSequences} so far.
+		#: Adding this to an index into L{pendingSequences} gives a position
+		#: which doesn't change as earlier sequences are removed.
+		self._removedCount = 0
+		#: Maps speech indexes to the positions of the pending sequences they end.
+		self._indexesToPositions = {}
 		#: The configuration profile triggers that have been entered during speech.
 		self.enteredProfileTriggers = []
 		#: Keeps track of parameters that have been changed during an utterance.
 		self.paramTracker = ParamChangeTracker()
 
+	def extend(self, sequences, queuedTime):
+		"""Add sequences to the end of the queue.
+		@param sequences: The processed sequences to add.
+		@type sequences: list of L{SpeechSequence}
+		@param queuedTime: The time at which the sequences were queued, as returned by C{time.perf_counter}.
+		@type queuedTime: float
+		"""
+		position = self._removedCount + len(self.pendingSequences)
+		for seq in sequences:
+			lastCommand = seq[-1]
+			if isinstance(lastCommand, IndexCommand):
+				self._indexesToPositions[lastCommand.index] = position
+			position += 1
+		self.pendingSequences.extend(sequences)
+		self._queuedTimes.extend(itertools.repeat(queuedTime, len(sequences)))
+
+	def popleft(self):
+		"""Remove and return the first sequence in the queue.
+		@rtype: L{SpeechSequence}
+		"""
+		seq = self.pendingSequences.popleft()
+		self._queuedTimes.popleft()
+		position = self._removedCount
+		self._removedCount += 1
+		lastCommand = seq[-1]
+		# Index numbers are reused eventually, so the index might already belong to a later sequence.
+		if isinstance(lastCommand, IndexCommand) and self._indexesToPositions.get(lastCommand.index) == position:
+			del self._indexesToPositions[lastCommand.index]
+		return seq
+
+	def findIndex(self, index):
+		"""Find the pending sequence which ends with the given speech index.
+		@param index: The speech index.
+		@type index: int
+		@return: The position of the sequence in L{pendingSequences}, or C{None} if there is no such sequence.
+		@rtype: int
+		"""
+		position = self._indexesToPositions.get(index)
+		if position is None:
+			return None
+		return position - self._removedCount
+
+	def getFirstQueuedTime(self):
+		"""Get the time at which the first pending sequence was queued, as returned by C{time.perf_counter}.
+		"""
+		return self._queuedTimes[0]
+
 class SpeechManager(object):
 	"""Manages queuing of speech utterances, calling callbacks at desired points in the speech, profile switching, prioritization, etc.
 	This is intended for internal use only.
@@ -113,9 +265,18 @@ class SpeechManager(object):
 	All of this activity is (and must be) synchronized and serialized on the main thread.
 	"""
 
+	#: The number of recent utterance wait times kept for L{getStats}.
+	MAX_WAIT_TIMES = 100
+
 	def __init__(self):
 		#: A counter for indexes sent to the synthesizer for callbacks, etc.
 		self._indexCounter = self._generateIndexes()
+		#: The number of times speech has been cancelled.
+		self._cancelCount = 0
+		#: The number of utterances sent to the synthesizer.
+		self._utteranceCount = 0
+		#: How long recent utterances waited in the queue before being sent to the synthesizer, in seconds.
+		self._utteranceWaitTimes = collections.deque(maxlen=self.MAX_WAIT_TIMES)
 		self._reset()
 		synthDriverHandler.synthIndexReached.register(self._onSynthIndexReached)
 		synthDriverHandler.synthDoneSpeaking.register(self._onSynthDoneSpeaking)
@@ -151,6 +312,7 @@ class SpeechManager(object):
 		self._shouldPushWhenDoneSpeaking = False
 
 	def speak(self, speechSequence, priority):
+		latencyTracing.mark(latencyTracing.STAGE_SPEECH_MANAGER)
 		# If speech isn't already in progress, we need to push the first speech.
 		push = self._curPriQueue is None
 		interrupt = self._queueSpeechSequence(speechSequence, priority)
@@ -165,12 +327,12 @@ class SpeechManager(object):
 		@return: Whether to interrupt speech.
 		@rtype: bool
 		"""
-		outSeq = self._processSpeechSequence(inSeq)
+		outSeq = compactSpeechSequences(self._processSpeechSequence(inSeq))
 		queue = self._priQueues.get(priority)
 		if not queue:
 			queue = self._priQueues[priority] = _ManagerPriorityQueue(priority)
 		first = len(queue.pendingSequences) == 0
-		queue.pendingSequences.extend(outSeq)
+		queue.extend(outSeq, time.perf_counter())
 		if priority is Spri.NOW and first:
 			# If this is the first sequence at Spri.NOW, interrupt speech.
 			return True
@@ -287,6 +449,7 @@ class SpeechManager(object):
 			return self._pushNextSpeech(True)
 		seq = self._buildNextUtterance()
 		if seq:
+			latencyTracing.mark(latencyTracing.STAGE_SYNTH_SPEAK)
 			getSynth().speak(seq)
 
 	def _getNextPriority(self):
@@ -304,23 +467,36 @@ class SpeechManager(object):
 		"""Since an utterance might be split over several sequences,
 		build a complete utterance to pass to the synth.
 		"""
+		queue = self._curPriQueue
 		utterance = []
 		# If this utterance was preempted by higher priority speech,
 		# apply any parameters changed before the preemption.
-		params = self._curPriQueue.paramTracker.getChanged()
+		params = queue.paramTracker.getChanged()
 		utterance.extend(params)
-		for seq in self._curPriQueue.pendingSequences:
+		for seq in queue.pendingSequences:
 			if isinstance(seq[0], EndUtteranceCommand):
 				# The utterance ends here.
 				break
 			utterance.extend(seq)
+		waitTime = time.perf_counter() - queue.getFirstQueuedTime()
+		self._utteranceWaitTimes.append(waitTime)
+		self._utteranceCount += 1
+		if _isDebugForSpeech():
+			log.debug(
+				f"Utterance at priority {queue.priority.name} waited {waitTime * 1000:.1f} ms, "
+				f"queue depths: {self._getQueueDepths()}"
+			)
 		return utterance
 
 	def _onSynthIndexReached(self, synth=None, index=None):
 		if synth != getSynth():
 			return
+		# This is called on the synth's thread, so it is as close as we can get to when the index was actually reached.
+		latencyTracing.mark(latencyTracing.STAGE_SYNTH_INDEX_REACHED)
 		# This needs to be handled in the main thread.
-		queueHandler.queueFunction(queueHandler.eventQueue, self._handleIndex, index)
+		# Say all moves the caret when an index is reached,
+		# so handle indexes in order with caret events rather than after them.
+		queueHandler.queueFunctionInLane(queueHandler.eventQueue, queueHandler.LANE_CARET, self._handleIndex, index)
 
 	def _removeCompletedFromQueue(self, index):
 		"""Removes completed speech sequences from the queue.
@@ -330,39 +506,37 @@ class SpeechManager(object):
 			endOfUtterance indicates whether this sequence was the end of the current utterance.
 		@rtype: (bool, bool)
 		"""
-		# Find the sequence that just completed speaking.
-		if not self._curPriQueue:
+		queue = self._curPriQueue
+		if not queue:
 			# No speech in progress. Probably from a previous utterance which was cancelled.
 			return False, False
-		for seqIndex, seq in enumerate(self._curPriQueue.pendingSequences):
-			lastCommand = seq[-1] if isinstance(seq, list) else None
-			if isinstance(lastCommand, IndexCommand):
-				if index > lastCommand.index:
-					log.debugWarning(f"Reached speech index {index :d}, but index {lastCommand.index :d} never handled")
-				elif index == lastCommand.index:
-					endOfUtterance = isinstance(self._curPriQueue.pendingSequences[seqIndex + 1][0], EndUtteranceCommand)
-					if endOfUtterance:
-						# Remove the EndUtteranceCommand as well.
-						seqIndex += 1
-					break # Found it!
-		else:
+		# Find the sequence that just completed speaking.
+		seqIndex = queue.findIndex(index)
+		if seqIndex is None:
 			# Unknown index. Probably from a previous utterance which was cancelled.
 			return False, False
+		pending = queue.pendingSequences
+		endOfUtterance = seqIndex + 1 < len(pending) and isinstance(pending[seqIndex + 1][0], EndUtteranceCommand)
 		if endOfUtterance:
 			# These params may not apply to the next utterance if it was queued separately,
 			# so reset the tracker.
 			# The next utterance will include the commands again if they do still apply.
-			self._curPriQueue.paramTracker = ParamChangeTracker()
-		else:
-			# Keep track of parameters changed so far.
-			# This is necessary in case this utterance is preempted by higher priority speech.
-			for seqIndex in range(seqIndex + 1):
-				seq = self._curPriQueue.pendingSequences[seqIndex]
+			queue.paramTracker = ParamChangeTracker()
+		# This sequence is done, so we don't need to track it any more.
+		# Nor do we need to track any sequences before it.
+		for removeIndex in range(seqIndex + 1):
+			seq = queue.popleft()
+			if removeIndex < seqIndex and isinstance(seq[-1], IndexCommand):
+				log.debugWarning(f"Reached speech index {index :d}, but index {seq[-1].index :d} never handled")
+			if not endOfUtterance:
+				# Keep track of parameters changed so far.
+				# This is necessary in case this utterance is preempted by higher priority speech.
 				for command in seq:
 					if isinstance(command, SynthParamCommand):
-						self._curPriQueue.paramTracker.update(command)
-		# This sequence is done, so we don't need to track it any more.
-		del self._curPriQueue.pendingSequences[:seqIndex + 1]
+						queue.paramTracker.update(command)
+		if endOfUtterance:
+			# Remove the EndUtteranceCommand as well.
+			queue.popleft()
 		return True, endOfUtterance
 
 	def _handleIndex(self, index):
@@ -381,8 +555,8 @@ class SpeechManager(object):
 	def _onSynthDoneSpeaking(self, synth=None):
 		if synth != getSynth():
 			return
-		# This needs to be handled in the main thread.
-		queueHandler.queueFunction(queueHandler.eventQueue, self._handleDoneSpeaking)
+		# This needs to be handled in the main thread, in order with indexes.
+		queueHandler.queueFunctionInLane(queueHandler.eventQueue, queueHandler.LANE_CARET, self._handleDoneSpeaking)
 
 	def _handleDoneSpeaking(self):
 		if self._shouldPushWhenDoneSpeaking:
@@ -390,7 +564,7 @@ class SpeechManager(object):
 			self._pushNextSpeech(True)
 
 	def _switchProfile(self):
-		command = self._curPriQueue.pendingSequences.pop(0)[0]
+		command = self._curPriQueue.popleft()[0]
 		assert isinstance(command, ConfigProfileTriggerCommand), "First pending command should be a ConfigProfileTriggerCommand"
 		if command.enter:
 			try:
@@ -423,7 +597,31 @@ class SpeechManager(object):
 		synthDriverHandler.handlePostConfigProfileSwitch(resetSpeechIfNeeded=False)
 
 	def cancel(self):
+		self._cancelCount += 1
 		getSynth().cancel()
 		if self._curPriQueue and self._curPriQueue.enteredProfileTriggers:
 			self._exitProfileTriggers(self._curPriQueue.enteredProfileTriggers)
 		self._reset()
+
+	def _getQueueDepths(self):
+		return {
+			queue.priority.name: len(queue.pendingSequences)
+			for queue in self._priQueues.values()
+		}
+
+	def getStats(self):
+		"""Get statistics about queued speech; e.g. for inspection from the Python console.
+		@return: A dict containing:
+			C{queueDepths}: the number of pending sequences for each priority,
+			C{cancelCount}: the number of times speech was cancelled,
+			C{utteranceCount}: the number of utterances sent to the synthesizer,
+			C{waitTimes}: how long recent utterances waited before being sent to the synthesizer,
+			in seconds, oldest first.
+		@rtype: dict
+		"""
+		return {
+			"queueDepths": self._getQueueDepths(),
+			"cancelCount": self._cancelCount,
+			"utteranceCount": self._utteranceCount,
+			"waitTimes": list(self._utteranceWaitTimes),
+		}
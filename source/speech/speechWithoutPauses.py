@@ -0,0 +1,132 @@
+# -*- coding: UTF-8 -*-
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2006-2020 NV Access Limited
+
+"""Speaking of text supplied in chunks, such as the lines read by say all, without pausing between chunks.
+Speech is only sent to the synthesizer at phrase or sentence boundaries,
+so that the synthesizer doesn't pause in the middle of a sentence which happens to span several chunks.
+"""
+
+import itertools
+import re
+from typing import Callable, List, Optional
+
+from .commands import EndUtteranceCommand, LangChangeCommand
+from .types import SpeechSequence
+
+#: Matches text up to and including the last sentence ending punctuation (and the whitespace after it).
+#: The remaining text, which does not yet end a sentence, is the second group.
+re_last_pause = re.compile(r"^(.*(?<=[^\s.!?])[.!?][\"'”’)]?(?:\s+|$))(.*$)", re.DOTALL | re.UNICODE)
+
+
+class SpeechWithoutPauses:
+	"""Segments speech supplied in chunks into phrases and speaks each phrase as soon as it is complete.
+	Speech after the last phrase boundary is kept until a later chunk completes it,
+	or until it is explicitly flushed with L{flush}.
+	Each chunk is only examined once, so the cost of segmenting is linear in the total length of the speech.
+	Independent readers should each use their own instance.
+	"""
+
+	def __init__(self, speakFunc: Optional[Callable[[SpeechSequence], None]] = None):
+		"""
+		@param speakFunc: Called to speak each complete phrase.
+			If C{None}, L{speech.speak} is looked up each time a phrase is spoken,
+			so that replacing it (e.g. from an add-on or a test) also affects this instance.
+		"""
+		self._speakFunc = speakFunc
+		#: Speech after the last phrase boundary seen so far.
+		self._pendingSpeechSequence: SpeechSequence = []
+
+	def _speak(self, speechSequence: SpeechSequence):
+		if self._speakFunc:
+			self._speakFunc(speechSequence)
+			return
+		# Imported here to avoid a circular import.
+		import speech
+		speech.speak(speechSequence)
+
+	def reset(self):
+		"""Discard any pending speech without speaking it."""
+		self._pendingSpeechSequence = []
+
+	def speak(
+			self,
+			speechSequence: Optional[SpeechSequence],
+			detectBreaks: bool = True
+	) -> bool:
+		"""Speak the complete phrases in a chunk of speech, keeping any incomplete phrase for later.
+		@param speechSequence: The chunk of speech,
+			or C{None} to speak any pending speech as per L{flush}.
+		@param detectBreaks: Whether an L{EndUtteranceCommand} in the chunk should flush the speech before it.
+		@return: C{True} if something was actually spoken,
+			C{False} if only buffering occurred.
+		"""
+		if speechSequence is None:
+			return self.flush()
+		if not detectBreaks:
+			return self._speakChunk(speechSequence, 0, len(speechSequence))
+		# Break on all explicit break commands.
+		# Ranges of the sequence are handled in place, rather than copying slices of it.
+		spoke = False
+		startIndex = 0
+		for index, item in enumerate(speechSequence):
+			if isinstance(item, EndUtteranceCommand):
+				if startIndex < index:
+					self._speakChunk(speechSequence, startIndex, index)
+				self.flush()
+				spoke = True
+				startIndex = index + 1
+		if startIndex < len(speechSequence):
+			spoke = self._speakChunk(speechSequence, startIndex, len(speechSequence))
+		return spoke
+
+	def flush(self) -> bool:
+		"""Speak any pending speech, even though it doesn't end at a phrase boundary.
+		@return: C{True} if something was actually spoken.
+		"""
+		if not self._pendingSpeechSequence:
+			return False
+		finalSpeechSequence = self._pendingSpeechSequence
+		self._pendingSpeechSequence = []
+		self._speak(finalSpeechSequence)
+		return True
+
+	def _speakChunk(self, speechSequence: SpeechSequence, start: int, end: int) -> bool:
+		"""Handle the items of a sequence from C{start} up to but not including C{end},
+		which must not contain any L{EndUtteranceCommand}.
+		"""
+		# Only the last phrase boundary matters,
+		# so search backwards for the last string which contains one.
+		for index in range(end - 1, start - 1, -1):
+			item = speechSequence[index]
+			if not isinstance(item, str):
+				continue
+			m = re_last_pause.match(item)
+			if m:
+				break
+		else:
+			# There is no phrase boundary, so all of this is pending.
+			self._pendingSpeechSequence.extend(itertools.islice(speechSequence, start, end))
+			return False
+		before, after = m.groups()
+		# Everything up to the boundary is now a complete phrase.
+		# The pending list becomes the phrase to speak, so nothing already pending is copied.
+		finalSpeechSequence = self._pendingSpeechSequence
+		finalSpeechSequence.extend(itertools.islice(speechSequence, start, index))
+		finalSpeechSequence.append(before)
+		pendingSpeechSequence: List = []
+		# Apply the last language change to the pending sequence.
+		# This will need to be done for any other speech change commands introduced in future.
+		for changeIndex in range(index - 1, start - 1, -1):
+			change = speechSequence[changeIndex]
+			if isinstance(change, LangChangeCommand):
+				pendingSpeechSequence.append(change)
+				break
+		if after:
+			pendingSpeechSequence.append(after)
+		pendingSpeechSequence.extend(itertools.islice(speechSequence, index + 1, end))
+		self._pendingSpeechSequence = pendingSpeechSequence
+		self._speak(finalSpeechSequence)
+		return True
@@ -12,9 +12,14 @@ import codecs
 import api
 import config
 from . import dictFormatUpgrade
+from .compiledDict import CompiledSpeechDict
 from .speechDictVars import speechDictsPath
 
 dictionaries = {}
+#: Incremented whenever an entry is added to, removed from or replaced in any speech dictionary.
+#: This allows callers to tell when text they processed earlier might now be processed differently.
+#: @type: int
+dictionariesVersion = 0
 dictTypes = ("temp", "voice", "default", "builtin") # ordered by their priority E.G. voice specific speech dictionary is processed before the default
 
 # Types of speech dictionary entries:
@@ -48,6 +53,9 @@ class SpeechDictEntry:
 class SpeechDict(list):
 
 	fileName = None
+	#: The compiled form of this dictionary, or C{None} if it must be compiled again.
+	#: @type: L{CompiledSpeechDict}
+	_compiled = None
 
 	def load(self, fileName):
 		self.fileName=fileName
@@ -100,18 +108,36 @@ class SpeechDict(list):
 		file.close()
 
 	def sub(self, text):
-		invalidEntries = []
-		for index, entry in enumerate(self):
-			try:
-				text = entry.sub(text)
-			except re.error as exc:
-				dictName = self.fileName or "temporary dictionary"
-				log.error(f"Invalid dictionary entry {index+1} in {dictName}: \"{entry.pattern}\", {exc}")
-				invalidEntries.append(index)
-			for index in reversed(invalidEntries):
-				del self[index]
+		compiled = self._compiled
+		if compiled is None:
+			# The dictionary was loaded or edited since it was last used.
+			compiled = self._compiled = CompiledSpeechDict(self)
+		text, invalidEntries = compiled.sub(text)
+		for index, exc in reversed(invalidEntries):
+			dictName = self.fileName or "temporary dictionary"
+			log.error(f"Invalid dictionary entry {index+1} in {dictName}: \"{self[index].pattern}\", {exc}")
+			del self[index]
 		return text
 
+def _makeInvalidatingListMethod(name):
+	listMethod = getattr(list, name)
+	def method(self, *args, **kwargs):
+		global dictionariesVersion
+		self._compiled = None
+		dictionariesVersion += 1
+		return listMethod(self, *args, **kwargs)
+	method.__name__ = name
+	method.__doc__ = listMethod.__doc__
+	return method
+
+# Any change to the entries of a dictionary means it must be compiled again before it is next used.
+for _name in (
+	"__setitem__", "__delitem__", "__iadd__", "__imul__",
+	"append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+):
+	setattr(SpeechDict, _name, _makeInvalidatingListMethod(_name))
+del _name
+
 def processText(text):
 	if not globalVars.speechDictionaryProcessing:
 		return text
@@ -0,0 +1,166 @@
+# -*- coding: UTF-8 -*-
+# A part of NonVisual Desktop Access (NVDA)
+# Copyright (C) 2020 NV Access Limited
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+
+"""Compiled form of a speech dictionary.
+Applying a dictionary entry by entry costs one C{re.sub} per entry for every utterance,
+which becomes noticeable for dictionaries with thousands of entries.
+A L{CompiledSpeechDict} instead scans the text once with an Aho-Corasick automaton
+built from the patterns of all anywhere and whole word entries.
+Only the entries whose pattern occurs in the text, plus any regular expression entries,
+are then applied, still in dictionary order.
+Whenever an entry actually changes the text, the remaining entries are checked against the new text again.
+This means that the result is identical to applying every entry in turn.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+
+class LiteralMatcher:
+	"""An Aho-Corasick automaton which reports which of a set of literal keys occur in a text.
+	Overlapping occurrences are all reported, so a key is never missed because another key matched first.
+	"""
+
+	def __init__(self, keys: Iterable[str]):
+		self._keys: Tuple[str, ...] = tuple(keys)
+		#: Transitions for each state, mapping a character to the next state.
+		self._goto: List[Dict[str, int]] = [{}]
+		#: The failure transition for each state.
+		self._fail: List[int] = [0]
+		#: The keys ending at each state, including those reached via failure transitions.
+		self._out: List[FrozenSet[str]] = [frozenset()]
+		for key in self._keys:
+			self._addKey(key)
+		self._buildFailureLinks()
+
+	def _addKey(self, key: str):
+		state = 0
+		for char in key:
+			nextState = self._goto[state].get(char)
+			if nextState is None:
+				nextState = len(self._goto)
+				self._goto.append({})
+				self._fail.append(0)
+				self._out.append(frozenset())
+				self._goto[state][char] = nextState
+			state = nextState
+		self._out[state] = self._out[state] | {key}
+
+	def _buildFailureLinks(self):
+		goto = self._goto
+		fail = self._fail
+		out = self._out
+		# Breadth first, so the failure state of a parent is always known before its children are handled.
+		queue = list(goto[0].values())
+		for state in queue:
+			for char, nextState in goto[state].items():
+				queue.append(nextState)
+				failState = fail[state]
+				while failState and char not in goto[failState]:
+					failState = fail[failState]
+				failState = goto[failState].get(char, 0)
+				fail[nextState] = failState
+				if out[failState]:
+					out[nextState] = out[nextState] | out[failState]
+
+	def findKeys(self, text: str) -> FrozenSet[str]:
+		"""Get the keys which occur anywhere in the given text.
+		"""
+		if len(self._keys) < len(text):
+			# Walking the automaton in Python costs about as much per character
+			# as a substring search in C costs per key,
+			# so searching for each key is quicker when there are fewer keys than characters.
+			return frozenset(key for key in self._keys if key in text)
+		goto = self._goto
+		fail = self._fail
+		out = self._out
+		found = set()
+		state = 0
+		for char in text:
+			while state and char not in goto[state]:
+				state = fail[state]
+			state = goto[state].get(char, 0)
+			if out[state]:
+				found.update(out[state])
+		return frozenset(found)
+
+
+#: Characters for which case insensitive matching by C{re} doesn't agree with C{str.casefold}.
+#: With C{re.IGNORECASE}, all of these match each other,
+#: whereas casefolding maps the Turkish dotless i (U+0131) and dotted capital I (U+0130) to themselves.
+#: The literal scan can't find such matches, so case insensitive entries containing them are always tried.
+_UNFOLDABLE_CHARS = frozenset("iI\u0131\u0130")
+
+
+class CompiledSpeechDict:
+	"""A speech dictionary compiled for applying all of its entries to a text in one go.
+	The entries are captured when the compiled dictionary is created,
+	so it must be recreated whenever the dictionary changes.
+	L{speechDictHandler.SpeechDict} takes care of that.
+	"""
+
+	def __init__(self, entries):
+		"""
+		@param entries: The dictionary entries in the order in which they should be applied.
+		@type entries: list of L{speechDictHandler.SpeechDictEntry}
+		"""
+		# Imported here to avoid a circular import.
+		from . import ENTRY_TYPE_REGEXP
+		self.entries = list(entries)
+		#: Indexes of entries which must be tried on every text;
+		#: i.e. regular expressions and entries with an empty pattern.
+		#: This includes case insensitive entries containing a letter whose case insensitive matching
+		#: differs between C{re} and C{str.casefold}; see L{_UNFOLDABLE_CHARS}.
+		self._alwaysTried: List[int] = []
+		#: Maps literal keys to the indexes of the entries using them.
+		self._keysToEntries: Dict[str, List[int]] = {}
+		for index, entry in enumerate(self.entries):
+			if (
+				entry.type == ENTRY_TYPE_REGEXP
+				or not entry.pattern
+				or (not entry.caseSensitive and not _UNFOLDABLE_CHARS.isdisjoint(entry.pattern))
+			):
+				self._alwaysTried.append(index)
+				continue
+			# Case folding both the keys and the text makes the scan find a superset of
+			# the occurrences that case sensitive and case insensitive matching would find.
+			# The actual substitution is still done by the entry itself.
+			self._keysToEntries.setdefault(entry.pattern.casefold(), []).append(index)
+		self._matcher = LiteralMatcher(self._keysToEntries) if self._keysToEntries else None
+
+	def _getCandidates(self, text: str, start: int) -> List[int]:
+		"""Get the indexes of the entries from C{start} onwards which might match the given text, in order.
+		"""
+		candidates = [index for index in self._alwaysTried if index >= start]
+		if self._matcher:
+			for key in self._matcher.findKeys(text.casefold()):
+				candidates.extend(index for index in self._keysToEntries[key] if index >= start)
+		candidates.sort()
+		return candidates
+
+	def sub(self, text: str) -> Tuple[str, List[Tuple[int, re.error]]]:
+		"""Apply the dictionary to the given text.
+		@return: The resulting text and the index and error of any entries which failed to apply.
+			Invalid entries are skipped.
+		"""
+		invalidEntries = []
+		candidates = self._getCandidates(text, 0)
+		pos = 0
+		while pos < len(candidates):
+			index = candidates[pos]
+			pos += 1
+			try:
+				newText = self.entries[index].sub(text)
+			except re.error as exc:
+				invalidEntries.append((index, exc))
+				continue
+			if newText != text:
+				text = newText
+				# The replacement might create or destroy occurrences of later patterns,
+				# so work out the remaining candidates again.
+				candidates = self._getCandidates(text, index + 1)
+				pos = 0
+		return text, invalidEntries
@@ -95,7 +95,7 @@ class VisionHandler(AutoPropertyObject):
 		"""
 		self._updateAllProvidersList()
 		self.handleConfigProfileSwitch()
-		config.post_configProfileSwitch.register(self.handleConfigProfileSwitch)
+		config.post_configProfileSwitch.register(self.handleConfigProfileSwitch, sections=("vision",))
 
 	_allProviders: List[providerInfo.ProviderInfo] = []
 
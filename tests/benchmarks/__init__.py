@@ -0,0 +1,30 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""NVDA performance benchmarks.
+Benchmarks are not unit tests; they measure how long parts of NVDA take rather than checking behaviour.
+Benchmark modules have a C{bench_} prefix, so they are not collected by unit test discovery,
+and are run individually; e.g.::
+	py -m tests.benchmarks.bench_speechDictHandler
+They reuse the bootstrapping of the unit tests,
+so NVDA modules can be imported and the unit test fakes can be used.
+"""
+
+import timeit
+
+# Suppress Flake8 warning F401 (module imported but unused)
+# as this module is imported for its bootstrapping side effects.
+from .. import unit  # noqa: F401
+
+
+def timePerCall(func, number=1000, repeat=5):
+	"""Time a callable.
+	@param func: The callable to time, which takes no arguments.
+	@param number: The number of calls in each timing run.
+	@param repeat: The number of timing runs; the fastest is used.
+	@return: The time per call in seconds.
+	@rtype: float
+	"""
+	return min(timeit.repeat(func, number=number, repeat=repeat)) / number
@@ -0,0 +1,263 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Measures how long the braille handler takes to present focus changes, caret movement, scrolling and routing
+in a large document, for several display sizes and translation tables, with and without word wrap.
+The cells are written to a fake display which records the writes.
+Run with::
+	py -m tests.benchmarks.bench_braille
+To save the results as a baseline, and later fail if an operation has become slower than the baseline::
+	py -m tests.benchmarks.bench_braille --save-baseline brailleBaseline.json
+	py -m tests.benchmarks.bench_braille --baseline brailleBaseline.json
+Timings depend on the machine, so a baseline should only be compared with results from the same machine.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import string
+import sys
+import tracemalloc
+import api
+import braille
+import config
+import controlTypes
+import globalVars
+from ..unit.objectProvider import NVDAObjectWithRole
+from ..unit.textProvider import BasicTextProvider
+from . import timePerCall
+
+DISPLAY_SIZES = (20, 40, 80)
+#: Uncontracted and contracted tables.
+TABLES = ("en-ueb-g1.ctb", "en-ueb-g2.ctb")
+#: The number of lines in the document.
+DOCUMENT_LINES = 5000
+#: The number of calls of each operation in each timing run.
+CALLS = 100
+#: The slowdown relative to the baseline which is tolerated by default, as a fraction of the baseline time.
+DEFAULT_TOLERANCE = 0.25
+
+
+class RecordingDisplay(braille.BrailleDisplayDriver):
+	"""A fake display which records the cells written to it."""
+	name = "benchmarkRecording"
+	description = "Recording display for benchmarks"
+
+	def __init__(self, numCells):
+		super().__init__()
+		self._numCells = numCells
+		#: The number of writes to the display.
+		self.writeCount = 0
+		#: The cells last written to the display.
+		self.cells = []
+
+	def _get_numCells(self):
+		return self._numCells
+
+	def display(self, cells):
+		self.writeCount += 1
+		self.cells = cells
+
+
+class Document(BasicTextProvider):
+	"""A multi line edit field containing a document."""
+
+	def _get_role(self):
+		return controlTypes.ROLE_EDITABLETEXT
+
+	def _get_name(self):
+		return "document"
+
+	def _get__hasNavigableText(self):
+		return True
+
+
+def makeDocumentText(lines=DOCUMENT_LINES, seed=0):
+	"""Make text with lines of varying length, many of which are longer than a display."""
+	rand = random.Random(seed)
+	words = [
+		"".join(rand.choice(string.ascii_lowercase) for i in range(rand.randint(1, 12)))
+		for i in range(500)
+	]
+	# Include words which are contracted in contracted braille.
+	words.extend(("the", "and", "with", "braille", "knowledge", "people", "children"))
+	return "\n".join(
+		" ".join(rand.choice(words) for i in range(rand.randint(0, 30))).capitalize() + "."
+		for i in range(lines)
+	)
+
+
+def getLineStarts(text):
+	"""Get the offset of the start of each line in some text."""
+	return [0] + [index + 1 for index, char in enumerate(text) if char == "\n"]
+
+
+class Operations:
+	"""The operations measured for a document, each a callable taking no arguments."""
+
+	def __init__(self, document):
+		self.document = document
+		self.lineStarts = getLineStarts(document.basicText)
+		self._focusOffsets = itertools.cycle(
+			random.Random(1).sample(self.lineStarts, min(len(self.lineStarts), 200))
+		)
+		self._lineNumbers = itertools.cycle(range(len(self.lineStarts)))
+		self._routingRandom = random.Random(2)
+
+	def _moveCaret(self, offset):
+		"""Move the caret and present the move, as a caret event would."""
+		self.document.selectionOffsets = (offset, offset)
+		braille.handler.handleCaretMove(self.document)
+		braille.handler.handlePendingCaretUpdate()
+
+	def focus(self):
+		offset = next(self._focusOffsets)
+		self.document.selectionOffsets = (offset, offset)
+		braille.handler.handleGainFocus(self.document)
+
+	def caretMoveByCharacter(self):
+		offset = self.document.selectionOffsets[0] + 1
+		if offset >= len(self.document.basicText):
+			offset = 0
+		self._moveCaret(offset)
+
+	def caretMoveByLine(self):
+		self._moveCaret(self.lineStarts[next(self._lineNumbers)])
+
+	def scrollForward(self):
+		braille.handler.scrollForward()
+
+	def routeTo(self):
+		braille.handler.routeTo(self._routingRandom.randrange(braille.handler.displaySize))
+		# Routing moves the caret, which results in a caret event.
+		braille.handler.handleCaretMove(self.document)
+		braille.handler.handlePendingCaretUpdate()
+
+	def getAll(self):
+		return (
+			("focus", self.focus),
+			("caretMoveByCharacter", self.caretMoveByCharacter),
+			("caretMoveByLine", self.caretMoveByLine),
+			("scrollForward", self.scrollForward),
+			("routeTo", self.routeTo),
+		)
+
+
+def measureMemory(func, number=CALLS):
+	"""Measure the memory used by a callable.
+	@return: The peak memory traced during the calls in bytes,
+		and the net number of memory blocks allocated per call.
+	@rtype: tuple of (int, float)
+	"""
+	tracemalloc.start()
+	try:
+		tracemalloc.clear_traces()
+		blocksBefore = sys.getallocatedblocks()
+		for i in range(number):
+			func()
+		blocks = (sys.getallocatedblocks() - blocksBefore) / number
+		peak = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+	return peak, blocks
+
+
+def runConfiguration(document, table, displaySize, wordWrap):
+	"""Measure all operations with a given configuration.
+	@return: Maps operation names to a dict of results.
+	"""
+	config.conf["braille"]["translationTable"] = table
+	config.conf["braille"]["wordWrap"] = wordWrap
+	display = RecordingDisplay(displaySize)
+	braille.handler.display = display
+	braille.handler.displaySize = displaySize
+	operations = Operations(document)
+	results = {}
+	for name, func in operations.getAll():
+		operations.focus()
+		# Warm up, so that table compilation and caches don't count.
+		func()
+		writesBefore = display.writeCount
+		perCall = timePerCall(func, number=CALLS, repeat=3)
+		writes = (display.writeCount - writesBefore) / (CALLS * 3)
+		operations.focus()
+		peak, blocks = measureMemory(func)
+		results[name] = {"time": perCall, "peak": peak, "blocks": blocks, "writes": writes}
+	return results
+
+
+def runAll():
+	"""Measure all operations with all configurations.
+	@return: Maps result keys of the form C{table/cells/wrap/operation} to a dict of results.
+	"""
+	# Presenting the cursor must not start a blink timer, as there is no wx app.
+	config.conf["braille"]["cursorBlink"] = False
+	globalVars.focusAncestors = [
+		api.getDesktopObject(),
+		NVDAObjectWithRole(role=controlTypes.ROLE_WINDOW),
+	]
+	document = Document(text=makeDocumentText())
+	results = {}
+	for table, displaySize, wordWrap in itertools.product(TABLES, DISPLAY_SIZES, (True, False)):
+		configResults = runConfiguration(document, table, displaySize, wordWrap)
+		wrap = "wrap" if wordWrap else "noWrap"
+		for name, result in configResults.items():
+			results[f"{table}/{displaySize}/{wrap}/{name}"] = result
+	return results
+
+
+def printResults(results):
+	print(f"{'configuration/operation':<45} {'time (us)':>10} {'peak (KiB)':>11} {'blocks':>8} {'writes':>7}")
+	for key, result in results.items():
+		print(
+			f"{key:<45} {result['time'] * 1e6:>10.1f} {result['peak'] / 1024:>11.1f}"
+			f" {result['blocks']:>8.1f} {result['writes']:>7.2f}"
+		)
+
+
+def findRegressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+	"""Find operations which are slower than in a baseline.
+	@param results: Results from L{runAll}.
+	@param baseline: Results from an earlier run.
+	@param tolerance: The tolerated slowdown as a fraction of the baseline time.
+	@return: The keys of the operations which regressed, with the baseline and new times.
+	@rtype: list of (str, float, float)
+	"""
+	regressions = []
+	for key, result in results.items():
+		baselineResult = baseline.get(key)
+		if baselineResult and result["time"] > baselineResult["time"] * (1 + tolerance):
+			regressions.append((key, baselineResult["time"], result["time"]))
+	return regressions
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Benchmark braille presentation.")
+	parser.add_argument("--save-baseline", metavar="FILE", help="Save the results to FILE.")
+	parser.add_argument("--baseline", metavar="FILE", help="Fail if an operation is slower than in FILE.")
+	parser.add_argument(
+		"--tolerance", type=float, default=DEFAULT_TOLERANCE,
+		help="The tolerated slowdown as a fraction of the baseline time."
+	)
+	args = parser.parse_args(argv)
+	results = runAll()
+	printResults(results)
+	if args.save_baseline:
+		with open(args.save_baseline, "w", encoding="utf-8") as f:
+			json.dump(results, f, indent="\t")
+	if args.baseline:
+		with open(args.baseline, "r", encoding="utf-8") as f:
+			baseline = json.load(f)
+		regressions = findRegressions(results, baseline, args.tolerance)
+		for key, baselineTime, newTime in regressions:
+			print(f"Regression: {key} took {newTime * 1e6:.1f} us, baseline {baselineTime * 1e6:.1f} us")
+		if regressions:
+			return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
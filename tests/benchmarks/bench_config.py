@@ -0,0 +1,32 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Compares reading configuration values through sections with reading them from the configuration snapshot.
+Run with::
+	py -m tests.benchmarks.bench_config
+"""
+
+import config
+from . import timePerCall
+
+PATHS = (
+	("braille", "wordWrap"),
+	("speech", "symbolLevel"),
+	("keyboard", "speakTypedCharacters"),
+)
+
+
+def main():
+	print(f"{'path':<32} {'sections (us)':>14} {'snapshot (us)':>14} {'speedup':>8}")
+	for path in PATHS:
+		section, key = path
+		assert config.conf[section][key] == config.conf.snapshot[path]
+		sections = timePerCall(lambda: config.conf[section][key], number=10000)
+		snapshot = timePerCall(lambda: config.conf.snapshot[path], number=10000)
+		print(f"{'/'.join(path):<32} {sections * 1e6:>14.2f} {snapshot * 1e6:>14.2f} {sections / snapshot:>7.1f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,70 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Compares notifying extension point handlers through the call plans created on registration
+with inspecting each handler on every call.
+Run with::
+	py -m tests.benchmarks.bench_extensionPoints
+"""
+
+from functools import partial
+import extensionPoints
+from . import timePerCall
+
+HANDLER_COUNTS = (1, 5, 20)
+
+
+class Handlers(object):
+
+	def method(self, synth=None, index=None):
+		pass
+
+	def methodWithKwargs(self, **kwargs):
+		pass
+
+
+def _partialTarget(extra, index=None):
+	pass
+
+
+def makeFunction():
+	def function(synth, index=None):
+		pass
+	return function
+
+
+def makeHandlers(count):
+	"""Make distinct handlers of the kinds registered by NVDA and add-ons."""
+	factories = (
+		lambda: Handlers().method,
+		lambda: Handlers().methodWithKwargs,
+		makeFunction,
+		lambda: partial(_partialTarget, "extra"),
+		lambda: lambda index=None: None,
+	)
+	return [factories[i % len(factories)]() for i in range(count)]
+
+
+def notifyUncached(handlers, **kwargs):
+	"""Call each handler as L{extensionPoints.Action.notify} did before call plans."""
+	for handler in handlers:
+		extensionPoints.callWithSupportedKwargs(handler, **kwargs)
+
+
+def main():
+	print(f"{'handlers':>8} {'uncached (us)':>14} {'call plans (us)':>16} {'speedup':>8}")
+	for count in HANDLER_COUNTS:
+		handlers = makeHandlers(count)
+		action = extensionPoints.Action()
+		for handler in handlers:
+			action.register(handler)
+		assert len(list(action.handlers)) == count
+		uncached = timePerCall(lambda: notifyUncached(handlers, synth=None, index=1), number=2000)
+		planned = timePerCall(lambda: action.notify(synth=None, index=1), number=2000)
+		print(f"{count:>8} {uncached * 1e6:>14.2f} {planned * 1e6:>16.2f} {uncached / planned:>7.1f}x")
+
+
+if __name__ == "__main__":
+	main()
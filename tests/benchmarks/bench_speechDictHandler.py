@@ -0,0 +1,74 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Compares compiled speech dictionaries with applying each entry in turn.
+Run with::
+	py -m tests.benchmarks.bench_speechDictHandler
+"""
+
+import random
+import string
+from speechDictHandler import (
+	SpeechDict,
+	SpeechDictEntry,
+	ENTRY_TYPE_ANYWHERE,
+	ENTRY_TYPE_WORD,
+	ENTRY_TYPE_REGEXP,
+)
+from . import timePerCall
+
+DICT_SIZES = (10, 100, 1000, 5000)
+#: Text similar to what is spoken when moving through a document.
+TEXT = (
+	"The quick brown fox jumps over the lazy dog. "
+	"NVDA reads this line aloud, link, visited, heading level 2, list with 5 items."
+)
+
+
+def _randomWord(rand):
+	return "".join(rand.choice(string.ascii_lowercase) for i in range(rand.randint(3, 10)))
+
+
+def makeDict(size, seed=0):
+	"""Make a dictionary of mostly literal entries, with about one regular expression in twenty."""
+	rand = random.Random(seed)
+	entries = []
+	for i in range(size):
+		if i % 20 == 19:
+			entries.append(SpeechDictEntry(
+				r"\b%s(\d+)" % _randomWord(rand), r"\1", "", type=ENTRY_TYPE_REGEXP
+			))
+		else:
+			entries.append(SpeechDictEntry(
+				_randomWord(rand), _randomWord(rand), "",
+				caseSensitive=rand.random() < 0.5,
+				type=rand.choice((ENTRY_TYPE_ANYWHERE, ENTRY_TYPE_WORD)),
+			))
+	# Make sure a few entries actually match.
+	entries.insert(size // 2, SpeechDictEntry("fox", "wolf", "", type=ENTRY_TYPE_WORD))
+	entries.append(SpeechDictEntry("NVDA", "N V D A", ""))
+	return SpeechDict(entries)
+
+
+def subSequentially(speechDict, text):
+	"""Apply each entry in turn, as speech dictionaries did before they were compiled."""
+	for entry in speechDict:
+		text = entry.sub(text)
+	return text
+
+
+def main():
+	print(f"{'entries':>8} {'sequential (us)':>16} {'compiled (us)':>14} {'speedup':>8}")
+	for size in DICT_SIZES:
+		speechDict = makeDict(size)
+		assert speechDict.sub(TEXT) == subSequentially(speechDict, TEXT)
+		number = max(10, 10000 // size)
+		sequential = timePerCall(lambda: subSequentially(speechDict, TEXT), number=number)
+		compiled = timePerCall(lambda: speechDict.sub(TEXT), number=number)
+		print(f"{size:>8} {sequential * 1e6:>16.1f} {compiled * 1e6:>14.1f} {sequential / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -124,3 +124,148 @@ class TestDisplayTextForGestureIdentifier(unittest.TestCase):
 			(u'No braille', 'noKey1+noKey2')
 		)
 
+class TestBrailleBufferPositions(unittest.TestCase):
+	"""Tests for the position maps of L{braille.BrailleBuffer}."""
+
+	def setUp(self):
+		self.buffer = braille.BrailleBuffer(braille.handler)
+		self.regions = [braille.TextRegion("dialog "), braille.TextRegion(""), braille.TextRegion("list ")]
+		for region in self.regions:
+			region.update()
+		self.buffer.regions = list(self.regions)
+		self.buffer.update()
+
+	def test_regionsWithPositions(self):
+		first, empty, last = self.regions
+		firstLen = len(first.brailleCells)
+		self.assertEqual(list(self.buffer.regionsWithPositions), [
+			(first, 0, firstLen),
+			(empty, firstLen, firstLen),
+			(last, firstLen, firstLen + len(last.brailleCells)),
+		])
+
+	def test_bufferPosToRegionPos(self):
+		first, empty, last = self.regions
+		firstLen = len(first.brailleCells)
+		self.assertEqual(self.buffer.bufferPosToRegionPos(0), (first, 0))
+		self.assertEqual(self.buffer.bufferPosToRegionPos(firstLen), (last, 0))
+		self.assertEqual(self.buffer.bufferPosToRegionPos(firstLen + 1), (last, 1))
+		with self.assertRaises(LookupError):
+			self.buffer.bufferPosToRegionPos(len(self.buffer.brailleCells))
+
+	def test_regionPosToBufferPos(self):
+		first, empty, last = self.regions
+		firstLen = len(first.brailleCells)
+		self.assertEqual(self.buffer.regionPosToBufferPos(last, 1), firstLen + 1)
+		self.assertEqual(self.buffer.regionPosToBufferPos(empty, 0, allowNearest=True), firstLen)
+		with self.assertRaises(LookupError):
+			self.buffer.regionPosToBufferPos(braille.TextRegion("other"), 0)
+
+	def test_maps(self):
+		first, empty, last = self.regions
+		firstLen = len(first.brailleCells)
+		self.assertEqual(
+			list(self.buffer.rawToBraillePos),
+			first.rawToBraillePos + [p + firstLen for p in last.rawToBraillePos]
+		)
+		self.assertEqual(
+			list(self.buffer.brailleToRawPos),
+			first.brailleToRawPos + [p + len(first.rawText) for p in last.brailleToRawPos]
+		)
+
+	def test_regionUpdatedWithoutBufferUpdate(self):
+		"""The maps must reflect a region which has changed even if the buffer hasn't been updated yet."""
+		first, empty, last = self.regions
+		first.rawText = "dialog box "
+		first.update()
+		self.assertEqual(self.buffer.bufferPosToRegionPos(len(first.brailleCells)), (last, 0))
+
+
+class TestGetChangedCellRange(unittest.TestCase):
+
+	def test_identical(self):
+		self.assertIsNone(braille.getChangedCellRange([1, 2, 3], [1, 2, 3]))
+
+	def test_singleCell(self):
+		self.assertEqual(braille.getChangedCellRange([1, 2, 3], [1, 5, 3]), (1, 2))
+
+	def test_ends(self):
+		self.assertEqual(braille.getChangedCellRange([1, 2, 3, 4], [0, 2, 3, 0]), (0, 4))
+
+
+class _PartialDisplay(braille.BrailleDisplayDriver):
+	name = "partialTest"
+	supportsPartialDisplay = True
+
+	def __init__(self):
+		self.writes = []
+
+	def display(self, cells):
+		self.writes.append(("display", list(cells)))
+
+	def displayRange(self, cells, start):
+		self.writes.append(("displayRange", list(cells), start))
+
+
+class TestDisplayCells(unittest.TestCase):
+
+	def setUp(self):
+		self.oldDisplay = braille.handler.display
+		self.display = braille.handler.display = _PartialDisplay()
+		braille.handler._lastWrittenCells = None
+
+	def tearDown(self):
+		braille.handler.display = self.oldDisplay
+		braille.handler._lastWrittenCells = None
+
+	def test_onlyChangedRangeWritten(self):
+		self.assertTrue(braille.handler._displayCells([1, 2, 3, 4]))
+		self.assertTrue(braille.handler._displayCells([1, 9, 9, 4]))
+		self.assertFalse(braille.handler._displayCells([1, 9, 9, 4]))
+		self.assertEqual(self.display.writes, [
+			("display", [1, 2, 3, 4]),
+			("displayRange", [9, 9], 1),
+		])
+
+	def test_fullWriteWithoutPartialDisplay(self):
+		self.display.supportsPartialDisplay = False
+		braille.handler._displayCells([1, 2, 3, 4])
+		braille.handler._displayCells([1, 2, 3, 5])
+		self.assertEqual(self.display.writes, [
+			("display", [1, 2, 3, 4]),
+			("display", [1, 2, 3, 5]),
+		])
+
+
+class TestFreedomScientificDisplayRange(unittest.TestCase):
+	"""Tests that partial writes to Freedom Scientific displays respect ACK flow control."""
+
+	def setUp(self):
+		from brailleDisplayDrivers import freedomScientific
+		driverClass = freedomScientific.BrailleDisplayDriver
+		# Avoid connecting to a display.
+		self.driver = driverClass.__new__(driverClass)
+		self.driver.numCells = 4
+		self.driver.translationTable = None
+		self.driver._pendingCells = []
+		self.driver._latestCells = []
+		self.packets = []
+		self.driver._sendPacket = lambda packetType, arg1, arg2, arg3, data: self.packets.append(
+			(arg1[0], arg2[0], list(data))
+		)
+
+	def test_rangeSentWhenNotAwaitingAck(self):
+		self.driver.display([1, 2, 3, 4])
+		self.driver.displayRange([9], 2)
+		self.assertEqual(self.packets, [(4, 0, [1, 2, 3, 4]), (1, 2, [9])])
+
+	def test_rangeMergedIntoPendingCellsWhenAwaitingAck(self):
+		self.driver.display([1, 2, 3, 4])
+		self.driver._awaitingAck = True
+		self.driver.display([5, 6, 7, 8])
+		self.driver.displayRange([9], 1)
+		self.assertEqual(self.packets, [(4, 0, [1, 2, 3, 4])])
+		self.driver._awaitingAck = False
+		self.driver.display(self.driver._pendingCells)
+		self.assertEqual(self.packets[-1], (4, 0, [5, 9, 7, 8]))
+		self.assertEqual(self.driver._pendingCells, [])
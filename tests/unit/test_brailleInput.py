@@ -0,0 +1,178 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the brailleInput module.
+"""
+
+import os.path
+import unittest
+from unittest import mock
+import louis
+import louisHelper
+import brailleInput
+import brailleTables
+import config
+
+DOT1 = 1 << 0
+DOT2 = 1 << 1
+DOT3 = 1 << 2
+DOT4 = 1 << 3
+DOT5 = 1 << 4
+DOT6 = 1 << 5
+CELL_A = DOT1
+CELL_B = DOT1 | DOT2
+CELL_C = DOT1 | DOT4
+NUMBER_SIGN = DOT3 | DOT4 | DOT5 | DOT6
+MODE = louis.dotsIO | louis.noUndefinedDots
+REPORT_MODE = MODE | louis.partialTrans
+
+
+def cellsFromDots(dots):
+	"""Convert space separated dot numbers (e.g. "145 15") to cells."""
+	return [sum(1 << (int(dot) - 1) for dot in cell) for cell in dots.split()]
+
+
+class TestBackTranslationCache(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		# Each handler registers for profile switches, so share one between the tests.
+		cls.handler = brailleInput.BrailleInputHandler()
+
+	@classmethod
+	def tearDownClass(cls):
+		config.post_configProfileSwitch.unregister(cls.handler.handlePostConfigProfileSwitch)
+
+	def setUp(self):
+		self.handler._table = brailleTables.getTable("en-ueb-g1.ctb")
+		self.handler.flushBuffer()
+		self.handler._backTranslationCacheCounters = {"hits": 0, "misses": 0}
+
+	def _type(self, *cells):
+		"""Type cells one at a time, translating them as L{brailleInput.BrailleInputHandler._reportContractedCell} does.
+		@return: The text after each cell.
+		"""
+		texts = []
+		for cell in cells:
+			self.handler.bufferBraille.append(cell)
+			self.handler._translateForReportContractedCell(len(self.handler.bufferBraille) - 1)
+			texts.append(self.handler.bufferText)
+		return texts
+
+	def test_cached(self):
+		self.assertEqual(self.handler._backTranslate([DOT1, DOT1 | DOT2], MODE), "ab")
+		self.assertEqual(len(self.handler._backTranslationCache), 1)
+		self.assertEqual(self.handler._backTranslate([DOT1, DOT1 | DOT2], MODE), "ab")
+		self.assertEqual(len(self.handler._backTranslationCache), 1)
+		self.assertEqual(self.handler._backTranslate([DOT1], MODE), "a")
+		self.assertEqual(len(self.handler._backTranslationCache), 2)
+
+	def test_clearedByFlush(self):
+		self.handler._backTranslate([DOT1], MODE)
+		self.handler.flushBuffer()
+		self.assertEqual(self.handler._backTranslationCache, {})
+
+	def test_clearedByTableChange(self):
+		# Changing the table also changes the configuration, so restore it afterwards.
+		oldTable = config.conf["braille"]["inputTable"]
+		self.addCleanup(config.conf["braille"].__setitem__, "inputTable", oldTable)
+		self.handler._backTranslate([DOT1], MODE)
+		self.handler.table = brailleTables.getTable("en-ueb-g2.ctb")
+		self.assertEqual(self.handler._backTranslationCache, {})
+
+	def test_typingWordTranslatesWholeWord(self):
+		texts = self._type(CELL_A, CELL_B, CELL_C)
+		self.assertEqual(texts, ["a", "ab", "abc"])
+		# Later cells can change the text of earlier cells, so every cell back-translates the whole word.
+		self.assertEqual(self.handler._backTranslationCacheCounters, {"hits": 0, "misses": 3})
+		self.assertIn(("en-ueb-g1.ctb", REPORT_MODE, (CELL_A, CELL_B, CELL_C)), self.handler._backTranslationCache)
+
+	def test_erasedCellRetypedIsCached(self):
+		self._type(CELL_A, CELL_B, CELL_C)
+		# Erasing a cell translates the cells before it again, as L{brailleInput.BrailleInputHandler.eraseLastCell} does.
+		self.handler.bufferBraille.pop()
+		self.handler._translateForReportContractedCell(len(self.handler.bufferBraille) - 1)
+		self.assertEqual(self._type(CELL_C), ["abc"])
+		self.assertEqual(self.handler._backTranslationCacheCounters, {"hits": 2, "misses": 3})
+
+	def test_numberSignTranslatesWholeWord(self):
+		"""A number sign affects the cells after it, so they can't be translated without it."""
+		self.assertEqual(self._type(NUMBER_SIGN, CELL_A, CELL_B), ["", "1", "12"])
+
+
+class TestContractedCellReports(unittest.TestCase):
+	"""Guesses reported while typing contracted braille must match those made by back-translating the whole word,
+	even when a later cell changes the text of earlier cells.
+	"""
+
+	TABLE = "en-ueb-g2.ctb"
+
+	@classmethod
+	def setUpClass(cls):
+		cls.handler = brailleInput.BrailleInputHandler()
+
+	@classmethod
+	def tearDownClass(cls):
+		config.post_configProfileSwitch.unregister(cls.handler.handlePostConfigProfileSwitch)
+
+	def setUp(self):
+		self.handler._table = brailleTables.getTable(self.TABLE)
+		self.handler.flushBuffer()
+
+	def _wholeWordReports(self, cells):
+		"""The guesses reported for each cell by back-translating the whole word typed so far."""
+		reports = []
+		oldText = ""
+		for index in range(len(cells)):
+			data = "".join([chr(cell | brailleInput.LOUIS_DOTS_IO_START) for cell in cells[:index + 1]])
+			text = louisHelper.backTranslate(
+				[os.path.join(brailleTables.TABLES_DIR, self.TABLE), "braille-patterns.cti"],
+				data, mode=REPORT_MODE
+			)[0]
+			if oldText == text[:len(oldText)] and text[len(oldText):]:
+				reports.append(" ".join(text[len(oldText):]))
+			else:
+				reports.append(None)
+			oldText = text
+		return reports
+
+	def _reports(self, cells):
+		"""The guesses reported by the handler as each cell is typed; C{None} if the dots would be spoken instead."""
+		reports = []
+		with mock.patch("speech.speakMessage") as speakMessage:
+			for cell in cells:
+				self.handler.bufferBraille.append(cell)
+				speakMessage.reset_mock()
+				if self.handler._reportContractedCell(len(self.handler.bufferBraille) - 1):
+					reports.append(speakMessage.call_args[0][0])
+				else:
+					speakMessage.assert_not_called()
+					reports.append(None)
+		return reports
+
+	def _test(self, dots):
+		cells = cellsFromDots(dots)
+		self.assertEqual(self._reports(cells), self._wholeWordReports(cells))
+
+	def test_together(self):
+		"""tgr is the contraction for together; r changes the text produced by t and g."""
+		self._test("2345 1245 1235")
+
+	def test_always(self):
+		self._test("1 123 2456")
+
+	def test_lettersAndContractions(self):
+		# s, the, ing, s
+		self._test("234 2346 346 234")
+
+	def test_numberSign(self):
+		self._test("3456 1 12 1 12")
+
+	def test_retypedAfterErase(self):
+		cells = cellsFromDots("2345 1245 1235")
+		self._reports(cells[:2])
+		self.handler.bufferBraille.pop()
+		self.handler._translateForReportContractedCell(len(self.handler.bufferBraille) - 1)
+		self.assertEqual(self._reports(cells[1:]), self._wholeWordReports(cells)[1:])
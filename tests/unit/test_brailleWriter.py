@@ -0,0 +1,139 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the brailleWriter module.
+"""
+
+import threading
+import time
+import unittest
+from brailleWriter import ThreadedBrailleWriter
+
+#: The maximum time to wait for something which should happen, in seconds.
+WAIT_TIMEOUT = 5
+
+
+class FakeDisplay:
+	"""A display which records writes and can simulate slow writes and acknowledgements."""
+	name = "fake"
+	_awaitingAck = False
+
+	def __init__(self, receivesAckPackets=False, timeout=WAIT_TIMEOUT, writeDelay=0):
+		self.receivesAckPackets = receivesAckPackets
+		self.timeout = timeout
+		self.writeDelay = writeDelay
+		self.writes = []
+		self.writeStarted = threading.Event()
+		self._writesChanged = threading.Condition()
+
+	def write(self, cells):
+		self.writeStarted.set()
+		time.sleep(self.writeDelay)
+		with self._writesChanged:
+			self.writes.append(cells)
+			self._writesChanged.notify_all()
+		return True
+
+	def waitForWrites(self, count):
+		with self._writesChanged:
+			return self._writesChanged.wait_for(lambda: len(self.writes) >= count, WAIT_TIMEOUT)
+
+
+class TestThreadedBrailleWriter(unittest.TestCase):
+
+	def _makeWriter(self, display, write=None):
+		self.writeErrors = 0
+		self.ackTimeouts = 0
+
+		def onWriteError():
+			self.writeErrors += 1
+
+		def onAckTimeout():
+			self.ackTimeouts += 1
+
+		writer = ThreadedBrailleWriter(
+			getDisplay=lambda: display,
+			write=write or display.write,
+			onWriteError=onWriteError,
+			onAckTimeout=onAckTimeout,
+		)
+		writer.start()
+		self.addCleanup(writer.stop, WAIT_TIMEOUT)
+		return writer
+
+	def test_write(self):
+		display = FakeDisplay()
+		writer = self._makeWriter(display)
+		writer.queueWrite([1, 2])
+		self.assertTrue(display.waitForWrites(1))
+		self.assertEqual(display.writes, [[1, 2]])
+		self.assertEqual(writer.writeCount, 1)
+
+	def test_lastWriteWins(self):
+		display = FakeDisplay(writeDelay=0.1)
+		writer = self._makeWriter(display)
+		writer.queueWrite([1])
+		self.assertTrue(display.writeStarted.wait(WAIT_TIMEOUT))
+		writer.queueWrite([2])
+		writer.queueWrite([3])
+		writer.queueWrite([4])
+		self.assertTrue(display.waitForWrites(2))
+		# Give any further (incorrect) write a chance to happen.
+		time.sleep(0.2)
+		self.assertEqual(display.writes, [[1], [4]])
+		self.assertEqual(writer.coalescedWriteCount, 2)
+
+	def test_waitsForAck(self):
+		display = FakeDisplay(receivesAckPackets=True)
+		writer = self._makeWriter(display)
+		writer.queueWrite([1])
+		self.assertTrue(display.waitForWrites(1))
+		writer.queueWrite([2])
+		time.sleep(0.1)
+		self.assertEqual(display.writes, [[1]])
+		self.assertTrue(display._awaitingAck)
+		writer.handleAck()
+		self.assertTrue(display.waitForWrites(2))
+		self.assertEqual(display.writes, [[1], [2]])
+		self.assertEqual(writer.ackTimeoutCount, 0)
+
+	def test_ackTimeout(self):
+		display = FakeDisplay(receivesAckPackets=True, timeout=0.05)
+		writer = self._makeWriter(display)
+		writer.queueWrite([1])
+		self.assertTrue(display.waitForWrites(1))
+		writer.queueWrite([2])
+		self.assertTrue(display.waitForWrites(2))
+		self.assertEqual(display.writes, [[1], [2]])
+		self.assertGreaterEqual(writer.ackTimeoutCount, 1)
+		self.assertEqual(self.ackTimeouts, writer.ackTimeoutCount)
+
+	def test_unwrittenCellsDontWaitForAck(self):
+		display = FakeDisplay(receivesAckPackets=True)
+		writer = self._makeWriter(display, write=lambda cells: False)
+		writer.queueWrite([1])
+		time.sleep(0.1)
+		self.assertFalse(display._awaitingAck)
+		self.assertEqual(writer.writeCount, 0)
+
+	def test_writeError(self):
+		def write(cells):
+			raise RuntimeError("write failed")
+		writer = self._makeWriter(FakeDisplay(), write=write)
+		writer.queueWrite([1])
+		deadline = time.perf_counter() + WAIT_TIMEOUT
+		while not self.writeErrors and time.perf_counter() < deadline:
+			time.sleep(0.01)
+		self.assertEqual(self.writeErrors, 1)
+
+	def test_stop(self):
+		display = FakeDisplay()
+		writer = self._makeWriter(display)
+		thread = writer._thread
+		writer.stop(WAIT_TIMEOUT)
+		self.assertFalse(thread.is_alive())
+		writer.queueWrite([1])
+		time.sleep(0.1)
+		self.assertEqual(display.writes, [])
@@ -0,0 +1,124 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the config module.
+"""
+
+import unittest
+import config
+
+
+class TestConfigSnapshot(unittest.TestCase):
+
+	def setUp(self):
+		self.oldWordWrap = config.conf["braille"]["wordWrap"]
+
+	def tearDown(self):
+		config.conf["braille"]["wordWrap"] = self.oldWordWrap
+
+	def test_sameAsConf(self):
+		for path in (("braille", "wordWrap"), ("speech", "symbolLevel"), ("keyboard", "speakTypedCharacters")):
+			self.assertEqual(config.conf.snapshot[path], config.conf[path[0]][path[1]])
+
+	def test_cached(self):
+		config.conf.snapshot["braille", "wordWrap"]
+		self.assertIn(("braille", "wordWrap"), config.conf.snapshot._values)
+
+	def test_updatedAfterWrite(self):
+		config.conf["braille"]["wordWrap"] = True
+		self.assertTrue(config.conf.snapshot["braille", "wordWrap"])
+		config.conf["braille"]["wordWrap"] = False
+		self.assertFalse(config.conf.snapshot["braille", "wordWrap"])
+
+	def test_updatedAfterProfileSwitch(self):
+		config.conf.snapshot["braille", "wordWrap"]
+		generation = config.conf.generation
+		config.conf._handleProfileSwitch()
+		self.assertGreater(config.conf.generation, generation)
+		self.assertNotIn(("braille", "wordWrap"), config.conf.snapshot._values)
+		self.assertEqual(config.conf.snapshot["braille", "wordWrap"], config.conf["braille"]["wordWrap"])
+
+	def test_sectionsNotCached(self):
+		section = config.conf.snapshot["braille",]
+		self.assertIsInstance(section, config.AggregatedSection)
+		self.assertNotIn(("braille",), config.conf.snapshot._values)
+
+	def test_baseOnlySectionsNotCached(self):
+		config.conf.snapshot["general", "language"]
+		self.assertNotIn(("general", "language"), config.conf.snapshot._values)
+
+	def test_missing(self):
+		with self.assertRaises(KeyError):
+			config.conf.snapshot["braille", "nonexistent"]
+		self.assertEqual(config.conf.snapshot.get(("braille", "nonexistent"), 1), 1)
+
+
+class TestGetChangedKeys(unittest.TestCase):
+
+	def test_unchanged(self):
+		conf = {"speech": {"rate": 50, "espeak": {"voice": "en"}}}
+		self.assertEqual(config.getChangedKeys(conf, conf), set())
+
+	def test_changedValues(self):
+		old = {"speech": {"rate": 50, "espeak": {"voice": "en"}}, "braille": {"wordWrap": True}}
+		new = {"speech": {"rate": 60, "espeak": {"voice": "de"}}, "braille": {"wordWrap": True}}
+		self.assertEqual(
+			config.getChangedKeys(old, new),
+			{("speech", "rate"), ("speech", "espeak", "voice")}
+		)
+
+	def test_addedAndRemoved(self):
+		old = {"speech": {"rate": 50, "pitch": None}}
+		new = {"speech": {"volume": 50}}
+		self.assertEqual(
+			config.getChangedKeys(old, new),
+			{("speech", "rate"), ("speech", "pitch"), ("speech", "volume")}
+		)
+
+
+class TestProfileSwitchAction(unittest.TestCase):
+
+	def setUp(self):
+		self.action = config.ProfileSwitchAction()
+		self.calls = []
+
+	def _makeHandler(self, name):
+		def handler(changedKeys=None):
+			self.calls.append((name, changedKeys))
+		# Handlers are weakly referenced.
+		self.addCleanup(lambda: handler)
+		return handler
+
+	def test_sections(self):
+		self.action.register(self._makeHandler("all"))
+		self.action.register(self._makeHandler("speech"), sections=("speech",))
+		self.action.register(self._makeHandler("braille"), sections=("braille",))
+		self.action.register(self._makeHandler("cldr"), sections=(("speech", "includeCLDR"),))
+		changedKeys = {("speech", "rate")}
+		self.action.notify(changedKeys=changedKeys)
+		self.assertEqual(self.calls, [("all", changedKeys), ("speech", changedKeys)])
+
+	def test_noChangedKeysNotifiesAll(self):
+		self.action.register(self._makeHandler("all"))
+		self.action.register(self._makeHandler("braille"), sections=("braille",))
+		self.action.notify()
+		self.assertEqual(self.calls, [("all", None), ("braille", None)])
+
+	def test_unregister(self):
+		handler = self._makeHandler("braille")
+		self.action.register(handler, sections=("braille",))
+		self.action.unregister(handler)
+		self.assertEqual(self.action._handlerSections, {})
+		self.action.notify(changedKeys={("braille", "wordWrap")})
+		self.assertEqual(self.calls, [])
+
+	def test_handlerWithoutArguments(self):
+		called = []
+
+		def handler():
+			called.append(True)
+		self.action.register(handler, sections=("braille",))
+		self.action.notify(changedKeys={("braille", "wordWrap")}, prevConf={})
+		self.assertEqual(called, [True])
@@ -0,0 +1,195 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the eventHandler module.
+"""
+
+import gc
+import unittest
+from unittest import mock
+import baseObject
+import eventHandler
+import globalPluginHandler
+import queueHandler
+
+
+class TestEventCoalescing(unittest.TestCase):
+
+	def setUp(self):
+		self.obj1 = object()
+		self.obj2 = object()
+		self.executed = []
+		patcher = mock.patch.object(eventHandler, "executeEvent", self._executeEvent)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		eventHandler.coalescedEventCounts.clear()
+
+	def _executeEvent(self, eventName, obj, **kwargs):
+		self.executed.append((eventName, obj, kwargs))
+
+	def _flush(self):
+		queueHandler.flushQueue(queueHandler.eventQueue)
+
+	def test_supersededEventsDropped(self):
+		for i in range(3):
+			eventHandler.queueEvent("valueChange", self.obj1)
+		self.assertTrue(eventHandler.isPendingEvents("valueChange", self.obj1))
+		self._flush()
+		self.assertEqual(self.executed, [("valueChange", self.obj1, {})])
+		self.assertEqual(eventHandler.coalescedEventCounts, {"valueChange": 2})
+		self.assertFalse(eventHandler.isPendingEvents())
+
+	def test_latestPositionKept(self):
+		eventHandler.queueEvent("nameChange", self.obj1)
+		eventHandler.queueEvent("gainFocus", self.obj2)
+		eventHandler.queueEvent("nameChange", self.obj1)
+		self._flush()
+		self.assertEqual(self.executed, [
+			("gainFocus", self.obj2, {}),
+			("nameChange", self.obj1, {}),
+		])
+
+	def test_differentObjectsAndEventsKept(self):
+		eventHandler.queueEvent("nameChange", self.obj1)
+		eventHandler.queueEvent("nameChange", self.obj2)
+		eventHandler.queueEvent("stateChange", self.obj1)
+		self._flush()
+		self.assertEqual(len(self.executed), 3)
+		self.assertEqual(eventHandler.coalescedEventCounts, {})
+
+	def test_uncoalescedEventsKept(self):
+		for i in range(2):
+			eventHandler.queueEvent("gainFocus", self.obj1)
+			eventHandler.queueEvent("caret", self.obj1)
+		self._flush()
+		# Focus events are executed before caret events, but none are dropped.
+		self.assertEqual(
+			[eventName for eventName, obj, kwargs in self.executed],
+			["gainFocus", "gainFocus", "caret", "caret"]
+		)
+
+	def test_eventsWithParametersKept(self):
+		eventHandler.queueEvent("valueChange", self.obj1, value=1)
+		eventHandler.queueEvent("valueChange", self.obj1, value=2)
+		self._flush()
+		self.assertEqual(self.executed, [
+			("valueChange", self.obj1, {"value": 1}),
+			("valueChange", self.obj1, {"value": 2}),
+		])
+
+	def test_focusLane(self):
+		eventHandler.queueEvent("nameChange", self.obj1)
+		eventHandler.queueEvent("caret", self.obj2)
+		eventHandler.queueEvent("gainFocus", self.obj2)
+		self._flush()
+		self.assertEqual([eventName for eventName, obj, kwargs in self.executed], ["gainFocus", "caret", "nameChange"])
+
+
+class FakeObject(object):
+	"""An object with the attributes used when executing events, which records the events it handles."""
+	appModule = None
+	treeInterceptor = None
+
+	def __init__(self, calls):
+		self.calls = calls
+
+	def event_nameChange(self):
+		self.calls.append(("obj", "nameChange"))
+
+
+class FakeAppModule(object):
+
+	def __init__(self, calls):
+		self.calls = calls
+
+	def event_nameChange(self, obj, nextHandler):
+		self.calls.append(("app", "nameChange"))
+		nextHandler()
+
+
+class FakePlugin(object):
+
+	def __init__(self, calls):
+		self.calls = calls
+
+	def event_nameChange(self, obj, nextHandler):
+		self.calls.append(("plugin", "nameChange"))
+		nextHandler()
+
+
+class TestDispatchCache(unittest.TestCase):
+
+	def setUp(self):
+		eventHandler.invalidateDispatchCache()
+		self.addCleanup(eventHandler.invalidateDispatchCache)
+		self.calls = []
+		self.obj = FakeObject(self.calls)
+
+	def _execute(self, eventName, obj):
+		eventHandler._EventExecuter(eventName, obj, {})
+
+	def test_chain(self):
+		self.obj.appModule = FakeAppModule(self.calls)
+		with mock.patch.object(globalPluginHandler, "runningPlugins", {FakePlugin(self.calls)}):
+			self._execute("nameChange", self.obj)
+		self.assertEqual(self.calls, [("plugin", "nameChange"), ("app", "nameChange"), ("obj", "nameChange")])
+
+	def test_undefinedHandlerCached(self):
+		self._execute("valueChange", self.obj)
+		self._execute("nameChange", self.obj)
+		self.assertEqual(self.calls, [("obj", "nameChange")])
+		self.assertIs(eventHandler._classHandlerCache["event_valueChange"][FakeObject], False)
+		self.assertIs(eventHandler._classHandlerCache["event_nameChange"][FakeObject], True)
+
+	def test_instanceHandler(self):
+		self._execute("valueChange", self.obj)
+		self.obj.event_valueChange = lambda: self.calls.append(("instance", "valueChange"))
+		self._execute("valueChange", self.obj)
+		self.assertEqual(self.calls, [("instance", "valueChange")])
+
+	def test_pluginsChanged(self):
+		self._execute("nameChange", self.obj)
+		with mock.patch.object(globalPluginHandler, "runningPlugins", {FakePlugin(self.calls)}):
+			self._execute("nameChange", self.obj)
+		self.assertEqual(self.calls, [("obj", "nameChange"), ("plugin", "nameChange"), ("obj", "nameChange")])
+
+	def test_pluginInstanceHandler(self):
+		"""Handlers bound onto a running global plugin after events have been executed are called."""
+		plugin = FakePlugin(self.calls)
+		with mock.patch.object(globalPluginHandler, "runningPlugins", {plugin}):
+			self._execute("valueChange", self.obj)
+			plugin.event_valueChange = lambda obj, nextHandler: self.calls.append(("plugin", "valueChange"))
+			self._execute("valueChange", self.obj)
+		self.assertEqual(self.calls, [("plugin", "valueChange")])
+
+	def test_invalidate(self):
+		class Obj(FakeObject):
+			pass
+		obj = Obj(self.calls)
+		self._execute("valueChange", obj)
+		Obj.event_valueChange = lambda self: self.calls.append(("obj", "valueChange"))
+		eventHandler.invalidateDispatchCache()
+		self._execute("valueChange", obj)
+		self.assertEqual(self.calls, [("obj", "valueChange")])
+
+	def test_handlerPatchedIntoAutoPropertyClass(self):
+		"""Add-ons often patch event handlers into existing classes; these must be found without invalidating."""
+		class Obj(baseObject.AutoPropertyObject):
+			appModule = None
+			treeInterceptor = None
+		obj = Obj()
+		self._execute("valueChange", obj)
+		Obj.event_valueChange = lambda obj: self.calls.append(("obj", "valueChange"))
+		self._execute("valueChange", obj)
+		self.assertEqual(self.calls, [("obj", "valueChange")])
+
+	def test_classesWeaklyReferenced(self):
+		class Obj(FakeObject):
+			pass
+		self._execute("valueChange", Obj(self.calls))
+		self.assertIn(Obj, eventHandler._classHandlerCache["event_valueChange"])
+		del Obj
+		gc.collect()
+		self.assertEqual(len(eventHandler._classHandlerCache["event_valueChange"]), 0)
@@ -7,8 +7,12 @@
 """Unit tests for the extensionPoints module.
 """
 
+import functools
+import time
 import unittest
+import unittest.mock
 import extensionPoints
+import extensionPoints.timing
 from functools import partial
 
 class ExampleClass(object):
@@ -781,3 +785,186 @@ class TestDecider(unittest.TestCase):
 		self.decider.register(handler)
 		self.decider.decide(a=1)
 		self.assertEqual(calledKwargs, {"a": 1})
+
+
+class TestCallPlan(unittest.TestCase):
+	"""Tests that handlers are called through the L{extensionPoints.CallPlan} created when they are registered,
+	and that this passes the same arguments as L{extensionPoints.callWithSupportedKwargs}.
+	"""
+
+	def setUp(self):
+		self.action = extensionPoints.Action()
+		self.calledKwargs = {}
+
+	def test_planCreatedOnRegister(self):
+		def handler(a, b=None):
+			pass
+		self.action.register(handler)
+		plan = list(self.action._getHandlersWithCallPlans())[0][1]
+		self.assertIsInstance(plan, extensionPoints.CallPlan)
+		self.assertEqual(plan.parameterNames, {"a", "b"})
+		self.assertEqual(plan.requiredParameterNames, ("a",))
+		self.assertFalse(plan.takesVarKwargs)
+
+	def test_signatureNotInspectedOnNotify(self):
+		def handler(a):
+			self.calledKwargs["a"] = a
+		self.action.register(handler)
+		with unittest.mock.patch("inspect.signature", side_effect=AssertionError("signature inspected")):
+			self.action.notify(a=1, b=2)
+		self.assertEqual(self.calledKwargs, {"a": 1})
+
+	def test_boundMethod(self):
+		calledKwargs = self.calledKwargs
+
+		class handlerClass():
+			def handlerMethod(self, a, b=None):
+				calledKwargs.update(a=a, b=b)
+
+		inst = handlerClass()
+		self.action.register(inst.handlerMethod)
+		self.action.notify(a=1, c=3)
+		self.assertEqual(calledKwargs, {"a": 1, "b": None})
+
+	def test_boundMethodWithKwargs(self):
+		calledKwargs = self.calledKwargs
+
+		class handlerClass():
+			def handlerMethod(self, **kwargs):
+				calledKwargs.update(kwargs)
+
+		inst = handlerClass()
+		self.action.register(inst.handlerMethod)
+		self.action.notify(a=1, c=3)
+		self.assertEqual(calledKwargs, {"a": 1, "c": 3})
+
+	def test_partial(self):
+		def handler(x, a=None):
+			self.calledKwargs.update(x=x, a=a)
+		handlerPartial = partial(handler, x="x value")
+		self.action.register(handlerPartial)
+		self.action.notify(a=1, b=2)
+		self.assertEqual(self.calledKwargs, {"x": "x value", "a": 1})
+
+	def test_lambda(self):
+		handler = lambda a: self.calledKwargs.update(a=a)  # noqa: E731
+		self.action.register(handler)
+		self.action.notify(a=1, b=2)
+		self.assertEqual(self.calledKwargs, {"a": 1})
+
+	def test_filterPositional(self):
+		flt = extensionPoints.Filter()
+
+		def handler(value, a=0):
+			return value + a
+		flt.register(handler)
+		self.assertEqual(flt.apply(1, a=2, b=3), 3)
+
+	def test_missingRequiredArgument(self):
+		def handler(a):
+			pass
+		plan = extensionPoints.CallPlan(handler)
+		with self.assertRaises(TypeError):
+			plan.call(handler, b=1)
+
+	def test_decoratedFunction(self):
+		"""A decorated function reports the signature of the function it wraps,
+		so arguments must be bound to that signature before calling the wrapper.
+		"""
+		def handler(a, b=None):
+			self.calledKwargs.update(a=a, b=b)
+
+		@functools.wraps(handler)
+		def wrapper(*args):
+			return handler(*args)
+		self.action.register(wrapper)
+		self.action.notify(a=1, c=3)
+		self.assertEqual(self.calledKwargs, {"a": 1, "b": None})
+
+	def test_unboundInstanceMethod_raisesException(self):
+		with self.assertRaises(TypeError):
+			extensionPoints.CallPlan(ExampleClass.method)
+
+	def test_unplannableHandlerRegistered(self):
+		"""A handler whose signature can't be inspected is still registered,
+		and the error is only reported when it is called, as it was before plans were created on registration.
+		"""
+		class Handler(object):
+			# Makes inspect.signature raise TypeError.
+			__signature__ = "invalid"
+
+			def __call__(self, a):
+				pass
+		handler = Handler()
+		self.action.register(handler)
+		plan = list(self.action._getHandlersWithCallPlans())[0][1]
+		self.assertIs(plan, extensionPoints.util._UncachedCallPlan)
+		with self.assertLogs("nvda", level="ERROR"):
+			self.action.notify(a=1)
+
+
+class TestTiming(unittest.TestCase):
+
+	def setUp(self):
+		extensionPoints.timing.reset()
+		self.addCleanup(extensionPoints.timing.reset)
+		self.addCleanup(extensionPoints.timing.disable)
+		oldBudget = extensionPoints.timing.slowCallBudget
+		self.addCleanup(setattr, extensionPoints.timing, "slowCallBudget", oldBudget)
+
+	def test_disabled(self):
+		action = extensionPoints.Action()
+		action.register(exampleFunc)
+		action.notify()
+		self.assertEqual(extensionPoints.timing.getStats(), [])
+
+	def test_action(self):
+		extensionPoints.timing.enable()
+		action = extensionPoints.Action()
+		action.register(exampleFunc)
+		action.notify()
+		action.notify()
+		stats, = extensionPoints.timing.getStats()
+		self.assertEqual(stats.callCount, 2)
+		self.assertEqual(stats.handlerName, "exampleFunc")
+		self.assertEqual(stats.module, __name__)
+		self.assertIsNone(stats.addonName)
+		self.assertGreaterEqual(stats.totalTime, stats.maxTime)
+
+	def test_filterAndDecider(self):
+		extensionPoints.timing.enable()
+		flt = extensionPoints.Filter()
+		# Handlers are weakly referenced, so keep the lambda alive.
+		handler = lambda value: value + 1  # noqa: E731
+		flt.register(handler)
+		self.assertEqual(flt.apply(1), 2)
+		decider = extensionPoints.Decider()
+		decider.register(exampleFunc)
+		self.assertTrue(decider.decide())
+		self.assertEqual([stats.callCount for stats in extensionPoints.timing.getStats()], [1, 1])
+
+	def test_slowHandler(self):
+		extensionPoints.timing.enable(budget=0.001)
+
+		def slowHandler():
+			time.sleep(0.01)
+		action = extensionPoints.Action()
+		action.register(slowHandler)
+		with self.assertLogs("nvda", level="WARNING"):
+			action.notify()
+		stats, = extensionPoints.timing.getStats()
+		self.assertEqual(stats.slowCallCount, 1)
+		self.assertGreaterEqual(stats.maxTime, 0.01)
+		self.assertIn("slowHandler", extensionPoints.timing.getReport())
+
+	def test_failingHandlerTimed(self):
+		extensionPoints.timing.enable()
+
+		def failingHandler():
+			raise RuntimeError
+		action = extensionPoints.Action()
+		action.register(failingHandler)
+		with self.assertLogs("nvda", level="ERROR"):
+			action.notify()
+		stats, = extensionPoints.timing.getStats()
+		self.assertEqual(stats.callCount, 1)
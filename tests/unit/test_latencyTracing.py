@@ -0,0 +1,115 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the latencyTracing module.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import latencyTracing
+from latencyTracing import (
+	LatencyTracer,
+	STAGE_INPUT,
+	STAGE_SPEAK,
+	STAGE_SYNTH_SPEAK,
+	STAGE_SYNTH_INDEX_REACHED,
+)
+
+
+class FakeClock:
+
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+
+class TestLatencyTracer(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+		patcher = mock.patch("latencyTracing.time.perf_counter", self.clock)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.tracer = LatencyTracer(maxTraces=10)
+
+	def _trace(self, speakAt, synthSpeakAt, indexAt):
+		self.tracer.start("kb:downArrow")
+		start = self.clock.now
+		self.clock.now = start + speakAt
+		self.tracer.mark(STAGE_SPEAK)
+		self.clock.now = start + synthSpeakAt
+		self.tracer.mark(STAGE_SYNTH_SPEAK)
+		self.clock.now = start + indexAt
+		self.tracer.mark(STAGE_SYNTH_INDEX_REACHED)
+		self.clock.now += 1
+
+	def test_markWithoutTrace(self):
+		self.tracer.mark(STAGE_SPEAK)
+		self.assertEqual(len(self.tracer.traces), 0)
+
+	def test_completedByIndex(self):
+		self._trace(0.01, 0.02, 0.05)
+		self.assertEqual(len(self.tracer.traces), 1)
+		times = self.tracer.traces[0].getTimesSinceInput()
+		self.assertAlmostEqual(times[STAGE_INPUT], 0)
+		self.assertAlmostEqual(times[STAGE_SPEAK], 0.01)
+		self.assertAlmostEqual(times[STAGE_SYNTH_INDEX_REACHED], 0.05)
+
+	def test_onlyFirstTimeRecorded(self):
+		self.tracer.start("kb:a")
+		self.clock.now = 1
+		self.tracer.mark(STAGE_SPEAK)
+		self.clock.now = 2
+		self.tracer.mark(STAGE_SPEAK)
+		self.tracer.start("kb:b")
+		self.assertEqual(self.tracer.traces[0].getTimesSinceInput()[STAGE_SPEAK], 1)
+
+	def test_indexBeforeSynthSpeakIgnored(self):
+		"""An index from speech which started before the gesture must not complete the trace."""
+		self.tracer.start("kb:a")
+		self.tracer.mark(STAGE_SYNTH_INDEX_REACHED)
+		self.assertEqual(len(self.tracer.traces), 0)
+
+	def test_ringBuffer(self):
+		for i in range(15):
+			self._trace(0.01, 0.02, 0.03)
+		self.assertEqual(len(self.tracer.traces), 10)
+
+	def test_percentiles(self):
+		for i in range(1, 101):
+			self._trace(i / 1000, i / 1000, i / 1000)
+		stats = self.tracer.getStats()[STAGE_SPEAK]
+		self.assertEqual(stats["count"], 10)
+		# Only the last 10 traces, with 91 to 100 ms, are kept.
+		self.assertAlmostEqual(stats["sinceInput"][50], 0.095)
+		self.assertAlmostEqual(stats["sinceInput"][99], 0.1)
+		self.assertAlmostEqual(self.tracer.getStats()[STAGE_SYNTH_SPEAK]["sincePrevious"][50], 0)
+
+	def test_dump(self):
+		self._trace(0.01, 0.02, 0.05)
+		fd, fileName = tempfile.mkstemp()
+		os.close(fd)
+		self.addCleanup(os.remove, fileName)
+		self.tracer.dump(fileName)
+		with open(fileName, encoding="utf-8") as f:
+			lines = [json.loads(line) for line in f]
+		self.assertEqual(len(lines), 1)
+		self.assertEqual(lines[0]["gesture"], "kb:downArrow")
+		self.assertEqual(lines[0]["stages"][STAGE_SYNTH_INDEX_REACHED], 50.0)
+
+
+class TestStartTrace(unittest.TestCase):
+
+	def test_disabled(self):
+		gesture = mock.Mock(identifiers=["kb:a"])
+		with mock.patch.object(latencyTracing, "isEnabled", return_value=False), \
+				mock.patch.object(latencyTracing, "tracer") as tracer:
+			latencyTracing.startTrace(gesture)
+		tracer.start.assert_not_called()
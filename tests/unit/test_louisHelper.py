@@ -0,0 +1,77 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the louisHelper module.
+"""
+
+import os
+import unittest
+import louis
+import louisHelper
+import brailleTables
+
+TABLES = [os.path.join(brailleTables.TABLES_DIR, "en-ueb-g1.ctb"), "braille-patterns.cti"]
+
+
+class TestTranslationCache(unittest.TestCase):
+
+	def setUp(self):
+		louisHelper.clearTranslationCache()
+
+	def _getMisses(self):
+		return louisHelper.getTranslationCacheInfo()["misses"]
+
+	def test_cachedTranslationIsCopy(self):
+		cells = louisHelper.translate(TABLES, "dialog", mode=louis.dotsIO)[0]
+		misses = self._getMisses()
+		cells[0] = 0
+		again = louisHelper.translate(TABLES, "dialog", mode=louis.dotsIO)[0]
+		self.assertEqual(self._getMisses(), misses)
+		self.assertNotEqual(again[0], 0)
+
+	def test_cursorIgnoredWithoutCompbrlAtCursor(self):
+		first = louisHelper.translate(TABLES, "some text", cursorPos=0, mode=louis.dotsIO)
+		misses = self._getMisses()
+		second = louisHelper.translate(TABLES, "some text", cursorPos=5, mode=louis.dotsIO)
+		self.assertEqual(self._getMisses(), misses)
+		self.assertEqual(second[:3], first[:3])
+		self.assertEqual(second[3], second[2][5])
+
+	def test_cursorUsedWithCompbrlAtCursor(self):
+		mode = louis.dotsIO | louis.compbrlAtCursor
+		louisHelper.translate(TABLES, "some text", cursorPos=0, mode=mode)
+		misses = self._getMisses()
+		louisHelper.translate(TABLES, "some text", cursorPos=5, mode=mode)
+		self.assertEqual(self._getMisses(), misses + 1)
+
+	def test_noCursor(self):
+		louisHelper.translate(TABLES, "some text", cursorPos=0, mode=louis.dotsIO)
+		self.assertIsNone(louisHelper.translate(TABLES, "some text", mode=louis.dotsIO)[3])
+
+	def test_tableChangeClearsCache(self):
+		louisHelper.translate(TABLES, "dialog", mode=louis.dotsIO)
+		otherTables = [os.path.join(brailleTables.TABLES_DIR, "en-us-comp8-ext.utb"), "braille-patterns.cti"]
+		louisHelper.translate(otherTables, "dialog", mode=louis.dotsIO)
+		self.assertEqual(louisHelper.getTranslationCacheInfo()["size"], 1)
+
+
+class TestCompileTables(unittest.TestCase):
+
+	def test_compileTables(self):
+		compileTime = louisHelper.compileTables(TABLES)
+		self.assertGreaterEqual(compileTime, 0)
+		self.assertIn(tuple(TABLES), louisHelper.getTableCompileTimes())
+
+	def test_invalidTable(self):
+		with self.assertRaises(RuntimeError):
+			louisHelper.compileTables([os.path.join(brailleTables.TABLES_DIR, "nonexistent.ctb")])
+
+	def test_warmUpTables(self):
+		otherTables = [os.path.join(brailleTables.TABLES_DIR, "en-us-comp8-ext.utb"), "braille-patterns.cti"]
+		louisHelper.warmUpTables([otherTables])
+		thread = louisHelper._warmUpThread
+		if thread:
+			thread.join(10)
+		self.assertIn(tuple(otherTables), louisHelper.getTableCompileTimes())
@@ -0,0 +1,177 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the config.profileWriter module.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from config.profileWriter import ProfileWriter, writeFileAtomically
+from fileUtils import FaultTolerantFile
+
+#: The maximum time to wait for something which should happen, in seconds.
+WAIT_TIMEOUT = 5
+ORIGINAL = b"[speech]\r\n\tsynth = espeak\r\n"
+
+
+class TestProfileWriter(unittest.TestCase):
+
+	def setUp(self):
+		self.writes = []
+		self.written = threading.Event()
+
+	def _writeFile(self, filename, data):
+		self.writes.append((filename, data))
+		self.written.set()
+
+	def _makeWriter(self, debounce=0.05, maxDelay=WAIT_TIMEOUT, writeFile=None):
+		writer = ProfileWriter(debounce=debounce, maxDelay=maxDelay, writeFile=writeFile or self._writeFile)
+		self.addCleanup(writer.terminate, WAIT_TIMEOUT)
+		return writer
+
+	def test_coalesced(self):
+		writer = self._makeWriter()
+		writer.queue("nvda.ini", b"1")
+		writer.queue("nvda.ini", b"2")
+		writer.queue("nvda.ini", b"3")
+		self.assertTrue(self.written.wait(WAIT_TIMEOUT))
+		self.assertEqual(self.writes, [("nvda.ini", b"3")])
+		self.assertEqual(writer.writeCount, 1)
+		self.assertEqual(writer.coalescedWriteCount, 2)
+		self.assertIsNotNone(writer.lastWriteDuration)
+
+	def test_debounced(self):
+		writer = self._makeWriter(debounce=WAIT_TIMEOUT)
+		writer.queue("nvda.ini", b"1")
+		time.sleep(0.1)
+		self.assertEqual(self.writes, [])
+		self.assertTrue(writer.hasPending)
+
+	def test_maxDelay(self):
+		writer = self._makeWriter(debounce=WAIT_TIMEOUT, maxDelay=0.05)
+		writer.queue("nvda.ini", b"1")
+		self.assertTrue(self.written.wait(WAIT_TIMEOUT))
+
+	def test_flush(self):
+		writer = self._makeWriter(debounce=WAIT_TIMEOUT)
+		writer.queue("nvda.ini", b"1")
+		writer.queue("profile.ini", b"2")
+		writer.flush()
+		self.assertEqual(self.writes, [("nvda.ini", b"1"), ("profile.ini", b"2")])
+		self.assertFalse(writer.hasPending)
+
+	def test_discard(self):
+		writer = self._makeWriter(debounce=WAIT_TIMEOUT)
+		writer.queue("nvda.ini", b"1")
+		writer.queue("profile.ini", b"2")
+		writer.discard("profile.ini")
+		writer.flush()
+		self.assertEqual(self.writes, [("nvda.ini", b"1")])
+
+	def test_discardWaitsForWriteInProgress(self):
+		writing = threading.Event()
+		finishWrite = threading.Event()
+
+		def writeFile(filename, data):
+			writing.set()
+			finishWrite.wait(WAIT_TIMEOUT)
+			self._writeFile(filename, data)
+		writer = self._makeWriter(debounce=0, writeFile=writeFile)
+		writer.queue("profile.ini", b"1")
+		self.assertTrue(writing.wait(WAIT_TIMEOUT))
+		discarded = threading.Event()
+
+		def discard():
+			writer.discard("profile.ini")
+			discarded.set()
+		threading.Thread(target=discard).start()
+		self.assertFalse(discarded.wait(0.1))
+		finishWrite.set()
+		self.assertTrue(discarded.wait(WAIT_TIMEOUT))
+		self.assertEqual(self.writes, [("profile.ini", b"1")])
+
+	def test_failedFilenames(self):
+		def writeFile(filename, data):
+			if filename == "bad.ini":
+				raise OSError("read only")
+		writer = self._makeWriter(debounce=WAIT_TIMEOUT, writeFile=writeFile)
+		writer.queue("bad.ini", b"1")
+		writer.queue("nvda.ini", b"2")
+		with self.assertRaises(OSError):
+			writer.flush()
+		self.assertEqual(writer.takeFailedFilenames(), {"bad.ini"})
+		self.assertEqual(writer.takeFailedFilenames(), set())
+		writer.queue("bad.ini", b"1")
+		with self.assertRaises(OSError):
+			writer.flush()
+		# Queuing the file again replaces the failed write.
+		writer.queue("bad.ini", b"3")
+		self.assertEqual(writer.takeFailedFilenames(), set())
+		writer.discard("bad.ini")
+
+	def test_flushRaisesAfterWritingOthers(self):
+		def writeFile(filename, data):
+			if filename == "bad.ini":
+				raise OSError("read only")
+			self._writeFile(filename, data)
+		writer = self._makeWriter(debounce=WAIT_TIMEOUT, writeFile=writeFile)
+		writer.queue("bad.ini", b"1")
+		writer.queue("nvda.ini", b"2")
+		with self.assertRaises(OSError):
+			writer.flush()
+		self.assertEqual(self.writes, [("nvda.ini", b"2")])
+		self.assertEqual(writer.errorCount, 1)
+
+	def test_terminateFlushes(self):
+		writer = self._makeWriter(debounce=WAIT_TIMEOUT)
+		writer.queue("nvda.ini", b"1")
+		writer.terminate(WAIT_TIMEOUT)
+		self.assertEqual(self.writes, [("nvda.ini", b"1")])
+
+
+class TestCrashSafety(unittest.TestCase):
+	"""Ensures that a write which is interrupted never corrupts the existing file."""
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.dir)
+		self.fn = os.path.join(self.dir, "nvda.ini")
+		with open(self.fn, "wb") as f:
+			f.write(ORIGINAL)
+
+	def _read(self):
+		with open(self.fn, "rb") as f:
+			return f.read()
+
+	def test_writeFileAtomically(self):
+		writeFileAtomically(self.fn, b"new")
+		self.assertEqual(self._read(), b"new")
+		self.assertEqual(os.listdir(self.dir), ["nvda.ini"])
+
+	def test_interruptedWrite(self):
+		with self.assertRaises(RuntimeError):
+			with FaultTolerantFile(self.fn) as f:
+				f.write(ORIGINAL[:5])
+				raise RuntimeError("interrupted")
+		self.assertEqual(self._read(), ORIGINAL)
+		# The temporary file must have been removed.
+		self.assertEqual(os.listdir(self.dir), ["nvda.ini"])
+
+	def test_failedWriteOnTerminate(self):
+		def writeFile(filename, data):
+			with FaultTolerantFile(filename) as f:
+				f.write(data[:5])
+				raise OSError("disk full")
+		writer = ProfileWriter(debounce=WAIT_TIMEOUT, writeFile=writeFile)
+		writer.queue(self.fn, b"[speech]\r\n\tsynth = oneCore\r\n")
+		with self.assertRaises(OSError):
+			writer.terminate(WAIT_TIMEOUT)
+		self.assertEqual(writer.errorCount, 1)
+		self.assertEqual(self._read(), ORIGINAL)
+		self.assertEqual(os.listdir(self.dir), ["nvda.ini"])
@@ -0,0 +1,114 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the queueHandler module.
+"""
+
+import time
+import unittest
+from unittest import mock
+from queue import Empty
+import queueHandler
+import config
+
+
+class TestLanedQueue(unittest.TestCase):
+
+	def setUp(self):
+		self.queue = queueHandler.LanedQueue("testQueue")
+		self.called = []
+
+	def _queue(self, name, lane=queueHandler.LANE_GENERAL):
+		queueHandler.queueFunctionInLane(self.queue, lane, self.called.append, name)
+
+	def test_priority(self):
+		self._queue("general1")
+		self._queue("caret", queueHandler.LANE_CARET)
+		self._queue("general2")
+		self._queue("focus", queueHandler.LANE_FOCUS)
+		queueHandler.flushQueue(self.queue)
+		self.assertEqual(self.called, ["focus", "caret", "general1", "general2"])
+		self.assertTrue(self.queue.empty())
+
+	def test_lowerLaneNotStarved(self):
+		"""Once a function has waited longer than maxWait, it is executed before later functions in higher lanes."""
+		self.queue = queueHandler.LanedQueue("testQueue", maxWait=0)
+		self._queue("general")
+		time.sleep(0.001)
+		self._queue("focus", queueHandler.LANE_FOCUS)
+		self._queue("caret", queueHandler.LANE_CARET)
+		queueHandler.flushQueue(self.queue)
+		self.assertEqual(self.called, ["general", "focus", "caret"])
+
+	def test_queueFunctionUsesGeneralLane(self):
+		queueHandler.queueFunction(self.queue, self.called.append, "general")
+		self._queue("caret", queueHandler.LANE_CARET)
+		queueHandler.flushQueue(self.queue)
+		self.assertEqual(self.called, ["caret", "general"])
+
+	def test_cancelBeforeLaterCaret(self):
+		"""Speech effects of input are queued in the focus lane,
+		so they are executed before caret events caused by the input.
+		"""
+		self._queue("general")
+		self._queue("cancel", queueHandler.LANE_FOCUS)
+		self._queue("caret", queueHandler.LANE_CARET)
+		queueHandler.flushQueue(self.queue)
+		self.assertEqual(self.called, ["cancel", "caret", "general"])
+
+	def test_empty(self):
+		self.assertTrue(self.queue.empty())
+		self.assertEqual(self.queue.qsize(), 0)
+		with self.assertRaises(Empty):
+			self.queue.get_nowait()
+
+	def test_latencyStats(self):
+		self._queue("focus", queueHandler.LANE_FOCUS)
+		time.sleep(0.01)
+		queueHandler.flushQueue(self.queue)
+		stats = self.queue.latencyStats[queueHandler.LANE_FOCUS]
+		self.assertEqual(stats.count, 1)
+		self.assertGreaterEqual(stats.maxLatency, 0.01)
+		self.assertEqual(self.queue.latencyStats[queueHandler.LANE_GENERAL].count, 0)
+
+
+class TestFlushQueueTimeBudget(unittest.TestCase):
+
+	def setUp(self):
+		self.queue = queueHandler.LanedQueue("testQueue")
+		self.called = []
+
+	def _slowFunc(self, name):
+		self.called.append(name)
+		time.sleep(0.02)
+
+	def test_budgetExceeded(self):
+		for name in ("a", "b", "c"):
+			queueHandler.queueFunction(self.queue, self._slowFunc, name)
+		with mock.patch("core.requestPump") as requestPump:
+			queueHandler.flushQueue(self.queue, timeBudget=0.01)
+		# At least one function is always executed.
+		self.assertEqual(self.called, ["a"])
+		self.assertEqual(self.queue.qsize(), 2)
+		requestPump.assert_called_once_with()
+		queueHandler.flushQueue(self.queue)
+		self.assertEqual(self.called, ["a", "b", "c"])
+
+	def test_noBudget(self):
+		for name in ("a", "b"):
+			queueHandler.queueFunction(self.queue, self._slowFunc, name)
+		queueHandler.flushQueue(self.queue)
+		self.assertEqual(self.called, ["a", "b"])
+
+	def test_budgetReadOnConfigChange(self):
+		"""The budget used by pumpAll is only read from the configuration when it changes."""
+		with mock.patch.object(queueHandler, "_eventQueueTimeBudget"), \
+			mock.patch("config.conf", {"general": {"eventQueueTimeBudgetMs": 20}}), \
+			mock.patch("queueHandler.flushQueue") as flushQueue:
+			config.post_configSave.notify()
+			self.assertEqual(queueHandler._eventQueueTimeBudget, 0.02)
+			config.conf["general"]["eventQueueTimeBudgetMs"] = 30
+			queueHandler.pumpAll()
+			flushQueue.assert_called_once_with(queueHandler.eventQueue, timeBudget=0.02)
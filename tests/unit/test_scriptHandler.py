@@ -7,7 +7,9 @@
 """Unit tests for the scriptHandler module."""
 
 import unittest
+from unittest import mock
 from scriptHandler import *
+import queueHandler
 from inputCore import SCRCAT_MISC
 from sayAllHandler import CURSOR_CARET
 
@@ -33,3 +35,19 @@ class TestScriptDecorator(unittest.TestCase):
 		self.assertTrue(script_test.canPropagate)
 		self.assertTrue(script_test.bypassInputHelp)
 		self.assertEqual(script_test.resumeSayAllMode, CURSOR_CARET)
+
+class TestQueueScript(unittest.TestCase):
+
+	def test_scriptBeforeLaterCaret(self):
+		"""A queued script is executed before caret events queued after it."""
+		called = []
+		def script_test(gesture):
+			"""A test script."""
+			called.append("script")
+		queue = queueHandler.LanedQueue("testQueue")
+		with mock.patch("queueHandler.eventQueue", queue):
+			queueScript(script_test, mock.Mock(wasInSayAll=False))
+			queueHandler.queueFunctionInLane(queue, queueHandler.LANE_CARET, called.append, "caret")
+			queueHandler.flushQueue(queue)
+		self.assertEqual(called, ["script", "caret"])
+		self.assertFalse(isScriptWaiting())
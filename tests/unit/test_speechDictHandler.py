@@ -0,0 +1,133 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the speechDictHandler module.
+"""
+
+import unittest
+import speechDictHandler
+from speechDictHandler import (
+	SpeechDict,
+	SpeechDictEntry,
+	ENTRY_TYPE_ANYWHERE,
+	ENTRY_TYPE_WORD,
+	ENTRY_TYPE_REGEXP,
+)
+from speechDictHandler.compiledDict import LiteralMatcher
+
+
+def _subSequentially(entries, text):
+	"""Apply entries one by one, as speech dictionaries did before they were compiled."""
+	for entry in entries:
+		text = entry.sub(text)
+	return text
+
+
+class TestLiteralMatcher(unittest.TestCase):
+
+	def test_noKeys(self):
+		self.assertEqual(LiteralMatcher([]).findKeys("anything"), set())
+
+	def test_overlappingKeys(self):
+		matcher = LiteralMatcher(["he", "she", "his", "hers"])
+		self.assertEqual(matcher.findKeys("ushers"), {"he", "she", "hers"})
+
+	def test_keyInsideKey(self):
+		matcher = LiteralMatcher(["abcd", "bc"])
+		self.assertEqual(matcher.findKeys("xabcx"), {"bc"})
+
+	def test_moreKeysThanCharacters(self):
+		"""When there are more keys than characters, the automaton itself is walked."""
+		matcher = LiteralMatcher(["he", "she", "his", "hers", "us", "rs", "sh", "x", "y"])
+		self.assertEqual(matcher.findKeys("ushers"), {"he", "she", "hers", "us", "rs", "sh"})
+
+
+class TestSpeechDictSub(unittest.TestCase):
+
+	def _assertSameAsSequential(self, entries, text):
+		speechDict = SpeechDict(entries)
+		self.assertEqual(speechDict.sub(text), _subSequentially(entries, text))
+
+	def test_anywhere(self):
+		entries = [SpeechDictEntry("nvda", "N V D A", "", caseSensitive=False)]
+		self.assertEqual(SpeechDict(entries).sub("I use NVDA"), "I use N V D A")
+
+	def test_wholeWord(self):
+		entries = [SpeechDictEntry("cat", "dog", "", type=ENTRY_TYPE_WORD)]
+		self.assertEqual(SpeechDict(entries).sub("cat catalog cat"), "dog catalog dog")
+
+	def test_caseSensitive(self):
+		entries = [SpeechDictEntry("Word", "thing", "", caseSensitive=True)]
+		self.assertEqual(SpeechDict(entries).sub("Word word"), "thing word")
+
+	def test_caseInsensitiveDotlessI(self):
+		"""C{re.IGNORECASE} matches the Turkish dotless i against I, although casefolding doesn't."""
+		entries = [
+			SpeechDictEntry("Ik", "x", "", caseSensitive=False),
+			SpeechDictEntry("\u0131s", "y", "", caseSensitive=False),
+		]
+		text = "\u0131k is"
+		self.assertEqual(SpeechDict(entries).sub(text), "x y")
+		self._assertSameAsSequential(entries, text)
+
+	def test_laterEntrySeesEarlierReplacement(self):
+		"""An entry must be able to match text produced by an earlier entry."""
+		self._assertSameAsSequential([
+			SpeechDictEntry("a", "b", ""),
+			SpeechDictEntry("bc", "X", ""),
+		], "ac")
+
+	def test_earlierEntryDestroysLaterMatch(self):
+		self._assertSameAsSequential([
+			SpeechDictEntry("ab", "", ""),
+			SpeechDictEntry("bc", "X", ""),
+		], "abc")
+
+	def test_replacementChangesWordBoundary(self):
+		self._assertSameAsSequential([
+			SpeechDictEntry("x", "", ""),
+			SpeechDictEntry("cat", "dog", "", type=ENTRY_TYPE_WORD),
+		], "catx")
+
+	def test_regexpBetweenLiterals(self):
+		self._assertSameAsSequential([
+			SpeechDictEntry("one", "1", ""),
+			SpeechDictEntry(r"(\d)(\w)", r"\2\1", "", type=ENTRY_TYPE_REGEXP),
+			SpeechDictEntry("e1", "E", ""),
+		], "one tone phone")
+
+	def test_recompiledAfterEdit(self):
+		speechDict = SpeechDict([SpeechDictEntry("a", "b", "")])
+		self.assertEqual(speechDict.sub("a"), "b")
+		speechDict[0] = SpeechDictEntry("a", "c", "")
+		self.assertEqual(speechDict.sub("a"), "c")
+		speechDict.append(SpeechDictEntry("c", "d", ""))
+		self.assertEqual(speechDict.sub("a"), "d")
+		del speechDict[:]
+		self.assertEqual(speechDict.sub("a"), "a")
+
+	def test_invalidEntryRemoved(self):
+		speechDict = SpeechDict([
+			SpeechDictEntry("a", r"\1", "", type=ENTRY_TYPE_REGEXP),
+			SpeechDictEntry("b", "c", ""),
+		])
+		self.assertEqual(speechDict.sub("ab"), "ac")
+		self.assertEqual(len(speechDict), 1)
+		self.assertEqual(speechDict[0].pattern, "b")
+
+
+class TestProcessText(unittest.TestCase):
+
+	def setUp(self):
+		speechDictHandler.initialize()
+
+	def test_dictionariesAppliedInPriorityOrder(self):
+		speechDictHandler.dictionaries["temp"].append(
+			SpeechDictEntry("alpha", "beta", "", type=ENTRY_TYPE_ANYWHERE)
+		)
+		speechDictHandler.dictionaries["default"].append(
+			SpeechDictEntry("beta", "gamma", "", type=ENTRY_TYPE_ANYWHERE)
+		)
+		self.assertEqual(speechDictHandler.processText("alpha"), "gamma")
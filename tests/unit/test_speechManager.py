@@ -0,0 +1,129 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the speech.manager module.
+"""
+
+import random
+import unittest
+from speech.commands import (
+	BreakCommand,
+	CharacterModeCommand,
+	EndUtteranceCommand,
+	IndexCommand,
+	LangChangeCommand,
+	PitchCommand,
+	RateCommand,
+)
+from speech.manager import compactSpeechSequences, _getParamValue
+
+
+def _render(seqs):
+	"""Describe what a synth would speak for some processed sequences.
+	Each character is paired with the parameters in effect when it is spoken,
+	so sequences which render the same are spoken the same.
+	"""
+	rendered = []
+	params = {}
+	for seq in seqs:
+		for item in seq:
+			if isinstance(item, EndUtteranceCommand):
+				params = {}
+				rendered.append("end")
+			elif isinstance(item, str):
+				state = frozenset(params.items())
+				rendered.extend((char, state) for char in item)
+			elif isinstance(item, (LangChangeCommand, CharacterModeCommand, PitchCommand, RateCommand)):
+				value = _getParamValue(item)
+				if value is None:
+					params.pop(type(item), None)
+				else:
+					params[type(item)] = value
+			else:
+				rendered.append(item)
+	return rendered
+
+
+def _getIndexes(seqs):
+	return [seq[-1].index for seq in seqs if isinstance(seq[-1], IndexCommand)]
+
+
+class TestCompactSpeechSequences(unittest.TestCase):
+
+	def _compact(self, seqs):
+		compacted = compactSpeechSequences(seqs)
+		self.assertEqual(_render(compacted), _render(seqs))
+		self.assertEqual(_getIndexes(compacted), _getIndexes(seqs))
+		return compacted
+
+	def test_adjacentStringsMerged(self):
+		index = IndexCommand(1)
+		compacted = self._compact([["a ", "", "b ", index]])
+		self.assertEqual(compacted, [["a b ", index]])
+
+	def test_redundantLangChangeRemoved(self):
+		index = IndexCommand(1)
+		fr = LangChangeCommand("fr")
+		compacted = self._compact([[fr, "a ", LangChangeCommand("fr"), "b ", index]])
+		self.assertEqual(compacted, [[fr, "a b ", index]])
+
+	def test_defaultAtStartRemoved(self):
+		index = IndexCommand(1)
+		compacted = self._compact([[PitchCommand(), LangChangeCommand(None), "a ", index]])
+		self.assertEqual(compacted, [["a ", index]])
+
+	def test_overriddenParamRemoved(self):
+		index = IndexCommand(1)
+		high = PitchCommand(offset=10)
+		compacted = self._compact([[PitchCommand(offset=5), high, "a ", index]])
+		self.assertEqual(compacted, [[high, "a ", index]])
+
+	def test_paramsKeptAcrossIndexes(self):
+		"""A parameter change set in an earlier sequence of the same utterance needn't be repeated."""
+		pitch = PitchCommand(offset=10)
+		compacted = self._compact([
+			[pitch, "a ", IndexCommand(1)],
+			[PitchCommand(offset=10), "b ", IndexCommand(2)],
+		])
+		self.assertEqual(compacted[1], ["b ", compacted[1][-1]])
+
+	def test_paramsReappliedAfterEndUtterance(self):
+		pitch = PitchCommand(offset=10)
+		seqs = [
+			[pitch, "a ", IndexCommand(1)],
+			[EndUtteranceCommand()],
+			[pitch, "b ", IndexCommand(2)],
+		]
+		self.assertEqual(self._compact(seqs), seqs)
+
+	def test_breaksAndIndexesKept(self):
+		index = IndexCommand(1)
+		brk = BreakCommand(100)
+		rate = RateCommand(multiplier=2)
+		defaultRate = RateCommand()
+		compacted = self._compact([["a ", rate, brk, defaultRate, "b ", index]])
+		self.assertEqual(compacted, [["a ", rate, brk, defaultRate, "b ", index]])
+
+	def test_randomSequencesEquivalent(self):
+		rand = random.Random(0)
+		items = [
+			lambda: rand.choice(["a ", "b", ""]),
+			lambda: LangChangeCommand(rand.choice([None, "en", "fr"])),
+			lambda: CharacterModeCommand(rand.choice([True, False])),
+			lambda: PitchCommand(offset=rand.choice([0, 10])),
+			lambda: RateCommand(multiplier=rand.choice([1, 2])),
+			lambda: BreakCommand(10),
+		]
+		for attempt in range(200):
+			seqs = []
+			index = 0
+			for seqNum in range(rand.randint(1, 5)):
+				if seqs and rand.random() < 0.3:
+					seqs.append([EndUtteranceCommand()])
+				seq = [rand.choice(items)() for itemNum in range(rand.randint(0, 8))]
+				index += 1
+				seq.append(IndexCommand(index))
+				seqs.append(seq)
+			self._compact(seqs)
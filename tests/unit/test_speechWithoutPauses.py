@@ -0,0 +1,71 @@
+# A part of NonVisual Desktop Access (NVDA)
+# This file is covered by the GNU General Public License.
+# See the file COPYING for more details.
+# Copyright (C) 2020 NV Access Limited
+
+"""Unit tests for the speech.speechWithoutPauses module.
+"""
+
+import unittest
+from unittest import mock
+from speech.commands import EndUtteranceCommand, LangChangeCommand
+from speech.speechWithoutPauses import SpeechWithoutPauses
+
+
+class TestSpeechWithoutPauses(unittest.TestCase):
+
+	def setUp(self):
+		self.spoken = []
+		self.segmenter = SpeechWithoutPauses(speakFunc=self.spoken.append)
+
+	def test_incompletePhraseBuffered(self):
+		self.assertFalse(self.segmenter.speak(["Hello"]))
+		self.assertEqual(self.spoken, [])
+
+	def test_phraseCompletedByLaterChunk(self):
+		self.segmenter.speak(["The quick brown"])
+		self.assertTrue(self.segmenter.speak(["fox. It jumped"]))
+		self.assertEqual(self.spoken, [["The quick brown", "fox. "]])
+		self.segmenter.flush()
+		self.assertEqual(self.spoken[-1], ["It jumped"])
+
+	def test_onlyLastBoundaryUsed(self):
+		self.segmenter.speak(["One. Two. Three"])
+		self.assertEqual(self.spoken, [["One. Two. "]])
+
+	def test_flushWithNothingPending(self):
+		self.assertFalse(self.segmenter.flush())
+		self.assertFalse(self.segmenter.speak(None))
+
+	def test_endUtteranceFlushes(self):
+		self.segmenter.speak(["a", EndUtteranceCommand(), "b"])
+		self.assertEqual(self.spoken, [["a"]])
+		self.segmenter.flush()
+		self.assertEqual(self.spoken[-1], ["b"])
+
+	def test_langChangeCarriedOver(self):
+		lang = LangChangeCommand("fr")
+		self.segmenter.speak([lang, "Bonjour. Comment"])
+		self.segmenter.flush()
+		self.assertEqual(self.spoken, [[lang, "Bonjour. "], [lang, "Comment"]])
+
+	def test_reset(self):
+		self.segmenter.speak(["pending"])
+		self.segmenter.reset()
+		self.assertFalse(self.segmenter.flush())
+
+	def test_independentInstances(self):
+		otherSpoken = []
+		other = SpeechWithoutPauses(speakFunc=otherSpoken.append)
+		self.segmenter.speak(["first"])
+		other.speak(["second"])
+		self.segmenter.flush()
+		self.assertEqual(self.spoken, [["first"]])
+		self.assertEqual(otherSpoken, [])
+
+	def test_defaultSpeakFuncLookedUpWhenSpeaking(self):
+		"""Without a speakFunc, replacing speech.speak after creation still takes effect."""
+		segmenter = SpeechWithoutPauses()
+		with mock.patch("speech.speak") as speak:
+			segmenter.speak(["Hello. "])
+		speak.assert_called_once_with(["Hello. "])